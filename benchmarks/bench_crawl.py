@@ -0,0 +1,214 @@
+"""Offline benchmark suite: end-to-end /crawl throughput, per-stage costs and peak memory,
+measured against local stand-in sites (benchmarks/standin.py) instead of the live news sites.
+Usage (from the project root):
+  python -m benchmarks.bench_crawl [--articles N] [--latency-ms MS] [--output results.json] [--baseline old.json]
+Results are written as JSON; with --baseline, metrics that got worse by more than --tolerance
+are reported and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from newspeeking.config import load_config, set_config
+
+from benchmarks.standin import SITES, StandinServer
+
+SUITE_VERSION = 1  # Bump when metrics change meaning, so old baselines are not compared against
+
+
+def configure(db_path: str, servers: List[StandinServer], parse_workers: int, rate_limit_delay: float):
+    """
+    Points the app at a scratch database and configures each stand-in's address like the site it imitates.
+    Must run before newspeeking.db is imported (the engine is created at import).
+    """
+    config = load_config()
+    default_config = config.setdefault('default', {})
+    default_config['database_url'] = f"sqlite:///{db_path}"
+    default_config.pop('http_cache_dir', None)  # Every run downloads and parses every page
+    default_config['parse_workers'] = parse_workers
+    websites = config.setdefault('websites', {})
+    for server in servers:
+        websites[server.netloc] = dict(websites[server.pages.config_domain], rate_limit_delay=rate_limit_delay)
+    set_config(config)  # Compiled and kept for the run, config.yaml is not reloaded
+
+
+def per_item_ms(func, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) * 1000 / max(1, len(items))
+
+
+class Results:
+    def __init__(self):
+        self.metrics: List[Dict] = []
+
+    def add(self, site: str, name: str, value: float, unit: str, better: str = "lower"):
+        self.metrics.append({"site": site, "metric": name, "value": round(value, 4), "unit": unit, "better": better})
+        print(f"{site:<16} {name:<28} {value:12.3f} {unit}", file=sys.stderr)
+
+
+def bench_end_to_end(client, server: StandinServer, results: Results, repeat: int):
+    """POST /crawl with crawl_articles=true on an empty database: articles stored per second."""
+    rates, articles = [], 0
+    for _ in range(repeat):
+        client.post("/reset_db")
+        started = time.perf_counter()
+        response = client.post("/crawl", json={"url": server.base_url, "crawl_articles": True})
+        elapsed = time.perf_counter() - started
+        articles = response.json().get("articles_crawled", 0) if response.status_code == 200 else 0
+        rates.append(articles / elapsed)
+    results.add(server.pages.config_domain, "crawl_articles_stored", articles, "articles", "higher")
+    results.add(server.pages.config_domain, "crawl_throughput", statistics.median(rates), "articles/s", "higher")
+
+    client.post("/reset_db")
+    tracemalloc.start()
+    client.post("/crawl", json={"url": server.base_url, "crawl_articles": True})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.add(server.pages.config_domain, "crawl_python_peak_memory", peak / 2 ** 20, "MiB")
+
+
+def bench_stages(server: StandinServer, results: Results, repeat: int):
+    """Per-stage cost of listing (and feed) extraction, article extraction, classification and the database upsert."""
+    from newspeeking.config import get_categories, get_website_config
+    from newspeeking.crawler.crawler import extract_article_urls_from_listing_page, parse_article_urls
+    from newspeeking.crawler.discovery import read_source_sync
+    from newspeeking.crawler.extractors import extract_article_data
+    from newspeeking.db.database import SessionLocal, bulk_upsert_articles
+    from newspeeking.nlp.classifier import classify_article
+
+    site = server.pages.config_domain
+    website_config = get_website_config(server.netloc)
+    listing_html = server.page("/")
+    article_pages = [(server.base_url.rstrip("/") + path, html) for path, html in server.article_pages()]
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        asyncio.run(extract_article_urls_from_listing_page(server.base_url, website_config))
+    results.add(site, "listing_fetch_and_extract", (time.perf_counter() - started) * 1000 / repeat, "ms/page")
+    results.add(site, "listing_extract", per_item_ms(
+        lambda html: parse_article_urls(server.base_url, html, website_config), [listing_html] * repeat), "ms/page")
+    if server.recorded_dir is None:  # The same article links from the RSS feed, streamed and parsed
+        results.add(site, "feed_fetch_and_parse", per_item_ms(
+            read_source_sync, [server.base_url + "feed.xml"] * repeat), "ms/feed")
+
+    articles = []
+    results.add(site, "extract_article_data", per_item_ms(
+        lambda page: articles.append(extract_article_data(page[0], page[1], website_config)), article_pages), "ms/page")
+    categories = get_categories()
+    results.add(site, "classify_article", per_item_ms(
+        lambda article: article.update(category=classify_article(article["article_text"], categories)), articles),
+        "ms/article")
+
+    for article, (url, _) in zip(articles, article_pages):
+        article["url"] = url.replace("http://", "http://upsert-bench.")  # Kept apart from the crawled articles
+    db = SessionLocal()
+    try:
+        for label in ("db_upsert_insert", "db_upsert_unchanged"):
+            started = time.perf_counter()
+            bulk_upsert_articles(db, articles)
+            db.commit()
+            results.add(site, label, (time.perf_counter() - started) * 1000 / len(articles), "ms/article")
+    finally:
+        db.close()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(metrics: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Descriptions of the metrics that got worse than the baseline by more than the tolerance."""
+    if baseline.get("suite_version") != SUITE_VERSION:
+        return [f"baseline suite version {baseline.get('suite_version')} != {SUITE_VERSION}, not comparable"]
+    previous = {(metric["site"], metric["metric"]): metric["value"] for metric in baseline.get("metrics", [])}
+    regressions = []
+    for metric in metrics:
+        old_value = previous.get((metric["site"], metric["metric"]))
+        if not old_value:
+            continue
+        change = metric["value"] / old_value - 1
+        worse = change > tolerance if metric["better"] == "lower" else change < -tolerance
+        if worse:
+            regressions.append(f"{metric['site']} {metric['metric']}: {old_value} -> {metric['value']} {metric['unit']} "
+                               f"({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawling against local stand-in news sites.")
+    parser.add_argument("--sites", nargs="+", choices=sorted(SITES), default=sorted(SITES))
+    parser.add_argument("--articles", type=int, default=60, help="Articles linked from each listing page")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Stand-in response latency")
+    parser.add_argument("--rate-limit-delay", type=float, default=0, help="Per-site politeness delay (seconds)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Parse pool processes (0: in process)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (the median is reported)")
+    parser.add_argument("--recorded", help="Serve recorded pages from this directory (one subdirectory per site)")
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    servers = [StandinServer(site, args.articles, args.latency_ms,
+                             recorded_dir=os.path.join(args.recorded, site) if args.recorded else None).start()
+               for site in args.sites]
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        configure(os.path.join(scratch_dir, "bench.db"), servers, args.parse_workers, args.rate_limit_delay)
+        from fastapi.testclient import TestClient  # Imported after configure(): the app creates the engine
+        from newspeeking.main import app
+
+        results = Results()
+        with TestClient(app) as client:
+            for server in servers:
+                bench_end_to_end(client, server, results, args.repeat)
+                bench_stages(server, results, args.repeat)
+        for server in servers:
+            server.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    results.add("all", "process_peak_rss", peak_rss, "MiB")
+    report = {
+        "suite_version": SUITE_VERSION,
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "metrics": results.metrics,
+    }
+    document = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("parameters") != report["parameters"]:
+            print("Warning: the baseline was run with different parameters", file=sys.stderr)
+        regressions = compare(results.metrics, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: per-page parse time of the compiled extraction profiles vs. the BeautifulSoup fallback.
+Usage (from the project root): python -m benchmarks.bench_extraction [--pages N] [--workers N]
+"""
+import argparse
+import asyncio
+import time
+
+from newspeeking.config import get_website_config
+from newspeeking.crawler.crawler import parse_article_urls_soup
+from newspeeking.crawler.extractors import extract_article_data_soup
+from newspeeking.crawler.parse_pool import ParsePool
+from newspeeking.crawler.profiles import LXML_AVAILABLE, get_extraction_profile
+
+from benchmarks.standin import nytimes_article_page, nytimes_listing_page
+
+
+def timed(label: str, func, pages) -> float:
+    started = time.perf_counter()
+    for page in pages:
+        func(page)
+    per_page_ms = (time.perf_counter() - started) * 1000 / len(pages)
+    print(f"{label:<40} {per_page_ms:8.2f} ms/page")
+    return per_page_ms
+
+
+def pool_throughput(workers: int, pages, website_config) -> float:
+    """Articles per second extracted and classified through a ParsePool (workers=0: in process)."""
+    parse_pool = ParsePool(workers=workers)
+
+    async def parse_all():
+        url = "https://www.nytimes.com/2024/01/01/technology/story.html"
+        await parse_pool.build_article_data(url, pages[0], website_config)  # Start and warm up the workers
+        started = time.perf_counter()
+        await asyncio.gather(*(parse_pool.build_article_data(url, html, website_config) for html in pages))
+        return len(pages) / (time.perf_counter() - started)
+
+    try:
+        return asyncio.run(parse_all())
+    finally:
+        parse_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200,
+                        help="Synthetic pages per benchmark")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Also measure parse pool throughput with this many worker processes")
+    args = parser.parse_args()
+
+    website_config = get_website_config("nytimes.com")
+    profile = get_extraction_profile(website_config)
+    article_pages = [nytimes_article_page(n) for n in range(args.pages)]
+    listing_pages = [nytimes_listing_page(n) for n in range(args.pages)]
+    listing_url = "https://www.nytimes.com/section/technology"
+
+    backend = "lxml + compiled XPath" if LXML_AVAILABLE else "BeautifulSoup + compiled soupsieve"
+    print(f"Profile backend: {backend}, {args.pages} pages per benchmark")
+    soup = timed("article page, BeautifulSoup fallback",
+                 lambda html: extract_article_data_soup(listing_url, html, website_config), article_pages)
+    compiled = timed("article page, compiled profile",
+                     profile.extract_article, article_pages)
+    print(f"{'article page speedup':<40} {soup / compiled:8.2f}x")
+    soup = timed("listing page, BeautifulSoup fallback",
+                 lambda html: parse_article_urls_soup(listing_url, html, website_config), listing_pages)
+    compiled = timed("listing page, compiled profile",
+                     lambda html: profile.extract_article_urls(listing_url, html), listing_pages)
+    print(f"{'listing page speedup':<40} {soup / compiled:8.2f}x")
+
+    if args.workers:
+        in_process = pool_throughput(0, article_pages, website_config)
+        print(f"{'parse + classify, in process':<40} {in_process:8.0f} articles/s")
+        pooled = pool_throughput(args.workers, article_pages, website_config)
+        print(f"{f'parse + classify, {args.workers} workers':<40} {pooled:8.0f} articles/s")
+        print(f"{'parse pool speedup':<40} {pooled / in_process:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
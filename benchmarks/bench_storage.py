@@ -0,0 +1,131 @@
+"""Benchmark: database size and read latency of article texts stored uncompressed, with zlib, with zstd
+and with zstd plus a trained dictionary. Each codec gets its own scratch SQLite database.
+Usage (from the project root): python -m benchmarks.bench_storage [--articles N] [--export articles.ndjson]
+--export takes real articles as written by GET /export (NDJSON) instead of synthetic ones.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from newspeeking.config import load_config, set_config
+
+from benchmarks.standin import article_paragraphs
+
+VARIANTS = ["none", "zlib", "zstd", "zstd+dictionary"]
+SEARCH_QUERIES = ["technology market", "election government", "football"]
+
+
+def synthetic_articles(count: int) -> List[Dict]:
+    return [{"url": f"https://www.nytimes.com/2024/01/01/technology/story-{n}.html", "headline": f"Article {n}",
+             "article_text": "\n".join(article_paragraphs(n)), "publication_date": "2024-01-01T00:00:00",
+             "author": "Bench Author", "category": "technology"} for n in range(count)]
+
+
+def exported_articles(path: str, count: int) -> List[Dict]:
+    articles = []
+    with open(path) as f:
+        for line in f:
+            article = json.loads(line)
+            if article.get("article_text"):
+                articles.append({key: article.get(key) for key in (
+                    "url", "headline", "article_text", "publication_date", "author", "category")})
+            if len(articles) >= count:
+                break
+    return articles
+
+
+def timed_ms(func, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def bench_variant(variant: str, db_path: str, articles: List[Dict], reads: int) -> Dict[str, float]:
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from newspeeking.db import compression
+    from newspeeking.db.database import Base, CompressionDictionaryDB, bulk_upsert_articles, register_sql_functions
+    from newspeeking.db.queries import ArticleFilters, get_article, iter_articles, list_articles
+    from newspeeking.db.search import create_search_index, search_articles
+
+    bench_engine = create_engine(f"sqlite:///{db_path}")
+    register_sql_functions(bench_engine)
+    Base.metadata.create_all(bind=bench_engine)
+    create_search_index(bench_engine)
+    db = sessionmaker(bind=bench_engine)()
+    compression.set_codec(variant.split("+")[0])
+    compression.set_dictionary(0, None)
+    if variant.endswith("+dictionary"):
+        data = compression.train_dictionary([article["article_text"] for article in articles[:2000]], 64 * 1024)
+        dictionary = CompressionDictionaryDB(data=data)
+        db.add(dictionary)
+        db.commit()
+        compression.set_dictionary(dictionary.id, data)
+
+    results = {}
+    try:
+        started = time.perf_counter()
+        for start in range(0, len(articles), 500):
+            bulk_upsert_articles(db, articles[start:start + 500])
+            db.commit()
+        results["insert ms/article"] = (time.perf_counter() - started) * 1000 / len(articles)
+        with bench_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+        results["database MiB"] = os.path.getsize(db_path) / 2 ** 20
+
+        ids = random.Random(0).choices(range(1, len(articles) + 1), k=reads)
+
+        def read_articles():
+            for article_id in ids:
+                get_article(db, article_id).article_text
+                db.expunge_all()  # Every read goes to the database
+
+        results["get article ms"] = timed_ms(read_articles) / reads
+        results["list 50 summaries ms"] = timed_ms(lambda: list_articles(db, ArticleFilters(), limit=50), reads)
+        results["scan with text ms/article"] = timed_ms(
+            lambda: [rows for rows in iter_articles(db, ArticleFilters())]) / len(articles)
+        results["search ms/query"] = timed_ms(
+            lambda: [search_articles(db, query, ArticleFilters()) for query in SEARCH_QUERIES]) / len(SEARCH_QUERIES)
+    finally:
+        db.close()
+        bench_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed article text storage.")
+    parser.add_argument("--articles", type=int, default=5000, help="Articles stored per codec")
+    parser.add_argument("--export", help="NDJSON export (GET /export) to take the articles from")
+    parser.add_argument("--reads", type=int, default=200, help="Single-article reads and list queries timed")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=VARIANTS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        config = load_config()
+        config.setdefault('default', {})['database_url'] = f"sqlite:///{os.path.join(scratch_dir, 'app.db')}"
+        set_config(config)  # Before newspeeking.db is imported: the app engine is created at import
+        from newspeeking.db.compression import ZSTD_AVAILABLE
+
+        articles = exported_articles(args.export, args.articles) if args.export else synthetic_articles(args.articles)
+        text_mib = sum(len(article["article_text"].encode("utf-8")) for article in articles) / 2 ** 20
+        print(f"{len(articles)} articles, {text_mib:.1f} MiB of article text")
+        rows = {}
+        for variant in args.variants:
+            if variant.startswith("zstd") and not ZSTD_AVAILABLE:
+                print(f"Skipping {variant}: the zstandard package is not installed")
+                continue
+            rows[variant] = bench_variant(variant, os.path.join(scratch_dir, f"{variant}.db"), articles, args.reads)
+
+    metrics = list(next(iter(rows.values()), {}))
+    print(f"{'':<28}" + "".join(f"{variant:>17}" for variant in rows))
+    for metric in metrics:
+        print(f"{metric:<28}" + "".join(f"{results[metric]:17.3f}" for results in rows.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Local stand-in for the news sites in config.yaml: serves synthetic (or recorded) listing and article
+pages that match the configured selectors, with a configurable per-request latency. Synthetic sites also
+serve an RSS feed (/feed.xml) and a sitemap index (/sitemap.xml) of their articles.
+Run standalone (from the project root): python -m benchmarks.standin --site detik --port 8701 --latency-ms 50
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Inline scripts and styles make up a large share of real news pages
+_NOISE = ("<script>window.__data = {" + ", ".join(f'"k{i}": "{"x" * 40}"' for i in range(200)) + "};</script>"
+          "<style>" + " ".join(f".c{i} {{ margin: {i}px; }}" for i in range(300)) + "</style>")
+
+_VOCABULARY = [f"word{i}" for i in range(3000)] + [
+    "technology", "software", "internet", "election", "government", "parliament", "market", "economy",
+    "finance", "football", "tennis", "athlete", "international", "diplomacy", "report", "story"]
+
+
+def article_paragraphs(n: int, paragraphs: int = 40, words: int = 25):
+    """Deterministic, distinct text for article n (distinct so near-duplicate detection keeps them apart)."""
+    rng = random.Random(n)
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(words)) + "." for _ in range(paragraphs)]
+
+
+def nytimes_article_page(n: int) -> str:
+    paragraphs = "".join(
+        f"<p class='css-at9mc1'>{text}</p>" for text in article_paragraphs(n))
+    return (f"<html><head><title>Article {n}</title>{_NOISE}</head><body>{_NOISE}"
+            f"<h1 class='css-88wicj'>Headline {n}</h1>"
+            f"<time class='css-1ebvfn0' datetime='2024-01-0{n % 9 + 1}T10:00:00Z'>Jan 1</time>"
+            f"<a rel='author' class='css-1x2y3z' href='/by/someone'>Some One</a>"
+            f"<section>{paragraphs}</section>{_NOISE}</body></html>")
+
+
+def nytimes_article_path(n: int) -> str:
+    return f"/2024/01/01/technology/story-{n}.html"
+
+
+def nytimes_listing_page(n: int, articles: int = 60) -> str:
+    links = "".join(
+        f"<li><div><a href='{nytimes_article_path(n * articles + i)}'>Story {i}</a></div></li>" for i in range(articles))
+    nav = "".join(f"<a href='/section/s{i}'>Section {i}</a>" for i in range(80))
+    return f"<html><head>{_NOISE}</head><body><nav>{nav}</nav>{_NOISE}<ul>{links}</ul>{_NOISE}</body></html>"
+
+
+def detik_article_page(n: int) -> str:
+    paragraphs = "".join(f"<p>{text}</p>" for text in article_paragraphs(n))
+    return (f"<html><head><title>Berita {n}</title>{_NOISE}</head><body>{_NOISE}"
+            f"<h1 class='title'>Judul berita {n}</h1>"
+            f"<div class='detail__author'>Penulis {n % 7}</div>"
+            f"<div class='detail__date'>2024-01-0{n % 9 + 1}T10:00:00+07:00</div>"
+            f"<div class='detail__body-text'>{paragraphs}</div>{_NOISE}</body></html>")
+
+
+def detik_article_path(n: int) -> str:
+    return f"/d-{7000000 + n}/berita-{n}"
+
+
+def detik_listing_page(n: int, articles: int = 60) -> str:
+    items = "".join(
+        f"<article><a class='media__link' href='{detik_article_path(n * articles + i)}'>Berita {i}</a></article>"
+        for i in range(articles))
+    nav = "".join(f"<a href='/kategori/k{i}'>Kategori {i}</a>" for i in range(80))
+    return f"<html><head>{_NOISE}</head><body><nav>{nav}</nav>{_NOISE}{items}{_NOISE}</body></html>"
+
+
+SITEMAP_SIZE = 50  # Article URLs per sitemap of the sitemap index
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def article_lastmod(n: int) -> datetime:
+    return _EPOCH + timedelta(minutes=n)
+
+
+def rss_feed(base_url: str, articles: List[Tuple[int, str]]) -> str:
+    """RSS 2.0 feed of (number, path) articles."""
+    items = "".join(
+        f"<item><title>Story {n}</title><link>{base_url.rstrip('/')}{path}</link>"
+        f"<pubDate>{article_lastmod(n).strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+        for n, path in articles)
+    return (f"<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel><title>Stand-in</title>"
+            f"<link>{base_url}</link>{items}</channel></rss>")
+
+
+def sitemap(base_url: str, articles: List[Tuple[int, str]]) -> str:
+    urls = "".join(f"<url><loc>{base_url.rstrip('/')}{path}</loc><lastmod>{article_lastmod(n).isoformat()}</lastmod></url>"
+                   for n, path in articles)
+    return f"<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>{urls}</urlset>"
+
+
+def sitemap_index(base_url: str, articles: int) -> str:
+    sitemaps = "".join(
+        f"<sitemap><loc>{base_url}sitemap-{number}.xml</loc>"
+        f"<lastmod>{max(map(article_lastmod, range(number * SITEMAP_SIZE, min(articles, (number + 1) * SITEMAP_SIZE)))).isoformat()}"
+        "</lastmod></sitemap>"
+        for number in range((articles + SITEMAP_SIZE - 1) // SITEMAP_SIZE))
+    return (f"<?xml version='1.0' encoding='UTF-8'?>"
+            f"<sitemapindex xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>{sitemaps}</sitemapindex>")
+
+
+class SitePages:
+    """Page generators of one configured site (config_domain: its key under `websites` in config.yaml)."""
+
+    def __init__(self, config_domain: str, listing_page: Callable[[int, int], str],
+                 article_page: Callable[[int], str], article_path: Callable[[int], str]):
+        self.config_domain = config_domain
+        self.listing_page = listing_page
+        self.article_page = article_page
+        self.article_path = article_path
+
+
+SITES: Dict[str, SitePages] = {
+    "nytimes": SitePages("nytimes.com", nytimes_listing_page, nytimes_article_page, nytimes_article_path),
+    "detik": SitePages("inet.detik.com", detik_listing_page, detik_article_page, detik_article_path),
+}
+
+
+class StandinServer:
+    """
+    Serves one site on 127.0.0.1: `/` is a listing page linking `articles` article pages, `/feed.xml` and
+    `/sitemap.xml` list them as an RSS feed and a sitemap index.
+    With recorded_dir, pages are served from files instead (request path -> file, `/` -> index.html).
+    Every response is delayed by latency_ms to stand in for network and server time.
+    """
+
+    def __init__(self, site: str, articles: int = 60, latency_ms: float = 0, port: int = 0,
+                 recorded_dir: Optional[str] = None):
+        self.pages = SITES[site]
+        self.articles = articles
+        self.latency = latency_ms / 1000
+        self.recorded_dir = recorded_dir
+        self._article_numbers = {self.pages.article_path(n): n for n in range(articles)}
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def netloc(self) -> str:
+        return f"127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.netloc}/"
+
+    def page(self, path: str) -> Optional[str]:
+        if self.recorded_dir is not None:
+            file_path = os.path.join(self.recorded_dir, path.lstrip("/") or "index.html")
+            if not os.path.isfile(file_path):
+                return None
+            with open(file_path, encoding="utf-8", errors="replace") as f:
+                return f.read()
+        if path == "/":
+            return self.pages.listing_page(0, self.articles)
+        if path == "/feed.xml":
+            return rss_feed(self.base_url, [(n, self.pages.article_path(n)) for n in range(self.articles)])
+        if path == "/sitemap.xml":
+            return sitemap_index(self.base_url, self.articles)
+        if path.startswith("/sitemap-") and path.endswith(".xml") and path[9:-4].isdigit():
+            start = int(path[9:-4]) * SITEMAP_SIZE
+            return sitemap(self.base_url, [(n, self.pages.article_path(n))
+                                           for n in range(start, min(self.articles, start + SITEMAP_SIZE))]) \
+                if start < self.articles else None
+        n = self._article_numbers.get(path)
+        return self.pages.article_page(n) if n is not None else None
+
+    def article_pages(self) -> List[Tuple[str, str]]:
+        """(path, html) of every article page served."""
+        if self.recorded_dir is None:
+            return [(self.pages.article_path(n), self.pages.article_page(n)) for n in range(self.articles)]
+        pages = []
+        for directory, _, file_names in os.walk(self.recorded_dir):
+            for file_name in sorted(file_names):
+                path = "/" + os.path.relpath(os.path.join(directory, file_name), self.recorded_dir).replace(os.sep, "/")
+                if path != "/index.html":
+                    pages.append((path, self.page(path)))
+        return pages
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                standin.requests += 1
+                if standin.latency:
+                    time.sleep(standin.latency)
+                html = standin.page(self.path)
+                body = (html or "Not found").encode("utf-8")
+                self.send_response(200 if html is not None else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> "StandinServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in news site locally.")
+    parser.add_argument("--site", choices=sorted(SITES), default="detik")
+    parser.add_argument("--port", type=int, default=8701)
+    parser.add_argument("--articles", type=int, default=60, help="Articles linked from the listing page")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--recorded", help="Serve recorded pages from this directory instead")
+    args = parser.parse_args()
+    server = StandinServer(args.site, args.articles, args.latency_ms, args.port, args.recorded)
+    print(f"Serving {args.site} stand-in at {server.base_url} "
+          f"(configure it as websites.'{server.netloc}' with the {server.pages.config_domain} settings)")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
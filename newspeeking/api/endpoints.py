@@ -1,22 +1,40 @@
 # FastAPI API endpoints for the NewsPeeking application.
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Literal, Optional
+import csv
+import io
+import json
 import logging
 
 # Import MessageResponse
-from newspeeking.api.schemas import CrawlRequest, CrawlResponse, ArticleResponse, MessageResponse
-from newspeeking.crawler.crawler import crawl_website, extract_article_urls_from_listing_page
-from newspeeking.db.database import get_db, Session, ArticleDB
-from typing import Dict
+from newspeeking import metrics
+from newspeeking.api.schemas import CrawlRequest, CrawlResponse, ArticleResponse, ArticleListResponse, SearchResult, SearchResponse, MessageResponse, CrawlBatchRequest, CrawlJobRequest, CrawlJobResponse, QueueRequest, QueueResponse
+from newspeeking.crawler.crawler import crawl_website, iter_website_articles
+from newspeeking.crawler.jobs import CrawlJob, job_manager
+from newspeeking.crawler.work_queue import TaskKind, enqueue, queue_counts
+from newspeeking.db.database import get_db, Session, SessionLocal, ArticleDB, CrawlTaskDB, DiscoveredUrlDB, DiscoverySourceDB, MinhashBandDB, UpsertResult, bulk_upsert_articles
+from newspeeking.db.queries import ArticleFilters, InvalidCursor, get_article, get_article_summary, iter_articles, list_articles
+from newspeeking.db.search import InvalidSearchQuery, clear_search_index, search_articles, search_supported
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 
 # Inherit URL from base CrawlRequest, add crawl_articles
 class CrawlRequest(CrawlRequest):
     crawl_articles: Optional[bool] = False  # Optional parameter, default False
+    stream: Optional[bool] = False  # Send results as NDJSON lines while the crawl runs
+
+
+def crawl_response(message: str, upsert_result: UpsertResult) -> CrawlResponse:
+    return CrawlResponse(message=message, articles_crawled=upsert_result.total, articles_inserted=upsert_result.inserted,
+                         articles_updated=upsert_result.updated, articles_unchanged=upsert_result.unchanged,
+                         articles_duplicate=upsert_result.duplicates)
 
 
 @router.post("/crawl", response_model=CrawlResponse, status_code=200)
@@ -25,59 +43,41 @@ async def crawl_endpoint(crawl_request: CrawlRequest, db: Session = Depends(get_
     Endpoint to crawl a news website URL.
     - Default mode (crawl_articles=False or not provided): Extracts and returns a list of article URLs from a listing page.
     - Optional mode (crawl_articles=True): Crawls individual articles and stores (or updates) them in the database.
+    - stream=True: Responds with NDJSON, one line per article URL or stored article as soon as it is ready.
     """
     url = str(crawl_request.url)
     # Get crawl_articles parameter from request
     crawl_articles_param = crawl_request.crawl_articles
     logger.info(
-        f"Crawling requested for URL: {url}, crawl_articles={crawl_articles_param}")
+        f"Crawling requested for URL: {url}, crawl_articles={crawl_articles_param}, stream={crawl_request.stream}")
+
+    if crawl_request.stream:
+        return StreamingResponse(stream_crawl(url, crawl_articles_param), media_type=NDJSON_MEDIA_TYPE)
 
     if crawl_articles_param:  # crawl_articles=True mode: Crawl and store/update articles
-        article_data_list = crawl_website(
+        article_data_list = await crawl_website(
             url, crawl_articles=True)  # Pass crawl_articles=True
         if isinstance(article_data_list, list):  # Listing page crawl
-            articles_crawled_count = 0
-            articles_updated_count = 0
-            for article_data in article_data_list:
-                if article_data:
-                    existing_article = db.query(ArticleDB).filter(
-                        ArticleDB.url == article_data["url"]).first()
-                    if existing_article:  # Article already exists - Update instead of inserting
-                        logger.info(
-                            f"Article from URL '{article_data['url']}' already exists, updating data.")
-                        # Function to update existing article
-                        update_article_in_db(
-                            db, existing_article, article_data)
-                        articles_updated_count += 1
-                    else:  # Article does not exist - Insert new article
-                        db_article = ArticleDB(**article_data)
-                        db.add(db_article)
-                        articles_crawled_count += 1
-            db.commit()  # Commit all updates and inserts in one transaction
+            # Insert new and update changed articles in bulk, in one transaction
+            upsert_result = bulk_upsert_articles(db, article_data_list)
+            db.commit()
             logger.info(
-                f"Crawled and stored {articles_crawled_count} new articles, updated {articles_updated_count} articles from listing page URL: {url}")
-            return CrawlResponse(message=f"Crawling from listing page successful, {articles_crawled_count} new articles stored, {articles_updated_count} articles updated.", articles_crawled=articles_crawled_count + articles_updated_count)
+                f"Crawled {upsert_result.total} articles from listing page URL: {url} ({upsert_result.inserted} new, {upsert_result.updated} updated, {upsert_result.unchanged} unchanged, {upsert_result.duplicates} near-duplicates)")
+            return crawl_response(f"Crawling from listing page successful, {upsert_result.inserted} new articles stored, {upsert_result.updated} articles updated, {upsert_result.unchanged} articles unchanged.", upsert_result)
 
         elif isinstance(article_data_list, dict):  # Single article crawl
-            article_data = article_data_list  # Rename for clarity
-            existing_article = db.query(ArticleDB).filter(
-                ArticleDB.url == url).first()
-            if existing_article:  # Article already exists - Update
-                logger.info(
-                    f"Article from URL '{url}' already exists, updating data.")
-                # Function to update existing article
-                update_article_in_db(db, existing_article, article_data)
-                articles_updated_count = 1
-                db.commit()
-                # Indicate update
-                return CrawlResponse(message="Article already exists, data updated.", articles_crawled=1)
-            else:  # Article does not exist - Insert new article
-                db_article = ArticleDB(**article_data)
-                db.add(db_article)
-                db.commit()
+            upsert_result = bulk_upsert_articles(db, [article_data_list])
+            db.commit()
+            if upsert_result.inserted:
                 logger.info(
                     f"Crawled and stored single article from URL: {url}")
-                return CrawlResponse(message="Crawling single article successful, article stored in database.", articles_crawled=1)
+                return crawl_response("Crawling single article successful, article stored in database.", upsert_result)
+            elif upsert_result.updated:
+                logger.info(
+                    f"Article from URL '{url}' already exists, updating data.")
+                return crawl_response("Article already exists, data updated.", upsert_result)
+            else:
+                return crawl_response("Article already exists and is unchanged.", upsert_result)
 
         else:  # crawl_website likely returned None (error)
             raise HTTPException(
@@ -85,7 +85,7 @@ async def crawl_endpoint(crawl_request: CrawlRequest, db: Session = Depends(get_
 
     else:  # Default mode (crawl_articles=False): List article URLs
         # Pass crawl_articles=False
-        article_urls = crawl_website(url, crawl_articles=False)
+        article_urls = await crawl_website(url, crawl_articles=False)
         if article_urls:
             # Return article URLs in response
             return JSONResponse(content={"message": "Article URLs extracted from listing page.", "article_urls": article_urls}, status_code=200)
@@ -94,6 +94,250 @@ async def crawl_endpoint(crawl_request: CrawlRequest, db: Session = Depends(get_
                 status_code=400, detail="Failed to extract article URLs from listing page.")
 
 
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def ndjson_line(payload: Dict) -> str:
+    return json.dumps(payload, default=json_value) + "\n"
+
+
+async def stream_crawl(url: str, crawl_articles: bool) -> AsyncIterator[str]:
+    """
+    NDJSON lines for a streaming crawl: one {"url"} line per article URL (crawl_articles=False), or
+    one line per crawled article once it is stored, followed by a summary line with the crawl totals.
+    Errors are reported as a {"status": "error"} line, since the response status is already sent.
+    """
+    if not crawl_articles:
+        article_urls = await crawl_website(url, crawl_articles=False)
+        if not article_urls:
+            yield ndjson_line({"status": "error", "detail": "Failed to extract article URLs from listing page."})
+        for article_url in article_urls or []:
+            yield ndjson_line({"url": article_url})
+        return
+
+    db = SessionLocal()
+    upsert_result = UpsertResult()
+    try:
+        async for article_url, article_data in iter_website_articles(url):
+            yield store_streamed_article(db, article_url, article_data, upsert_result)
+    except Exception as e:
+        logger.error(f"Streaming crawl error for URL {url}: {e}")
+        yield ndjson_line({"status": "error", "detail": f"Failed to crawl {url}: {e}"})
+        return
+    finally:
+        db.close()
+    logger.info(
+        f"Streamed {upsert_result.total} articles from URL: {url} ({upsert_result.inserted} new, {upsert_result.updated} updated, {upsert_result.unchanged} unchanged, {upsert_result.duplicates} near-duplicates)")
+    summary = crawl_response(f"Streaming crawl finished, {upsert_result.inserted} new articles stored, {upsert_result.updated} articles updated, {upsert_result.unchanged} articles unchanged.", upsert_result)
+    yield ndjson_line({"status": "done", **summary.model_dump()})
+
+
+def store_streamed_article(db: Session, article_url: str, article_data: Optional[Dict], totals: UpsertResult) -> str:
+    """Stores one streamed article in its own transaction and returns its NDJSON line."""
+    if not article_data:
+        return ndjson_line({"url": article_url, "status": "failed"})
+    try:
+        upsert_result = bulk_upsert_articles(db, [article_data])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store streamed article {article_url}: {e}")
+        return ndjson_line({"url": article_url, "status": "failed"})
+    totals += upsert_result
+    status = "inserted" if upsert_result.inserted else "updated" if upsert_result.updated else "unchanged"
+    return ndjson_line({"status": status, **get_article_summary(db, article_data["url"])._asdict()})
+
+
+def job_response(job: CrawlJob) -> CrawlJobResponse:
+    return CrawlJobResponse(job_id=job.job_id, status=job.status, seed_urls=job.seed_urls,
+                            discovered=job.discovered, fetched=job.fetched, stored=job.stored, failed=job.failed,
+                            duplicates=job.duplicates, skipped=job.skipped,
+                            created_at=job.created_at, started_at=job.started_at, finished_at=job.finished_at,
+                            error=job.error)
+
+
+@router.post("/crawl/jobs", response_model=CrawlJobResponse, status_code=202)
+async def submit_crawl_job(crawl_request: CrawlJobRequest):
+    """
+    Submits a background crawl of a listing page or article URL and returns its job ID immediately.
+    Articles are crawled and stored (or updated) in the database as they arrive.
+    - skip_known=true only crawls article URLs that are not stored yet.
+    """
+    return job_response(job_manager.submit([str(crawl_request.url)], skip_known=crawl_request.skip_known))
+
+
+@router.post("/crawl/jobs/batch", response_model=CrawlJobResponse, status_code=202)
+async def submit_crawl_batch_job(batch_request: CrawlBatchRequest):
+    """
+    Submits one background crawl job covering many seed URLs.
+    """
+    if not batch_request.urls:
+        raise HTTPException(
+            status_code=400, detail="At least one seed URL is required.")
+    return job_response(job_manager.submit([str(url) for url in batch_request.urls], skip_known=batch_request.skip_known))
+
+
+@router.get("/crawl/jobs", response_model=List[CrawlJobResponse])
+async def list_crawl_jobs():
+    """
+    Lists known crawl jobs (queued, running and recently finished) with their progress.
+    """
+    return [job_response(job) for job in job_manager.list_jobs()]
+
+
+@router.get("/crawl/jobs/{job_id}", response_model=CrawlJobResponse)
+async def get_crawl_job(job_id: str):
+    """
+    Returns the status and progress counters (discovered/fetched/stored/failed) of a crawl job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Crawl job not found.")
+    return job_response(job)
+
+
+@router.post("/crawl/jobs/{job_id}/cancel", response_model=CrawlJobResponse)
+async def cancel_crawl_job(job_id: str):
+    """
+    Cancels a queued or running crawl job. Articles already stored are kept.
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Crawl job not found.")
+    return job_response(job)
+
+
+@router.post("/crawl/queue", response_model=QueueResponse, status_code=202)
+async def queue_crawl(queue_request: QueueRequest, db: Session = Depends(get_db)):
+    """
+    Adds seed URLs to the shared work queue, crawled by every process running with work_queue enabled.
+    Article links found on listing pages are queued in turn; already-stored articles are not crawled again.
+    """
+    if not queue_request.urls:
+        raise HTTPException(
+            status_code=400, detail="At least one seed URL is required.")
+    queued = enqueue(db, [str(url) for url in queue_request.urls], TaskKind.SEED)
+    db.commit()
+    return QueueResponse(queued=queued, counts=queue_counts(db))
+
+
+@router.get("/crawl/queue", response_model=QueueResponse)
+async def get_crawl_queue(db: Session = Depends(get_db)):
+    """
+    Returns the number of work queue URLs per status.
+    """
+    return QueueResponse(counts=queue_counts(db))
+
+
+@router.get("/articles", response_model=ArticleListResponse)
+async def list_articles_endpoint(category: Optional[str] = None, domain: Optional[str] = None, author: Optional[str] = None,
+                                 published_after: Optional[datetime] = None, published_before: Optional[datetime] = None,
+                                 order_by: Literal["created_at", "publication_date"] = "created_at",
+                                 limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                                 include_text: bool = False, duplicate: Optional[bool] = None, db: Session = Depends(get_db)):
+    """
+    Lists stored articles, newest first, filtered by category, domain, author and publication date range.
+    - duplicate=false lists only canonical articles, duplicate=true only near-duplicates (linked by duplicate_of_id).
+    - Pagination: pass the returned `next_cursor` as `cursor` to get the next page.
+    - order_by=publication_date leaves out articles without a publication date.
+    - include_text=true adds the article body, which is omitted by default.
+    """
+    filters = ArticleFilters(category=category, domain=domain, author=author,
+                             published_after=published_after, published_before=published_before, duplicate=duplicate)
+    try:
+        rows, next_cursor = list_articles(db, filters, order_by=order_by, limit=limit,
+                                          cursor=cursor, include_text=include_text)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ArticleListResponse(articles=[ArticleResponse.model_validate(row) for row in rows], next_cursor=next_cursor)
+
+
+@router.get("/articles/{article_id}", response_model=ArticleResponse)
+async def get_article_endpoint(article_id: int, db: Session = Depends(get_db)):
+    """
+    Returns one stored article, including its body.
+    """
+    article = get_article(db, article_id)
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found.")
+    return ArticleResponse.model_validate(article)
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_endpoint(q: str = Query(..., min_length=1), category: Optional[str] = None, domain: Optional[str] = None,
+                          published_after: Optional[datetime] = None, published_before: Optional[datetime] = None,
+                          limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0, le=1000),
+                          raw: bool = False, db: Session = Depends(get_db)):
+    """
+    Full-text search over article headlines and bodies, best match first (headline hits weigh more).
+    - By default every word of `q` must appear in the article.
+    - raw=true passes `q` to SQLite FTS5 as-is: "exact phrases", prefix*, AND/OR/NOT, NEAR(...).
+    """
+    if not search_supported(db.get_bind()):
+        raise HTTPException(
+            status_code=501, detail="Full-text search requires an SQLite database.")
+    filters = ArticleFilters(category=category, domain=domain,
+                             published_after=published_after, published_before=published_before)
+    try:
+        rows = search_articles(db, q, filters, limit=limit,
+                               offset=offset, raw_query=raw)
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(results=[SearchResult.model_validate(row) for row in rows])
+
+
+@router.get("/export")
+async def export_articles(export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                          category: Optional[str] = None, domain: Optional[str] = None, author: Optional[str] = None,
+                          published_after: Optional[datetime] = None, published_before: Optional[datetime] = None,
+                          include_text: bool = True, duplicate: Optional[bool] = None):
+    """
+    Streams every stored article (or those matching the filters) as NDJSON or CSV, in id order.
+    Rows are read through a server-side cursor and written out in batches, so memory use does not grow with the export.
+    """
+    filters = ArticleFilters(category=category, domain=domain, author=author,
+                             published_after=published_after, published_before=published_before, duplicate=duplicate)
+    if export_format == "csv":
+        content, media_type = export_csv(filters, include_text), "text/csv"
+    else:
+        content, media_type = export_ndjson(filters, include_text), NDJSON_MEDIA_TYPE
+    return StreamingResponse(content, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="articles.{export_format}"'})
+
+
+def export_ndjson(filters: ArticleFilters, include_text: bool) -> Iterator[str]:
+    db = SessionLocal()  # Owned by the generator: the response outlives the request's dependencies
+    try:
+        for rows in iter_articles(db, filters, include_text=include_text):
+            yield "".join(ndjson_line(row._asdict()) for row in rows)
+    finally:
+        db.close()
+
+
+def export_csv(filters: ArticleFilters, include_text: bool) -> Iterator[str]:
+    db = SessionLocal()
+    try:
+        header_written = False
+        for rows in iter_articles(db, filters, include_text=include_text):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if not header_written:
+                writer.writerow(rows[0]._fields)
+                header_written = True
+            writer.writerows([json_value(value) if isinstance(value, datetime) else value for value in row]
+                             for row in rows)
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Crawl pipeline metrics (fetch, rate limit wait, parse, classify, database write) in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
 # reset database
 @router.post("/reset_db", response_model=MessageResponse, status_code=200)
 async def reset_database(db: Session = Depends(get_db)):
@@ -102,7 +346,12 @@ async def reset_database(db: Session = Depends(get_db)):
     Warning: This action is irreversible and will delete all stored articles.
     """
     try:
+        db.query(MinhashBandDB).delete()  # Near-duplicate index entries reference the articles
         db.query(ArticleDB).delete()  # Delete all records from ArticleDB table
+        clear_search_index(db)
+        db.query(CrawlTaskDB).delete()  # Queued article links would otherwise never be crawled again
+        db.query(DiscoveredUrlDB).delete()  # Feeds and sitemaps are read in full again
+        db.query(DiscoverySourceDB).delete()
         db.commit()
         return MessageResponse(message="Database reset successful: All articles deleted.")
     except Exception as e:
@@ -111,14 +360,3 @@ async def reset_database(db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=500, detail="Failed to reset database.")
 
-
-def update_article_in_db(db: Session, existing_article: ArticleDB, new_article_data: Dict):
-    """
-    Updates an existing article in the database with new data.
-    """
-    existing_article.headline = new_article_data["headline"]
-    existing_article.article_text = new_article_data["article_text"]
-    existing_article.publication_date = new_article_data["publication_date"]
-    existing_article.author = new_article_data["author"]
-    existing_article.category = new_article_data["category"]
-    # Do NOT update created_at (keep original creation timestamp)
@@ -1,6 +1,7 @@
 # Pydantic schemas for API request and response data validation.
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
 
 class CrawlRequest(BaseModel):
@@ -8,17 +9,75 @@ class CrawlRequest(BaseModel):
 
 
 class ArticleResponse(BaseModel):
+    id: int
     url: str
+    domain: Optional[str] = None
     headline: str
-    article_text: str
-    publication_date: Optional[str] = None
+    article_text: Optional[str] = None  # Omitted by list views unless include_text=true
+    publication_date: Optional[datetime] = None
     author: Optional[str] = None
     category: str
+    created_at: Optional[datetime] = None
+    duplicate_of_id: Optional[int] = None  # Canonical article this one is a near-duplicate of
+
+    model_config = {"from_attributes": True}
+
+
+class ArticleListResponse(BaseModel):
+    articles: List[ArticleResponse]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page; null on the last page
 
 
 class CrawlResponse(BaseModel):
     message: str
     articles_crawled: int = 0
+    articles_inserted: int = 0
+    articles_updated: int = 0
+    articles_unchanged: int = 0  # Re-crawled articles whose content had not changed (not rewritten)
+    articles_duplicate: int = 0  # Stored as near-duplicates linked to a canonical article
+
+
+class SearchResult(ArticleResponse):
+    snippet: str  # Best-matching fragment, matched terms wrapped in <mark></mark>
+    score: float  # bm25 rank: lower is a better match
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+
+
+class CrawlJobRequest(CrawlRequest):
+    skip_known: bool = False  # Only crawl article URLs that are not stored yet
+
+
+class CrawlBatchRequest(BaseModel):
+    urls: List[HttpUrl]
+    skip_known: bool = False
+
+
+class CrawlJobResponse(BaseModel):
+    job_id: str
+    status: str
+    seed_urls: List[str]
+    discovered: int = 0
+    fetched: int = 0
+    stored: int = 0
+    failed: int = 0
+    duplicates: int = 0
+    skipped: int = 0  # Already-stored article URLs not crawled again (skip_known)
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class QueueRequest(BaseModel):
+    urls: List[HttpUrl]
+
+
+class QueueResponse(BaseModel):
+    queued: int = 0  # URLs added (or re-queued) by this request
+    counts: Dict[str, int]  # Queue URLs per status: queued, leased, done, failed
 
 
 class MessageResponse(BaseModel):  # New response model for reset_db
@@ -1,60 +1,295 @@
 # Configuration loading and management module.
-import yaml
+# config.yaml is compiled once into a ConfigRegistry (sites by normalized domain, URL patterns,
+# rate limits) and recompiled when the file changes, so sites can be added without a restart.
+import itertools
 import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import yaml
 
 _CONFIG_FILE_PATH = 'config.yaml'
-_CONFIG = None  # Initialize _CONFIG to None
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between checks of the config file's modification time
 logger = logging.getLogger(__name__)
 
 
-def load_config():
-    """Loads configuration from YAML file and caches it."""
-    global _CONFIG  # Use the global _CONFIG variable
-    if _CONFIG is None:  # Load config only once
+def normalize_domain(domain: str) -> str:
+    """Lowercases a domain (or host:port) and strips a trailing dot and a leading `www.`."""
+    domain = domain.strip().lower().rstrip('.')
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def _pattern_list(value) -> List[str]:
+    values = [value] if isinstance(value, str) else value
+    return [str(item) for item in values] if isinstance(values, list) else []
+
+
+def compile_url_pattern(listing_page_config: Dict) -> Optional[re.Pattern]:
+    """
+    Compiles a listing page's article URL filter into one pattern, searched anywhere in the URL:
+    `url_pattern_inclusion` holds plain substrings, `url_pattern_regex` regular expressions (each a string or a list).
+    A URL matching any of them is kept. A `url_pattern_regex` that is not a valid regular expression matches literally.
+    Returns None if neither is configured.
+    """
+    alternatives = [re.escape(pattern) for pattern in _pattern_list(listing_page_config.get('url_pattern_inclusion'))]
+    for pattern in _pattern_list(listing_page_config.get('url_pattern_regex')):
         try:
-            with open(_CONFIG_FILE_PATH, 'r') as f:
-                _CONFIG = yaml.safe_load(f)
-        except FileNotFoundError:
-            logger.error(
-                f"Configuration file not found at: {_CONFIG_FILE_PATH}")
-            raise FileNotFoundError(
-                f"Configuration file not found at: {_CONFIG_FILE_PATH}")
-        except yaml.YAMLError as e:
-            logger.error(f"Error parsing YAML configuration file: {e}")
-            raise ValueError(f"Error parsing YAML configuration file: {e}")
-        except Exception as e:  # Catch any other potential exception
-            logger.error(f"Unexpected error during config loading: {e}")
-            # Raise RuntimeError
-            raise RuntimeError(
-                f"Failed to load configuration due to an unexpected error: {e}")
-    return _CONFIG
+            re.compile(pattern)
+        except re.error as e:
+            logger.warning(f"url_pattern_regex {pattern!r} is not a valid regular expression ({e}), matching it literally")
+            pattern = re.escape(pattern)
+        alternatives.append(f"(?:{pattern})")
+    return re.compile("|".join(alternatives)) if alternatives else None
+
+
+class SiteConfig:
+    """One entry of `websites` compiled: its URL inclusion pattern, resolved rate limit, listing pages and feeds to poll."""
+
+    def __init__(self, domain: str, website_config: Dict, default_config: Dict):
+        self.domain = domain  # Key under `websites`, as written
+        self.config = website_config or {}
+        listing_page_config = self.config.get('listing_page') or {}
+        self.url_pattern = compile_url_pattern(listing_page_config)
+        self.rate_limit_delay = float(self.config.get(
+            'rate_limit_delay', default_config.get('rate_limit_delay', 1)))
+        self.poll_urls: List[str] = list(listing_page_config.get('poll_urls') or [])
+        discovery_config = self.config.get('discovery') or {}
+        # RSS/Atom feeds and XML sitemaps (or sitemap indexes) listing the site's articles
+        self.discovery_urls: List[str] = list(dict.fromkeys(
+            list(discovery_config.get('feeds') or []) + list(discovery_config.get('sitemaps') or [])))
+
+
+class ConfigRegistry:
+    """
+    A configuration compiled once. Sites are looked up by normalized domain: `www.` and case are ignored,
+    and a subdomain without its own entry uses the closest configured parent domain.
+    mtime is the config file's modification time it was read at, or None for a configuration installed with set_config().
+    """
+
+    def __init__(self, config: Dict, version: int, mtime: Optional[int] = None):
+        self.config = config or {}
+        self.version = version
+        self.mtime = mtime
+        self.default: Dict = self.config.get('default') or {}
+        self.categories: Dict = self.default.get('categories') or {}
+        self.sites: Dict[str, SiteConfig] = {
+            normalize_domain(domain): SiteConfig(domain, website_config, self.default)
+            for domain, website_config in (self.config.get('websites') or {}).items()}
+        self._lookups: Dict[str, Optional[SiteConfig]] = {}
+        self.discovery_sources: Dict[str, SiteConfig] = {
+            url: site for site in self.sites.values() for url in site.discovery_urls}
+
+    def site(self, domain: str) -> Optional[SiteConfig]:
+        """Returns the site configured for a domain (a URL's netloc), or None if it has no configuration."""
+        if domain in self._lookups:
+            return self._lookups[domain]
+        host = normalize_domain(domain)
+        site = self.sites.get(host)
+        if site is None:
+            hostname = host.rsplit(':', 1)[0] if host.count(':') == 1 else host  # Without the port
+            labels = hostname.split('.')
+            for position in range(len(labels) - 1):  # Most specific parent domain first
+                site = self.sites.get('.'.join(labels[position:]))
+                if site is not None:
+                    break
+        self._lookups[domain] = site
+        return site
+
+
+_REGISTRY: Optional[ConfigRegistry] = None
+_VERSIONS = itertools.count(1)
+_reload_lock = threading.Lock()
+_next_reload_check = 0.0
+_failed_mtime: Optional[int] = None  # Modification time of a config file that failed to reload: not read again
+
+
+def _read_config_file() -> Dict:
+    try:
+        with open(_CONFIG_FILE_PATH, 'r') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        logger.error(
+            f"Configuration file not found at: {_CONFIG_FILE_PATH}")
+        raise FileNotFoundError(
+            f"Configuration file not found at: {_CONFIG_FILE_PATH}")
+    except yaml.YAMLError as e:
+        logger.error(f"Error parsing YAML configuration file: {e}")
+        raise ValueError(f"Error parsing YAML configuration file: {e}")
+    except Exception as e:  # Catch any other potential exception
+        logger.error(f"Unexpected error during config loading: {e}")
+        # Raise RuntimeError
+        raise RuntimeError(
+            f"Failed to load configuration due to an unexpected error: {e}")
+
+
+def _config_mtime() -> int:
+    try:
+        return os.stat(_CONFIG_FILE_PATH).st_mtime_ns
+    except OSError:
+        return 0  # Missing: reading the file reports the error
+
+
+def _reload_registry() -> ConfigRegistry:
+    """Recompiles the registry if config.yaml changed. A broken file keeps the previous configuration in use."""
+    global _REGISTRY, _next_reload_check, _failed_mtime
+    with _reload_lock:
+        _next_reload_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+        registry = _REGISTRY
+        if registry is not None and registry.mtime is None:  # Installed with set_config(): not watched
+            return registry
+        mtime = _config_mtime()
+        if registry is None:  # First load: errors are raised
+            config = _read_config_file()
+        else:
+            if mtime in (registry.mtime, _failed_mtime):  # Unchanged, or the same broken file: logged once
+                return registry
+            try:
+                config = _read_config_file()
+            except Exception as e:
+                _failed_mtime = mtime
+                logger.error(f"Configuration reload failed, keeping the previous configuration: {e}")
+                return registry
+        _failed_mtime = None
+        # Compiled before it replaces the current registry, so readers see either the old or the new one
+        _REGISTRY = ConfigRegistry(config, next(_VERSIONS), mtime)
+        if registry is not None:
+            logger.info(f"Reloaded configuration from {_CONFIG_FILE_PATH} (version {_REGISTRY.version})")
+        return _REGISTRY
+
+
+def get_registry() -> ConfigRegistry:
+    """Returns the compiled configuration, reloading it first if config.yaml changed since the last check."""
+    registry = _REGISTRY
+    if registry is None or (registry.mtime is not None and time.monotonic() >= _next_reload_check):
+        registry = _reload_registry()
+    return registry
+
+
+def set_config(config: Dict, version: Optional[int] = None) -> ConfigRegistry:
+    """
+    Installs a configuration instead of config.yaml (parse pool workers, benchmarks).
+    It is not reloaded from the file.
+    """
+    global _REGISTRY
+    with _reload_lock:
+        _REGISTRY = ConfigRegistry(config, version if version is not None else next(_VERSIONS))
+        return _REGISTRY
+
+
+def load_config():
+    """Returns the configuration loaded from the YAML file (as parsed, see get_registry() for the compiled form)."""
+    return get_registry().config
 
 
 def get_default_config():
     """Returns the default configuration settings."""
-    config = load_config()
-    return config.get('default', {})
+    return get_registry().default
+
+
+def get_site_config(domain: str) -> Optional[SiteConfig]:
+    """Returns the compiled configuration of the site a domain belongs to, or None if it has none."""
+    return get_registry().site(domain)
+
+
+def get_discovery_site(url: str) -> Optional[SiteConfig]:
+    """Returns the site a configured feed or sitemap URL belongs to, or None if the URL is not one."""
+    return get_registry().discovery_sources.get(url)
 
 
 def get_website_config(domain: str):
     """
-    Returns website-specific configuration settings for a given domain.
+    Returns website-specific configuration settings for a given domain (matched as in ConfigRegistry.site).
     Returns an empty dictionary if no configuration is found for the domain.
     """
-    config = load_config()
-    return config.get('websites', {}).get(domain, {})
+    site = get_registry().site(domain)
+    return site.config if site is not None else {}
 
 
 def get_rate_limit_delay(domain: str = None):
     """Returns the rate limit delay, website-specific if available, otherwise default."""
-    website_cfg = get_website_config(domain) if domain else {}
-    return website_cfg.get('rate_limit_delay', get_default_config().get('rate_limit_delay', 1))
+    registry = get_registry()
+    site = registry.site(domain) if domain else None
+    return site.rate_limit_delay if site is not None else registry.default.get('rate_limit_delay', 1)
+
+
+def get_max_concurrency():
+    """Returns the maximum number of requests the crawler may have in flight at once."""
+    return get_default_config().get('max_concurrency', 16)
+
+
+def get_request_timeout():
+    """Returns the HTTP request timeout (in seconds) used by the crawler."""
+    return get_default_config().get('request_timeout', 30)
+
+
+def get_http_cache_dir():
+    """Returns the directory of the on-disk HTTP response cache, or None if caching is disabled."""
+    return get_default_config().get('http_cache_dir')
+
+
+def get_text_compression():
+    """Returns the codec article texts are stored with: zstd (zlib without the zstandard package), zlib or none."""
+    return get_default_config().get('text_compression', 'zstd')
+
+
+def get_archive_dir():
+    """Returns the directory of the fetched HTML archive, or None if pages are not archived."""
+    return get_default_config().get('archive_dir')
+
+
+def get_work_queue_enabled():
+    """Returns whether this process crawls from the shared work queue, with request pacing shared through the database."""
+    return bool(get_default_config().get('work_queue', False))
+
+
+def get_queue_lease_seconds():
+    """Returns how long a claimed work queue URL stays leased to a worker before others may retry it."""
+    return get_default_config().get('queue_lease_seconds', 300)
+
+
+def get_queue_max_attempts():
+    """Returns how often a work queue URL is tried before it is marked failed."""
+    return get_default_config().get('queue_max_attempts', 3)
+
+
+def get_job_workers():
+    """Returns the number of background crawl jobs that may run at the same time."""
+    return get_default_config().get('job_workers', 2)
+
+
+def get_parse_workers():
+    """Returns the number of processes parsing and classifying articles (0: parse in the API process)."""
+    return get_default_config().get('parse_workers', 0)
+
+
+def get_near_duplicate_threshold():
+    """
+    Returns the estimated text similarity (0-1) from which two articles count as near-duplicates,
+    or None if near-duplicate detection is disabled.
+    """
+    return get_default_config().get('near_duplicate_threshold', 0.8)
+
+
+def get_listing_poll_urls():
+    """
+    Returns the URLs to re-poll, in config order: a site's feeds and sitemaps (websites.[domain].discovery),
+    or its listing pages (websites.[domain].listing_page.poll_urls) if it has none.
+    """
+    return [url for site in get_registry().sites.values() for url in (site.discovery_urls or site.poll_urls)]
+
+
+def get_poll_interval_bounds():
+    """Returns the (min, max) interval in seconds between two polls of a listing page."""
+    default_config = get_default_config()
+    return default_config.get('poll_min_interval', 300), default_config.get('poll_max_interval', 21600)
 
 
 def get_categories():
     """Returns the categories configuration (default)."""
-    default_config = get_default_config()  # Get default config
-    return default_config.get('categories', {})  # Get from default_config
+    return get_registry().categories  # The same dict until the config is reloaded, so compiled indexes are reused
 
 
 def get_listing_page_config(domain: str):
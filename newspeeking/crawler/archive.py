@@ -0,0 +1,229 @@
+# Content-addressed archive of fetched HTML, for re-extracting stored articles without downloading them again.
+# Pages are appended to WARC segment files (one gzip member per record, so any record can be read on its own)
+# and located through an SQLite offset index: URL -> payload digest -> (segment, offset, length).
+# Identical pages are stored once; a URL whose page is already archived gets a small revisit record.
+import gzip
+import hashlib
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from newspeeking.config import get_archive_dir
+
+logger = logging.getLogger(__name__)
+
+try:  # POSIX: processes writing to the same archive directory take turns through a lock file
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+SEGMENT_MAX_BYTES = 1 << 30  # Segments are closed at about 1 GiB, the usual WARC file size
+INDEX_FILE = "index.sqlite3"
+LOCK_FILE = "write.lock"
+REVISIT_PROFILE = "http://netpreserve.org/warc/1.1/revisit/identical-payload-digest"
+_SEGMENT_PATTERN = re.compile(r"^newspeeking-(\d{5})\.warc\.gz$")
+_LOOKUP_BATCH_SIZE = 500
+
+# (segment file name, offset, compressed length) of one record
+RecordLocation = Tuple[str, int, int]
+
+
+def payload_digest(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def warc_record(headers: List[Tuple[str, str]], payload: bytes = b"") -> bytes:
+    """A gzip-compressed WARC/1.1 record."""
+    head = "WARC/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers)
+    head += f"Content-Length: {len(payload)}\r\n\r\n"
+    return gzip.compress(head.encode("utf-8") + payload + b"\r\n\r\n", compresslevel=6)
+
+
+def record_payload(record: bytes) -> bytes:
+    """The payload of an uncompressed WARC record."""
+    head, _, rest = record.partition(b"\r\n\r\n")
+    for line in head.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            return rest[:int(value)]
+    raise ValueError("WARC record without Content-Length")
+
+
+class HtmlArchive:
+    """
+    An archive directory: WARC segments plus the offset index. put() may be called from several threads and,
+    where fcntl is available, several processes: each append and its index entry are written under an exclusive
+    lock on the directory's lock file (without fcntl, a directory must have only one writing process).
+    Records are read through memory maps of the segments.
+    """
+
+    def __init__(self, archive_dir: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index: Optional[sqlite3.Connection] = None
+        self._segment_name: Optional[str] = None
+        self._segment_file = None
+        self._lock_file = None
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    def _get_index(self) -> sqlite3.Connection:
+        if self._index is None:
+            index = sqlite3.connect(os.path.join(self.archive_dir, INDEX_FILE), check_same_thread=False)
+            index.execute("PRAGMA journal_mode=WAL")  # Re-extraction can read while the crawler writes
+            index.execute("CREATE TABLE IF NOT EXISTS payloads "
+                          "(digest TEXT PRIMARY KEY, segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)")
+            index.execute("CREATE TABLE IF NOT EXISTS captures "
+                          "(url TEXT PRIMARY KEY, digest TEXT NOT NULL, fetched_at TEXT NOT NULL)")
+            self._index = index
+        return self._index
+
+    @contextmanager
+    def _write_lock(self):
+        """Excludes the other processes writing to the archive directory. Called with self._lock held."""
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(os.path.join(self.archive_dir, LOCK_FILE), "ab")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _segment_for_append(self):
+        """The open segment to append to, starting a new one when it is full."""
+        # The size is read from the end of the file: other processes may have appended to it
+        if self._segment_file is not None and self._segment_file.seek(0, os.SEEK_END) >= self.segment_max_bytes:
+            self._segment_file.close()
+            self._segment_file = None
+        if self._segment_file is None:
+            numbers = [int(match.group(1)) for match in map(_SEGMENT_PATTERN.match, os.listdir(self.archive_dir))
+                       if match]
+            number = max(numbers, default=0)
+            name = f"newspeeking-{number:05d}.warc.gz"
+            path = os.path.join(self.archive_dir, name)
+            if numbers and os.path.getsize(path) >= self.segment_max_bytes:
+                name = f"newspeeking-{number + 1:05d}.warc.gz"
+            self._segment_name = name
+            self._segment_file = open(os.path.join(self.archive_dir, name), "ab")
+        return self._segment_name, self._segment_file
+
+    def _append(self, record: bytes) -> RecordLocation:
+        name, segment = self._segment_for_append()
+        offset = segment.seek(0, os.SEEK_END)
+        segment.write(record)
+        segment.flush()
+        return name, offset, len(record)
+
+    def put(self, url: str, html: str, fetched_at: Optional[datetime] = None) -> str:
+        """Archives a fetched page. Returns its payload digest."""
+        payload = html.encode("utf-8")
+        digest = payload_digest(payload)
+        fetched_at = (fetched_at or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        headers = [("WARC-Target-URI", url), ("WARC-Date", fetched_at),
+                   ("WARC-Record-ID", f"<urn:uuid:{uuid.uuid4()}>"), ("WARC-Payload-Digest", f"sha256:{digest}")]
+        with self._lock, self._write_lock():
+            index = self._get_index()
+            previous = index.execute("SELECT digest FROM captures WHERE url = ?", (url,)).fetchone()
+            if previous is not None and previous[0] == digest:
+                return digest  # Unchanged since the last capture
+            stored = index.execute("SELECT 1 FROM payloads WHERE digest = ?", (digest,)).fetchone()
+            if stored is None:
+                location = self._append(warc_record(
+                    [("WARC-Type", "resource")] + headers + [("Content-Type", "text/html; charset=utf-8")], payload))
+                index.execute("INSERT INTO payloads (digest, segment, offset, length) VALUES (?, ?, ?, ?)",
+                              (digest, *location))
+            else:
+                self._append(warc_record(
+                    [("WARC-Type", "revisit")] + headers + [("WARC-Profile", REVISIT_PROFILE)]))
+            index.execute("INSERT OR REPLACE INTO captures (url, digest, fetched_at) VALUES (?, ?, ?)",
+                          (url, digest, fetched_at))
+            index.commit()
+        return digest
+
+    def locate(self, urls: Iterable[str]) -> Dict[str, RecordLocation]:
+        """Where the latest capture of each URL is stored. URLs that are not archived are left out."""
+        urls = list(urls)
+        locations = {}
+        with self._lock:
+            index = self._get_index()
+            for start in range(0, len(urls), _LOOKUP_BATCH_SIZE):
+                batch = urls[start:start + _LOOKUP_BATCH_SIZE]
+                rows = index.execute(
+                    "SELECT captures.url, payloads.segment, payloads.offset, payloads.length "
+                    "FROM captures JOIN payloads ON payloads.digest = captures.digest "
+                    f"WHERE captures.url IN ({', '.join('?' * len(batch))})", batch)
+                locations.update((url, (segment, offset, length)) for url, segment, offset, length in rows)
+        return locations
+
+    def read(self, location: RecordLocation) -> str:
+        """The archived page at a location returned by locate(). Not thread-safe (one reader per process)."""
+        segment, offset, length = location
+        segment_map = self._maps.get(segment)
+        if segment_map is None or offset + length > len(segment_map):  # Not mapped yet, or grown since
+            if segment_map is not None:
+                segment_map.close()
+            with open(os.path.join(self.archive_dir, segment), "rb") as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        with memoryview(segment_map) as view:
+            record = zlib.decompress(view[offset:offset + length], wbits=31)  # 31: gzip member
+        return record_payload(record).decode("utf-8")
+
+    def get(self, url: str) -> Optional[str]:
+        """The latest archived copy of a page, or None if it is not archived."""
+        location = self.locate([url]).get(url)
+        return self.read(location) if location is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            for segment_map in self._maps.values():
+                segment_map.close()
+            self._maps.clear()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+
+_ARCHIVE: Optional[HtmlArchive] = None
+_ARCHIVE_LOCK = threading.Lock()
+
+
+def get_archive() -> Optional[HtmlArchive]:
+    """Returns the archive configured with `archive_dir`, or None if archiving is disabled."""
+    global _ARCHIVE
+    archive_dir = get_archive_dir()
+    if not archive_dir:
+        return None
+    if _ARCHIVE is None or _ARCHIVE.archive_dir != archive_dir:
+        with _ARCHIVE_LOCK:
+            if _ARCHIVE is None or _ARCHIVE.archive_dir != archive_dir:
+                if _ARCHIVE is not None:
+                    _ARCHIVE.close()
+                _ARCHIVE = HtmlArchive(archive_dir)
+    return _ARCHIVE
+
+
+def close_archive():
+    global _ARCHIVE
+    if _ARCHIVE is not None:
+        _ARCHIVE.close()
+        _ARCHIVE = None
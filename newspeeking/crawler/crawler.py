@@ -2,19 +2,27 @@
 from bs4 import BeautifulSoup
 import requests
 import validators
-import time
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Optional, Dict
+import time
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 from urllib.parse import urljoin, urlparse
 
-from newspeeking.config import get_rate_limit_delay, get_categories, get_website_config, get_listing_page_config
+from newspeeking import metrics
+from newspeeking.config import compile_url_pattern, get_categories, get_discovery_site, get_website_config
 from newspeeking.crawler.extractors import extract_article_data
+from newspeeking.crawler.fetcher import CrawlFetcher, FetchResult
+from newspeeking.crawler.parse_pool import parse_pool
+from newspeeking.crawler.profiles import get_extraction_profile
 from newspeeking.nlp.classifier import classify_article
 
 logger = logging.getLogger(__name__)
 
+PARSE_VERSION = 1  # Bump when extraction or classification code changes, so cached parse results are not reused
 
-def crawl_website(url: str, crawl_articles: bool = False) -> Optional[Dict | List[Dict]]:
+async def crawl_website(url: str, crawl_articles: bool = False) -> Optional[Dict | List[Dict]]:
     """
     Crawls a news website URL.
     If crawl_articles=False (default): Extracts and returns a list of article URLs from a listing page (if it's a listing page).
@@ -23,36 +31,35 @@ def crawl_website(url: str, crawl_articles: bool = False) -> Optional[Dict | Lis
     domain = urlparse(url).netloc  # Extract domain to get website-specific config
     # Get website-specific configurations
     website_config = get_website_config(domain)
-    # Get website-specific rate limit delay
-    rate_limit_delay = get_rate_limit_delay(domain)
-    categories = get_categories()  # Categories are still default for now
 
     try:
         if not validators.url(url):
             raise ValueError("Invalid URL format")
 
-        response = requests.get(
-            url, headers={'User-Agent': 'NewsCrawlerAPI/1.0'})
-        response.raise_for_status()
-        time.sleep(rate_limit_delay)
-
-        if not crawl_articles:  # Default mode: List article URLs from listing page
-            article_urls = extract_article_urls_from_listing_page(
-                url, website_config)
-            return article_urls
-        else:  # crawl_articles=True mode: Crawl and extract article data
-            article_data = extract_article_data(
-                url, response.text, website_config)
-            # Check if article text was extracted
-            if not article_data["article_text"]:
-                logger.warning(f"No article text extracted from {url}")
-                return None
-
-            category = classify_article(
-                article_data["article_text"], categories)
-            article_data["category"] = category
-            article_data["url"] = url
-            return article_data
+        site = get_discovery_site(url)
+        if site is not None:  # Configured feed or sitemap: every article it lists
+            # Imported here: discovery uses the database, which parse workers importing this module must not open
+            from newspeeking.crawler.discovery import discover_articles
+            article_urls = (await discover_articles(url, site, only_new=False)).article_urls
+            if not crawl_articles:
+                return article_urls
+            return [article_data async for _, article_data in iter_crawled_articles(article_urls) if article_data]
+
+        fetcher = CrawlFetcher()  # Each URL is downloaded at most once per crawl
+        try:
+            page = await fetcher.fetch(url)
+
+            if not crawl_articles:  # Default mode: List article URLs from listing page
+                return listing_article_urls(page, website_config)
+
+            if is_listing_page(url, website_config):  # Listing page: crawl every linked article concurrently
+                article_urls = listing_article_urls(page, website_config)
+                return [article_data async for _, article_data in iter_crawled_articles(article_urls, website_config, fetcher) if article_data]
+
+            # Single article page: reuse the page fetched above
+            return await page_article_data(page, website_config)
+        finally:
+            fetcher.close()
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Request error for URL {url}: {e}")
@@ -65,53 +72,140 @@ def crawl_website(url: str, crawl_articles: bool = False) -> Optional[Dict | Lis
         return None
 
 
-def extract_article_urls_from_listing_page(listing_url: str, website_config: Dict) -> List[str]:
+def build_article_data(url: str, html: str, website_config: Dict) -> Optional[Dict]:
+    """Extracts and classifies an article page. Returns None if no article text was found."""
+    domain = urlparse(url).netloc
+    started = time.perf_counter()
+    try:
+        article_data = extract_article_data(url, html, website_config)
+    except Exception:
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - started, domain, "article", "error")
+        metrics.EXTRACTION_FAILURES.inc(domain, "error")
+        raise
+    extracted = time.perf_counter()
+    # Check if article text was extracted
+    if not article_data["article_text"]:
+        metrics.PARSE_SECONDS.observe(extracted - started, domain, "article", "no_text")
+        metrics.EXTRACTION_FAILURES.inc(domain, "no_text")
+        logger.warning(f"No article text extracted from {url}")
+        return None
+    metrics.PARSE_SECONDS.observe(extracted - started, domain, "article", "ok")
+
+    article_data["category"] = classify_article(
+        article_data["article_text"], get_categories())  # Categories are still default for now
+    metrics.CLASSIFY_SECONDS.observe(time.perf_counter() - extracted, domain)
+    article_data["url"] = url
+    return article_data
+
+
+async def page_article_data(page: FetchResult, website_config: Dict) -> Optional[Dict]:
+    """
+    Article data for a fetched page, parsed and classified on the parse pool.
+    Pages unchanged since the last crawl are not parsed again, unless the site configuration or categories changed.
+    """
+    return await page.derived_async('article', config_fingerprint(website_config, get_categories()),
+                                    lambda html: parse_pool.build_article_data(page.url, html, website_config))
+
+
+def listing_article_urls(page: FetchResult, website_config: Dict) -> List[str]:
+    """Article URLs for a fetched listing page; pages unchanged since the last crawl (and config) are not parsed again."""
+    return page.derived('article_urls', config_fingerprint(website_config),
+                        lambda html: parse_article_urls(page.url, html, website_config))
+
+
+def config_fingerprint(website_config: Dict, categories: Optional[Dict] = None) -> str:
+    """Hash of the configuration a parse result depends on, so results cached with a page are redone after a config change."""
+    payload = json.dumps([PARSE_VERSION, website_config, categories], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+async def crawl_article(url: str, website_config: Optional[Dict] = None, fetcher: Optional[CrawlFetcher] = None) -> Optional[Dict]:
+    """Fetches, extracts and classifies a single article page. Returns None on failure."""
+    if website_config is None:
+        website_config = get_website_config(urlparse(url).netloc)
+    fetcher = fetcher or CrawlFetcher()
+    try:
+        page = await fetcher.fetch(url)
+        return await page_article_data(page, website_config)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error for article URL {url}: {e}")
+    except Exception as e:
+        logger.error(f"Crawling error for article URL {url}: {e}")
+    return None
+
+
+async def iter_crawled_articles(article_urls: List[str], website_config: Optional[Dict] = None, fetcher: Optional[CrawlFetcher] = None) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+    """
+    Crawls article URLs concurrently and yields (url, article_data) pairs as they complete.
+    article_data is None for articles that failed to download or had no extractable text.
+    """
+    own_fetcher = fetcher is None
+    fetcher = fetcher or CrawlFetcher()
+
+    async def crawl_one(article_url: str) -> Tuple[str, Optional[Dict]]:
+        return article_url, await crawl_article(article_url, website_config, fetcher)
+
+    tasks = [asyncio.create_task(crawl_one(article_url))
+             for article_url in article_urls]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:  # Consumer stopped early (or was cancelled): don't leave fetches running
+        for task in tasks:
+            task.cancel()
+        if own_fetcher:
+            fetcher.close()
+
+
+async def iter_website_articles(url: str) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+    """
+    Crawls the articles of a listing page or a configured feed or sitemap (or a single article page) and yields (url, article_data) pairs
+    as each article completes. article_data is None for articles that could not be crawled.
+    Errors fetching the URL itself are raised.
+    """
+    website_config = get_website_config(urlparse(url).netloc)
+    if not validators.url(url):
+        raise ValueError("Invalid URL format")
+
+    fetcher = CrawlFetcher()
+    try:
+        site = get_discovery_site(url)
+        if site is not None:
+            from newspeeking.crawler.discovery import discover_articles  # Imported here: see crawl_website
+            discovery = await discover_articles(url, site, only_new=False, fetcher=fetcher)
+            async for article_url, article_data in iter_crawled_articles(discovery.article_urls, fetcher=fetcher):
+                yield article_url, article_data
+            return
+        page = await fetcher.fetch(url)
+        if is_listing_page(url, website_config):
+            article_urls = listing_article_urls(page, website_config)
+            async for article_url, article_data in iter_crawled_articles(article_urls, website_config, fetcher):
+                yield article_url, article_data
+        else:
+            yield url, await page_article_data(page, website_config)
+    finally:  # Client disconnected from a streaming crawl: stop the downloads still pending
+        fetcher.close()
+
+
+def is_listing_page(url: str, website_config: Dict) -> bool:
+    """
+    Guesses whether a URL is a listing page: when the site defines `url_pattern_inclusion` or `url_pattern_regex`,
+    URLs that don't match it are not article pages. Without a pattern, URLs are treated as articles.
+    """
+    url_pattern = get_extraction_profile(website_config).url_pattern
+    return url_pattern is not None and not url_pattern.search(url)
+
+
+async def extract_article_urls_from_listing_page(listing_url: str, website_config: Dict) -> List[str]:
     """
     Extracts article URLs from a news website listing page, using website-specific configurations.
     """
-    article_urls = []
     try:
         if not validators.url(listing_url):
             raise ValueError("Invalid listing page URL format")
 
-        response = requests.get(listing_url, headers={
-                                'User-Agent': 'NewsCrawlerAPI/1.0'})
-        response.raise_for_status()
-        # Use website-specific rate limit for listing page
-        time.sleep(get_rate_limit_delay(urlparse(listing_url).netloc))
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Get listing page selectors from config
-        listing_page_config = website_config.get('listing_page', {})
-
-        # Default to all <a> tags if no selector in config
-        article_link_selectors = listing_page_config.get(
-            'article_link_selectors', ["a"])
-        found_links = False
-        for selector in article_link_selectors:
-            article_link_tags = soup.select(selector)
-            if article_link_tags:
-                found_links = True
-                for link_tag in article_link_tags:
-                    href = link_tag.get('href')
-                    if href:
-                        absolute_url = urljoin(listing_url, href)
-                        url_pattern_inclusion = listing_page_config.get(
-                            'url_pattern_inclusion')
-                        if url_pattern_inclusion:
-                            # Handle single pattern string
-                            if isinstance(url_pattern_inclusion, str):
-                                if url_pattern_inclusion in absolute_url:
-                                    article_urls.append(absolute_url)
-                            # Handle list of pattern strings
-                            elif isinstance(url_pattern_inclusion, list):
-                                for pattern in url_pattern_inclusion:
-                                    if pattern in absolute_url:
-                                        article_urls.append(absolute_url)
-                                        break  # Avoid adding the same URL multiple times if it matches multiple patterns
-
-                if found_links:  # If links were found with a selector, stop using other selectors
-                    break  # Move to the next selector if no links found
+        page = await CrawlFetcher().fetch(listing_url)
+        return listing_article_urls(page, website_config)
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Request error for listing page URL {listing_url}: {e}")
@@ -121,4 +215,50 @@ def extract_article_urls_from_listing_page(listing_url: str, website_config: Dic
         logger.error(
             f"Error extracting article URLs from listing page {listing_url}: {e}")
 
-    return list(set(article_urls))
+    return []
+
+
+def parse_article_urls(listing_url: str, html: str, website_config: Dict) -> List[str]:
+    """
+    Extracts article URLs from already-downloaded listing page HTML, using the website's
+    precompiled extraction profile. Falls back to plain BeautifulSoup parsing if the profile cannot be used.
+    """
+    domain = urlparse(listing_url).netloc
+    started = time.perf_counter()
+    try:
+        article_urls = get_extraction_profile(website_config).extract_article_urls(listing_url, html)
+        outcome = "ok"
+    except Exception as e:
+        logger.warning(
+            f"Extraction profile failed for listing page {listing_url}, falling back to BeautifulSoup: {e}")
+        article_urls = parse_article_urls_soup(listing_url, html, website_config)
+        outcome = "fallback"
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - started, domain, "listing", outcome)
+    return article_urls
+
+
+def parse_article_urls_soup(listing_url: str, html: str, website_config: Dict) -> List[str]:
+    """
+    Extracts article URLs by parsing the whole listing page with html.parser.
+    """
+    article_urls = []
+    soup = BeautifulSoup(html, 'html.parser')
+    # Get listing page selectors from config
+    listing_page_config = website_config.get('listing_page', {})
+
+    # Default to all <a> tags if no selector in config
+    article_link_selectors = listing_page_config.get(
+        'article_link_selectors', ["a"])
+    url_pattern = compile_url_pattern(listing_page_config)
+    for selector in article_link_selectors:
+        article_link_tags = soup.select(selector)
+        if article_link_tags:
+            for link_tag in article_link_tags:
+                href = link_tag.get('href')
+                if href:
+                    absolute_url = urljoin(listing_url, href)
+                    if url_pattern is None or url_pattern.search(absolute_url):
+                        article_urls.append(absolute_url)
+            break  # Links were found with this selector, stop using other selectors
+
+    return list(dict.fromkeys(article_urls))  # Deduplicate, keeping page order
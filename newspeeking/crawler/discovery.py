@@ -0,0 +1,374 @@
+# Article discovery from RSS/Atom feeds and XML sitemaps (websites.[domain].discovery), instead of scraping
+# HTML listing pages. Feeds and sitemaps are downloaded as a stream and parsed incrementally with a pull
+# parser, so a large sitemap is never held in memory as a document. The dates they give (<lastmod>, <pubDate>,
+# <updated>) are kept in discovered_urls: a poll only returns articles that are new or changed since they
+# were last seen, and sitemaps of an index whose <lastmod> did not change are not downloaded again.
+# If a site's feed or sitemap cannot be read, its HTML listing pages (listing_page.poll_urls) are scraped instead.
+import asyncio
+import logging
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from dateutil import parser as date_parser
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from newspeeking import metrics
+from newspeeking.config import SiteConfig, get_request_timeout
+from newspeeking.crawler.fetcher import CrawlFetcher, get_session
+from newspeeking.crawler.frontier import frontier
+from newspeeking.crawler.scheduler import get_scheduler
+from newspeeking.db.database import UPSERT_BATCH_SIZE, DiscoveredUrlDB, DiscoverySourceDB, SessionLocal, utcnow
+
+try:  # Faster, and never resolves external entities
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    from xml.etree import ElementTree as etree
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024  # Bytes read from the response and fed to the parser at a time
+MAX_SOURCES_PER_DISCOVERY = 50  # Sitemaps read per discovery of a sitemap index (most recently changed first)
+XML_ERRORS = (etree.XMLSyntaxError,) if LXML_AVAILABLE else (etree.ParseError,)
+
+_ENTRY_TAGS = {"url", "sitemap", "item", "entry"}  # Sitemap <url>, sitemap index <sitemap>, RSS <item>, Atom <entry>
+_DATE_TAGS = {"lastmod", "pubDate", "updated", "published", "publication_date"}  # publication_date: news sitemaps
+
+
+class FeedEntry(NamedTuple):
+    url: str
+    lastmod: Optional[datetime]  # Newest date given for the entry (naive UTC)
+    is_sitemap: bool = False  # A sitemap listed by a sitemap index
+
+
+@dataclass
+class DiscoveryResult:
+    found: int = 0  # Article URLs listed by the feed or sitemap (or the listing pages)
+    new_urls: List[str] = field(default_factory=list)  # Not stored yet
+    changed_urls: List[str] = field(default_factory=list)  # Stored, with a newer date than when last seen
+    fallback: bool = False  # The HTML listing pages were scraped instead
+
+    @property
+    def article_urls(self) -> List[str]:
+        return self.new_urls + self.changed_urls
+
+
+def local_name(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def namespace(tag) -> str:
+    return tag[1:].split("}", 1)[0] if isinstance(tag, str) and tag.startswith("{") else ""
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """W3C (sitemaps, Atom) or RFC 822 (RSS) date as naive UTC; None if it cannot be parsed."""
+    if not value or not value.strip():
+        return None
+    value = value.strip()
+    try:  # The standard formats are parsed directly; dateutil (much slower) handles the rest
+        parsed = datetime.fromisoformat(value) if value[0].isdigit() else parsedate_to_datetime(value)
+    except (ValueError, TypeError, IndexError):
+        try:
+            parsed = date_parser.parse(value)
+        except (ValueError, OverflowError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _pull_parser():
+    if LXML_AVAILABLE:
+        return etree.XMLPullParser(events=("start", "end"), resolve_entities=False, no_network=True)
+    return etree.XMLPullParser(events=("start", "end"))
+
+
+def iter_feed_entries(chunks: Iterable[bytes], base_url: str = "") -> Iterator[FeedEntry]:
+    """
+    Parses an RSS, Atom, sitemap or sitemap index document incrementally from byte chunks and yields its entries.
+    Each entry's element is cleared once read, so memory use does not grow with the document.
+    Only an entry's own child elements are read (and the dates of a news sitemap's <news:news>): the URLs
+    of <image:image>, <video:video> and other extensions inside a sitemap <url> are not the entry's.
+    """
+    parser = _pull_parser()
+    fields: Dict[str, object] = {}
+    path: List[str] = []  # Tags of the open elements
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _read_entries(parser, fields, path, base_url)
+    parser.close()  # Raises on a truncated document
+    yield from _read_entries(parser, fields, path, base_url)
+
+
+def _read_entries(parser, fields: Dict[str, object], path: List[str], base_url: str) -> Iterator[FeedEntry]:
+    for event, element in parser.read_events():
+        name = local_name(element.tag)
+        if event == "start":
+            path.append(element.tag)
+            if name in _ENTRY_TAGS:
+                fields.clear()  # Channel-level <link> and dates are not an entry's
+            continue
+        path.pop()
+        parent = path[-1] if path else None
+        in_entry = local_name(parent) in _ENTRY_TAGS  # A direct child of the entry
+        if not in_entry and not (name in _DATE_TAGS and local_name(parent) == "news"):
+            if name in _ENTRY_TAGS:
+                yield from _end_entry(element, name, fields, base_url)
+            continue
+        text = (element.text or "").strip()
+        if name == "loc":
+            if namespace(element.tag) == namespace(parent):  # Not an <image:loc> or similar
+                fields["url"] = text
+        elif name == "link":
+            href = element.get("href")
+            if href is None:  # RSS: the URL is the text
+                fields.setdefault("url", text)
+            elif element.get("rel", "alternate") == "alternate":  # Atom: not rel="self", "edit", ...
+                fields["url"] = href
+        elif name == "guid" and element.get("isPermaLink", "true") != "false":
+            fields.setdefault("guid", text)
+        elif name in _DATE_TAGS:
+            date = parse_date(text)
+            if date is not None and (fields.get("lastmod") is None or date > fields["lastmod"]):
+                fields["lastmod"] = date
+
+
+def _end_entry(element, name: str, fields: Dict[str, object], base_url: str) -> Iterator[FeedEntry]:
+    url = fields.get("url") or fields.get("guid")
+    if url:
+        yield FeedEntry(urljoin(base_url, url), fields.get("lastmod"), name == "sitemap")
+    fields.clear()
+    element.clear()
+    if LXML_AVAILABLE:  # Also drop the cleared entries the root still references
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def _gunzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decompresses a .gz sitemap served as a file (no Content-Encoding); passes other documents through."""
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            decompressor = zlib.decompressobj(wbits=31) if chunk[:2] == b"\x1f\x8b" else False
+        yield decompressor.decompress(chunk) if decompressor else chunk
+
+
+@dataclass
+class SourceRead:
+    entries: List[FeedEntry] = field(default_factory=list)
+    not_modified: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def read_source_sync(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceRead:
+    """
+    Downloads a feed or sitemap as a stream and parses it while it arrives, revalidating with the
+    validators of the last read. Raises requests exceptions on HTTP errors and XML_ERRORS on invalid documents.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    domain = urlparse(url).netloc
+    started = time.perf_counter()
+    waited = 0.0  # Seconds spent waiting for the network, the rest is parsing
+    received = 0
+
+    def network_chunks(response) -> Iterator[bytes]:
+        nonlocal waited, received
+        chunks = response.iter_content(CHUNK_SIZE)  # Content-Encoding is decoded here
+        while True:
+            chunk_started = time.perf_counter()
+            chunk = next(chunks, None)
+            waited += time.perf_counter() - chunk_started
+            if chunk is None:
+                return
+            received += len(chunk)
+            yield chunk
+
+    try:
+        with get_session().get(url, headers=headers, timeout=get_request_timeout(), stream=True) as response:
+            metrics.HTTP_RESPONSES.inc(domain, str(response.status_code))
+            if response.status_code == 304:
+                metrics.FETCH_SECONDS.observe(time.perf_counter() - started, domain, "not_modified")
+                return SourceRead(not_modified=True, etag=etag, last_modified=last_modified)
+            if not response.ok:
+                metrics.FETCH_SECONDS.observe(time.perf_counter() - started, domain, "http_error")
+                response.raise_for_status()
+            waited = time.perf_counter() - started
+            try:
+                entries = list(iter_feed_entries(_gunzip(network_chunks(response)), url))
+            except XML_ERRORS + (zlib.error,):
+                metrics.PARSE_SECONDS.observe(time.perf_counter() - started - waited, domain, "feed", "error")
+                raise
+            result = SourceRead(entries, etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified'))
+    except requests.exceptions.HTTPError:  # Observed above
+        raise
+    except requests.exceptions.RequestException:
+        metrics.FETCH_SECONDS.observe(time.perf_counter() - started, domain, "error")
+        raise
+    metrics.FETCH_SECONDS.observe(waited, domain, "ok")
+    metrics.FETCH_BYTES.observe(received, domain)
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - started - waited, domain, "feed", "ok")
+    return result
+
+
+async def read_source(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceRead:
+    """read_source_sync in a thread, after a concurrency slot and the domain's rate limit token."""
+    domain = urlparse(url).netloc
+    waiting_since = time.perf_counter()
+    async with get_scheduler().slot(domain):
+        metrics.RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - waiting_since, domain)
+        return await asyncio.to_thread(read_source_sync, url, etag, last_modified)
+
+
+async def read_feed_entries(db: Session, source_url: str, conditional: bool = True) -> List[FeedEntry]:
+    """
+    Reads a feed or sitemap, following a sitemap index to the sitemaps changed since they were last read.
+    Returns the article entries. Errors reading source_url itself are raised; a failed sitemap of an index is skipped.
+    The sources' new validators and dates are added to the session for the caller to commit once it has recorded
+    the entries. With conditional=False, everything is read in full (no conditional GET, no sitemap skipped)
+    and the sources' state is left as it is.
+    """
+    pending: List[Tuple[str, Optional[datetime]]] = [(source_url, None)]
+    articles: List[FeedEntry] = []
+    reads = 0
+    complete = True  # Every sitemap of an index was read
+    root_state = None
+    while pending and reads < MAX_SOURCES_PER_DISCOVERY:
+        url, lastmod = pending.pop(0)
+        state = await asyncio.to_thread(db.get, DiscoverySourceDB, url) if conditional else None
+        if lastmod is not None and state is not None and state.lastmod is not None and lastmod <= state.lastmod:
+            continue  # Unchanged since it was last read
+        reads += 1
+        try:
+            read = await read_source(url, state.etag if state else None, state.last_modified if state else None)
+        except (requests.exceptions.RequestException,) + XML_ERRORS + (zlib.error,) as e:
+            if url == source_url:
+                raise
+            logger.error(f"Cannot read sitemap {url}: {e}")
+            complete = False
+            continue
+        if conditional:
+            if state is None:
+                state = DiscoverySourceDB(url=url)
+                db.add(state)
+            if url == source_url:
+                root_state = state
+            state.etag, state.last_modified = read.etag, read.last_modified
+            state.lastmod = lastmod or state.lastmod
+            state.checked_at = utcnow()
+        sitemaps = [entry for entry in read.entries if entry.is_sitemap]
+        articles.extend(entry for entry in read.entries if not entry.is_sitemap)
+        # Most recently changed sitemaps first: news sites add articles to the newest ones
+        sitemaps.sort(key=lambda entry: entry.lastmod or datetime.min, reverse=True)
+        pending.extend((entry.url, entry.lastmod) for entry in sitemaps)
+    if pending:
+        logger.warning(f"Discovery of {source_url} stopped after {reads} sitemaps, {len(pending)} left for the next poll")
+        complete = False
+    if not complete and root_state is not None:  # A 304 for the index next time would skip the sitemaps left
+        root_state.etag = root_state.last_modified = None
+    return articles
+
+
+def select_new_or_changed(db: Session, entries: List[FeedEntry], result: DiscoveryResult):
+    """
+    Sorts article entries into new URLs (not stored) and changed URLs (stored, dated later than the
+    date last seen for them), and records the entries' dates. The caller commits.
+    """
+    dates: Dict[str, Optional[datetime]] = {}
+    for entry in entries:
+        if entry.url not in dates or (entry.lastmod and (dates[entry.url] is None or entry.lastmod > dates[entry.url])):
+            dates[entry.url] = entry.lastmod
+    urls = list(dates)
+    unseen = set(frontier.unseen(db, urls))
+    for start in range(0, len(urls), UPSERT_BATCH_SIZE):
+        batch = urls[start:start + UPSERT_BATCH_SIZE]
+        known = dict(db.execute(select(DiscoveredUrlDB.url, DiscoveredUrlDB.lastmod).where(
+            DiscoveredUrlDB.url.in_(batch))).all())
+        for url in batch:
+            if url in unseen:
+                result.new_urls.append(url)
+            elif dates[url] is not None and url in known and dates[url] > known[url]:
+                result.changed_urls.append(url)
+        _record_dates(db, [{"url": url, "lastmod": dates[url]} for url in batch
+                           if dates[url] is not None and (url not in known or dates[url] > known[url])])
+
+
+def _record_dates(db: Session, rows: List[Dict]):
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            db.merge(DiscoveredUrlDB(**row))
+        db.flush()
+        return
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    statement = insert(DiscoveredUrlDB.__table__)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[DiscoveredUrlDB.url], set_={"lastmod": statement.excluded.lastmod},
+        where=DiscoveredUrlDB.lastmod < statement.excluded.lastmod), rows)
+
+
+async def discover_articles(source_url: str, site: SiteConfig, only_new: bool = True,
+                            fetcher: Optional[CrawlFetcher] = None) -> DiscoveryResult:
+    """
+    Article URLs listed by a feed or sitemap of a site, limited to the site's article URL patterns.
+    With only_new, only articles that are not stored or changed since they were last seen are returned;
+    otherwise all of them, as new_urls, read in full and without recording anything as seen.
+    If the feed cannot be read, the site's listing pages are scraped instead.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            entries = await read_feed_entries(db, source_url, conditional=only_new)
+        except (requests.exceptions.RequestException,) + XML_ERRORS + (zlib.error,) as e:
+            await asyncio.to_thread(db.rollback)
+            if not site.poll_urls:
+                raise ValueError(f"Cannot read feed or sitemap {source_url}: {e}") from e
+            logger.warning(f"Cannot read {source_url}, scraping the listing pages of {site.domain} instead: {e}")
+            return await scrape_listing_pages(db, site, only_new, fetcher or CrawlFetcher())
+        if site.url_pattern is not None:
+            entries = [entry for entry in entries if site.url_pattern.search(entry.url)]
+        result = DiscoveryResult()
+        result.found = len({entry.url for entry in entries})
+        if not only_new:
+            result.new_urls = list(dict.fromkeys(entry.url for entry in entries))
+            return result
+        await asyncio.to_thread(select_new_or_changed, db, entries, result)
+        await asyncio.to_thread(db.commit)  # The entries' dates and the sources' validators together
+        logger.info(f"Discovered {len(result.new_urls)} new and {len(result.changed_urls)} changed articles "
+                    f"of {result.found} in {source_url}")
+        return result
+    finally:
+        db.close()
+
+
+async def scrape_listing_pages(db: Session, site: SiteConfig, only_new: bool, fetcher: CrawlFetcher) -> DiscoveryResult:
+    """Fallback discovery: the article links of the site's HTML listing pages."""
+    from newspeeking.crawler.crawler import listing_article_urls  # Imported here: crawler imports this module
+    result = DiscoveryResult(fallback=True)
+    urls: List[str] = []
+    for listing_url in site.poll_urls:
+        try:
+            urls.extend(listing_article_urls(await fetcher.fetch(listing_url), site.config))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Cannot scrape listing page {listing_url}: {e}")
+    urls = list(dict.fromkeys(urls))
+    result.found = len(urls)
+    result.new_urls = await asyncio.to_thread(frontier.unseen, db, urls) if only_new else urls
+    return result
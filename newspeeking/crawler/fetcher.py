@@ -0,0 +1,242 @@
+# Shared HTTP fetch layer: pooled session, conditional-GET response cache and per-crawl deduplication.
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from newspeeking import metrics
+from newspeeking.config import get_http_cache_dir, get_max_concurrency, get_request_timeout
+from newspeeking.crawler.archive import get_archive
+from newspeeking.crawler.scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'NewsCrawlerAPI/1.0'
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Results computed from `body` (e.g. extracted article URLs) as [configuration fingerprint, value],
+    # reused when the page is not modified and the configuration is unchanged
+    derived: Dict[str, Any] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """
+    On-disk response cache keyed by URL. Only responses carrying an ETag or
+    Last-Modified header are stored, since they are the ones that can be revalidated.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.json.gz')
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        try:
+            with gzip.open(self._path(url), 'rt', encoding='utf-8') as f:
+                return CacheEntry(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:  # Corrupt entry: treat as a miss
+            logger.warning(f"Ignoring unreadable cache entry for {url}: {e}")
+            return None
+
+    def put(self, entry: CacheEntry):
+        path = self._path(entry.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(entry.__dict__, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {entry.url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    text: str
+    not_modified: bool = False  # True when the server answered 304 and `text` came from the cache
+    cache_entry: Optional[CacheEntry] = None
+
+    def derived(self, key: str, fingerprint: str, compute):
+        """
+        Returns `compute(text)`, reusing the value cached for this page when the server
+        reported it unchanged, so unmodified pages are not parsed again. The cached value is only
+        reused if it was computed with the same `fingerprint` (of the configuration `compute` depends on).
+        """
+        if self._has_derived(key, fingerprint):
+            return self.cache_entry.derived[key][1]
+        value = compute(self.text)
+        self._store_derived(key, fingerprint, value)
+        return value
+
+    async def derived_async(self, key: str, fingerprint: str, compute):
+        """Like `derived`, for a coroutine function `compute` (e.g. parsing on the parse pool)."""
+        if self._has_derived(key, fingerprint):
+            return self.cache_entry.derived[key][1]
+        value = await compute(self.text)
+        self._store_derived(key, fingerprint, value)
+        return value
+
+    def _has_derived(self, key: str, fingerprint: str) -> bool:
+        if not self.not_modified or self.cache_entry is None:
+            return False
+        cached = self.cache_entry.derived.get(key)
+        return isinstance(cached, list) and len(cached) == 2 and cached[0] == fingerprint
+
+    def _store_derived(self, key: str, fingerprint: str, value):
+        if self.cache_entry is not None and _CACHE is not None:
+            self.cache_entry.derived[key] = [fingerprint, value]  # Replaces a value of an older configuration
+            _CACHE.put(self.cache_entry)
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+_CACHE: Optional[ResponseCache] = None
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide HTTP session (connection pooling and keep-alive)."""
+    global _SESSION, _CACHE
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                pool_size = get_max_concurrency()
+                adapter = HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(make_headers(
+                    user_agent=USER_AGENT, accept_encoding=True))  # Negotiate every encoding urllib3 can decode
+                cache_dir = get_http_cache_dir()
+                _CACHE = ResponseCache(cache_dir) if cache_dir else None
+                _SESSION = session
+    return _SESSION
+
+
+def fetch_page_sync(url: str) -> FetchResult:
+    """
+    Downloads a page with the shared session, revalidating any cached copy with
+    If-None-Match / If-Modified-Since. Raises requests exceptions on HTTP errors.
+    """
+    session = get_session()
+    cached = _CACHE.get(url) if _CACHE is not None else None
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+    domain = urlparse(url).netloc
+    started = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers, timeout=get_request_timeout())
+    except requests.exceptions.RequestException:
+        metrics.FETCH_SECONDS.observe(time.perf_counter() - started, domain, "error")
+        raise
+    elapsed = time.perf_counter() - started
+    metrics.HTTP_RESPONSES.inc(domain, str(response.status_code))
+    if response.status_code == 304 and cached is not None:
+        metrics.FETCH_SECONDS.observe(elapsed, domain, "not_modified")
+        logger.debug(f"Not modified since last crawl: {url}")
+        return FetchResult(url=url, text=cached.body, not_modified=True, cache_entry=cached)
+    if not response.ok:
+        metrics.FETCH_SECONDS.observe(elapsed, domain, "http_error")
+        response.raise_for_status()
+    metrics.FETCH_SECONDS.observe(elapsed, domain, "ok")
+    metrics.FETCH_BYTES.observe(len(response.content), domain)
+
+    archive = get_archive()
+    if archive is not None:
+        try:
+            archive.put(url, response.text)
+        except (OSError, sqlite3.Error) as e:  # The archive is a copy: never fail the crawl over it
+            logger.warning(f"Could not archive {url}: {e}")
+
+    entry = None
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if _CACHE is not None and (etag or last_modified):
+        entry = CacheEntry(url=url, body=response.text,
+                           etag=etag, last_modified=last_modified)
+        _CACHE.put(entry)
+    return FetchResult(url=url, text=response.text, cache_entry=entry)
+
+
+async def fetch_page(url: str) -> FetchResult:
+    """
+    Fetches a page without blocking the event loop.
+    The request waits for a global concurrency slot and the domain's rate limit token.
+    """
+    domain = urlparse(url).netloc
+    waiting_since = time.perf_counter()
+    async with get_scheduler().slot(domain):
+        metrics.RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - waiting_since, domain)
+        return await asyncio.to_thread(fetch_page_sync, url)
+
+
+class CrawlFetcher:
+    """
+    Fetcher scoped to one crawl: every URL is downloaded at most once, even if requested concurrently.
+    A download is cancelled when every caller waiting for it is cancelled, and by close() when the crawl ends,
+    so a cancelled crawl stops downloading and stops drawing on the domains' rate limits.
+    """
+
+    def __init__(self):
+        self._requests: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}  # Callers waiting for each pending download
+
+    async def fetch(self, url: str) -> FetchResult:
+        request = self._requests.get(url)
+        if request is None:
+            request = asyncio.ensure_future(fetch_page(url))
+            self._requests[url] = request
+        self._waiters[url] = self._waiters.get(url, 0) + 1
+        try:
+            # Shield so one cancelled caller does not cancel the download for the others
+            return await asyncio.shield(request)
+        except asyncio.CancelledError:
+            if self._waiters[url] == 1 and not request.done():  # The last caller waiting for it
+                request.cancel()
+                if self._requests.get(url) is request:
+                    del self._requests[url]  # A later fetch downloads it again
+            raise
+        finally:
+            self._waiters[url] -= 1
+            if not self._waiters[url]:
+                del self._waiters[url]
+
+    def close(self):
+        """Cancels the downloads still pending (the crawl using this fetcher has ended)."""
+        for url, request in list(self._requests.items()):
+            if not request.done():
+                request.cancel()
+                del self._requests[url]
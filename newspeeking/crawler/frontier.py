@@ -0,0 +1,86 @@
+# Crawl frontier: which article URLs are already known, so polls of a listing page only crawl new links.
+# The seen-set is persistent through the articles table; a Bloom filter over its url column answers
+# most lookups in memory and only possible hits are confirmed against the url index.
+import hashlib
+import logging
+import math
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from newspeeking.db.database import UPSERT_BATCH_SIZE, ArticleDB
+
+logger = logging.getLogger(__name__)
+
+BLOOM_ERROR_RATE = 0.01  # False positive rate; each false positive costs one indexed lookup
+BLOOM_MIN_CAPACITY = 100_000
+LOAD_BATCH_SIZE = 10_000  # URLs read per batch when (re)building the filter
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings (double hashing over one BLAKE2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Bits
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # Items added, to tell when the filter is over capacity
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + position * second) % self.size for position in range(self.hash_count)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UrlFrontier:
+    """
+    Seen-set of article URLs. The Bloom filter is built from the articles table on first use
+    (and rebuilt larger once it holds more URLs than it was sized for). URLs stored by another
+    process after the filter was built are not in it; they are crawled once more and then added.
+    """
+
+    def __init__(self, error_rate: float = BLOOM_ERROR_RATE):
+        self.error_rate = error_rate
+        self._bloom: Optional[BloomFilter] = None
+
+    def load(self, db: Session):
+        """(Re)builds the Bloom filter from every stored article URL."""
+        stored_count = db.scalar(select(func.count(ArticleDB.id)))
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * stored_count), self.error_rate)
+        for url in db.scalars(select(ArticleDB.url).execution_options(yield_per=LOAD_BATCH_SIZE)):
+            if url:
+                bloom.add(url)
+        self._bloom = bloom
+        logger.info(
+            f"Crawl frontier loaded {bloom.count} known URLs ({len(bloom.bits) // 1024} KiB Bloom filter)")
+
+    def unseen(self, db: Session, urls: Iterable[str]) -> List[str]:
+        """Returns the URLs not stored yet, in their original order."""
+        if self._bloom is None or self._bloom.count > self._bloom.capacity:
+            self.load(db)
+        urls = list(urls)
+        maybe_known = [url for url in urls if url in self._bloom]
+        known = set()
+        for start in range(0, len(maybe_known), UPSERT_BATCH_SIZE):  # Confirm hits against the url index
+            known.update(db.scalars(select(ArticleDB.url).where(
+                ArticleDB.url.in_(maybe_known[start:start + UPSERT_BATCH_SIZE]))))
+        return [url for url in urls if url not in known]
+
+    def add(self, urls: Iterable[str]):
+        """Records stored URLs (no-op until the filter has been loaded)."""
+        if self._bloom is not None:
+            for url in urls:
+                self._bloom.add(url)
+
+
+frontier = UrlFrontier()
@@ -0,0 +1,243 @@
+# Background crawl jobs: a worker pool that crawls seed URLs and stores articles as they arrive.
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+import validators
+
+from newspeeking.config import get_discovery_site, get_job_workers, get_website_config
+from newspeeking.crawler.crawler import is_listing_page, iter_crawled_articles, listing_article_urls, page_article_data
+from newspeeking.crawler.discovery import discover_articles
+from newspeeking.crawler.fetcher import CrawlFetcher
+from newspeeking.crawler.frontier import frontier
+from newspeeking.db.database import SessionLocal, bulk_upsert_articles
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept around for status queries
+JOB_COMMIT_BATCH_SIZE = 20  # Articles stored per commit while a job runs
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class CrawlJob:
+    seed_urls: List[str]
+    skip_known: bool = False  # Don't crawl article URLs that are already stored
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JobStatus.QUEUED
+    discovered: int = 0  # Article URLs found (a seed that is an article page counts as one)
+    fetched: int = 0     # Articles downloaded and extracted
+    stored: int = 0      # Articles committed to the database (inserted, updated or unchanged)
+    failed: int = 0      # Seeds or articles that could not be crawled or stored
+    duplicates: int = 0  # Stored articles linked as near-duplicates of another article
+    skipped: int = 0     # Discovered article URLs not crawled because they are already stored (skip_known)
+    created_at: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now(timezone.utc)
+
+
+class JobManager:
+    """
+    Runs crawl jobs on a pool of asyncio worker tasks.
+    Workers are started lazily on the first submission, on the running event loop.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers
+        self._jobs: "OrderedDict[str, CrawlJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker())
+                              for _ in range(self.workers or get_job_workers())]
+
+    def submit(self, seed_urls: List[str], skip_known: bool = False) -> CrawlJob:
+        """Queues a crawl of the given seed URLs and returns the job immediately."""
+        self._ensure_workers()
+        job = CrawlJob(seed_urls=list(seed_urls), skip_known=skip_known)
+        self._jobs[job.job_id] = job
+        self._prune_finished()
+        self._queue.put_nowait(job)
+        logger.info(
+            f"Queued crawl job {job.job_id} with {len(job.seed_urls)} seed URL(s)")
+        return job
+
+    def get(self, job_id: str) -> Optional[CrawlJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[CrawlJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[CrawlJob]:
+        """Cancels a queued or running job. Articles already stored are kept."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in JobStatus.FINISHED:
+            return job
+        if job._task is not None:  # Running: the worker marks it cancelled
+            job._task.cancel()
+        else:  # Still queued: the worker will skip it
+            job.finish(JobStatus.CANCELLED)
+        return job
+
+    async def shutdown(self):
+        """Cancels running jobs and stops the worker pool."""
+        for job in self._jobs.values():
+            self.cancel(job.job_id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in JobStatus.FINISHED]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == JobStatus.QUEUED:
+                    job._task = asyncio.create_task(run_job(job))
+                    try:
+                        await job._task
+                    except asyncio.CancelledError:
+                        if not job._task.cancelled():  # The worker itself is being stopped
+                            raise
+            finally:
+                job._task = None
+                self._queue.task_done()
+
+
+async def run_job(job: CrawlJob):
+    """Crawls every seed URL of a job, committing articles in small batches as they are extracted."""
+    job.status = JobStatus.RUNNING
+    job.started_at = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        for seed_url in job.seed_urls:
+            await crawl_seed(job, db, seed_url)
+        job.finish(JobStatus.COMPLETED)
+        logger.info(
+            f"Crawl job {job.job_id} completed: {job.stored} stored, {job.failed} failed")
+    except asyncio.CancelledError:
+        job.finish(JobStatus.CANCELLED)
+        logger.info(f"Crawl job {job.job_id} cancelled")
+        raise
+    except Exception as e:
+        job.finish(JobStatus.FAILED, error=str(e))
+        logger.error(f"Crawl job {job.job_id} failed: {e}")
+    finally:
+        db.close()
+
+
+async def crawl_seed(job: CrawlJob, db, seed_url: str):
+    """
+    Crawls one seed URL: a listing page or a configured feed or sitemap fans out to its articles,
+    an article page is stored directly.
+    """
+    website_config = get_website_config(urlparse(seed_url).netloc)
+    site = get_discovery_site(seed_url)
+    fetcher = CrawlFetcher()
+    try:
+        if not validators.url(seed_url):
+            raise ValueError("Invalid URL format")
+        if site is not None:
+            discovery = await discover_articles(seed_url, site, only_new=job.skip_known, fetcher=fetcher)
+        else:
+            page = await fetcher.fetch(seed_url)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Crawl job {job.job_id}: cannot crawl seed URL {seed_url}: {e}")
+        job.failed += 1
+        fetcher.close()
+        return
+    except asyncio.CancelledError:
+        fetcher.close()
+        raise
+
+    pending_articles: List[Dict] = []
+    try:
+        if site is not None:  # Already limited to new and changed articles with skip_known
+            job.discovered += discovery.found
+            job.skipped += discovery.found - len(discovery.article_urls)
+            async for _, article_data in iter_crawled_articles(discovery.article_urls, fetcher=fetcher):
+                collect_job_article(job, article_data, pending_articles)
+                if len(pending_articles) >= JOB_COMMIT_BATCH_SIZE:
+                    store_job_articles(job, db, pending_articles)
+        elif is_listing_page(seed_url, website_config):
+            article_urls = listing_article_urls(page, website_config)
+            job.discovered += len(article_urls)
+            if job.skip_known:
+                # Off the event loop: the first call loads the Bloom filter from the articles table
+                new_urls = await asyncio.to_thread(frontier.unseen, db, article_urls)
+                job.skipped += len(article_urls) - len(new_urls)
+                article_urls = new_urls
+            async for _, article_data in iter_crawled_articles(article_urls, website_config, fetcher):
+                collect_job_article(job, article_data, pending_articles)
+                if len(pending_articles) >= JOB_COMMIT_BATCH_SIZE:
+                    store_job_articles(job, db, pending_articles)
+        else:
+            job.discovered += 1
+            collect_job_article(job, await page_article_data(
+                page, website_config), pending_articles)
+    finally:  # Also keep what was crawled before a cancellation
+        fetcher.close()
+        store_job_articles(job, db, pending_articles)
+
+
+def collect_job_article(job: CrawlJob, article_data: Optional[Dict], pending_articles: List[Dict]):
+    """Counts one crawl result and queues successfully extracted articles for storage."""
+    if not article_data:
+        job.failed += 1
+        return
+    job.fetched += 1
+    pending_articles.append(article_data)
+
+
+def store_job_articles(job: CrawlJob, db, pending_articles: List[Dict]):
+    """Bulk upserts and commits the pending articles, then clears the list."""
+    if not pending_articles:
+        return
+    try:
+        upsert_result = bulk_upsert_articles(db, pending_articles)
+        db.commit()
+        job.stored += upsert_result.total
+        job.duplicates += upsert_result.duplicates
+        frontier.add(article_data["url"] for article_data in pending_articles)
+    except Exception as e:
+        db.rollback()
+        job.failed += len(pending_articles)
+        logger.error(
+            f"Crawl job {job.job_id}: failed to store {len(pending_articles)} articles: {e}")
+    pending_articles.clear()
+
+
+job_manager = JobManager()
@@ -0,0 +1,139 @@
+# Process pool for the CPU-bound crawl stage: article extraction and classification.
+# Parsing in worker processes keeps the GIL-holding work off the event loop and spreads it over all cores.
+# Articles are sent to the pool in batches; each worker keeps its own compiled profiles and keyword index.
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from newspeeking import metrics
+from newspeeking.config import get_categories, get_parse_workers, get_registry, get_website_config, set_config
+from newspeeking.crawler.profiles import get_extraction_profile
+from newspeeking.nlp.classifier import get_keyword_index
+
+logger = logging.getLogger(__name__)
+
+PARSE_BATCH_SIZE = 16  # Articles per round trip to a worker
+PARSE_BATCH_DELAY = 0.005  # Seconds a partial batch waits for more articles
+
+# A configured site's config is referenced by its `websites` key, so workers use their own precompiled copy
+ConfigRef = Union[str, Dict]
+
+
+def config_ref(website_config: Dict) -> ConfigRef:
+    for site in get_registry().sites.values():
+        if site.config is website_config:
+            return site.domain
+    return website_config
+
+
+def resolve_config(ref: ConfigRef) -> Dict:
+    return get_website_config(ref) if isinstance(ref, str) else ref
+
+
+def init_worker(config: Dict, version: int):
+    """Worker initializer: installs the parent's configuration and compiles profiles and keyword index up front."""
+    metrics.buffer_observations()  # Sent back to the parent with each batch
+    install_config(config, version)
+
+
+def install_config(config: Dict, version: int):
+    registry = set_config(config, version)
+    get_keyword_index(get_categories())
+    for site in registry.sites.values():
+        get_extraction_profile(site.config)
+
+
+def parse_article_batch(items: List[Tuple[str, str, ConfigRef]], config: Dict = None,
+                        version: int = None) -> Tuple[List[Optional[Dict]], list]:
+    """
+    Extracts and classifies a batch of article pages (runs in a worker process).
+    The parent's configuration comes along, so a worker picks up a reloaded config.yaml without a restart.
+    Returns the article data and the metric observations recorded meanwhile, for the parent to replay.
+    """
+    from newspeeking.crawler.crawler import build_article_data  # Imported here: crawler imports this module
+    if config is not None and get_registry().version != version:
+        install_config(config, version)
+    results = []
+    for url, html, ref in items:
+        try:
+            results.append(build_article_data(url, html, resolve_config(ref)))
+        except Exception as e:
+            logger.error(f"Parsing error for article URL {url}: {e}")
+            results.append(None)
+    return results, metrics.take_buffered()
+
+
+class ParsePool:
+    """
+    Batches article parse requests from concurrent crawl tasks onto a ProcessPoolExecutor.
+    The pool is started on first use with `parse_workers` processes; with parse_workers=0
+    articles are parsed in the calling process.
+    """
+
+    def __init__(self, workers: int = None, batch_size: int = PARSE_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[Tuple[str, str, ConfigRef], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            registry = get_registry()
+            # spawn: forking a process that runs threads (fetches, the server) can deadlock the child
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._worker_count(), mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker, initargs=(registry.config, registry.version))
+        return self._executor
+
+    def _worker_count(self) -> int:
+        return self.workers if self.workers is not None else get_parse_workers()
+
+    async def build_article_data(self, url: str, html: str, website_config: Dict) -> Optional[Dict]:
+        """Extracts and classifies an article page on the pool. Returns None if no article text was found."""
+        if self._worker_count() <= 0:
+            return parse_article_batch([(url, html, website_config)])[0][0]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((url, html, config_ref(website_config)), future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:  # Give other articles finishing their download a moment to join
+            self._flush_handle = loop.call_later(PARSE_BATCH_DELAY, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)  # Keep a reference until the batch is done
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        items = [item for item, _ in batch]
+        registry = get_registry()
+        try:
+            results, observations = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), parse_article_batch, items, registry.config, registry.version)
+            metrics.replay(observations)
+        except Exception as e:  # e.g. a worker died (BrokenProcessPool): parse here and start a new pool next time
+            logger.error(f"Parse pool failed, parsing {len(items)} articles in process: {e}")
+            self.shutdown(wait=False)
+            results, _ = parse_article_batch(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # The crawl task may have been cancelled meanwhile
+                future.set_result(result)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+parse_pool = ParsePool()
@@ -0,0 +1,110 @@
+# Adaptive re-polling of configured listing pages (websites.[domain].listing_page.poll_urls) and feeds and sitemaps
+# (websites.[domain].discovery, which replace a site's listing pages when set).
+# Each poll is a crawl job that skips already-stored article URLs; the interval until the next poll
+# shrinks when a poll finds new links and grows when it finds none. Poll state lives in listing_pages.
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from newspeeking.config import get_listing_poll_urls, get_poll_interval_bounds
+from newspeeking.crawler.jobs import CrawlJob, JobStatus, job_manager
+from newspeeking.db.database import ListingPageDB, SessionLocal, utcnow
+
+logger = logging.getLogger(__name__)
+
+POLL_TICK_SECONDS = 15  # How often due listing pages are looked for
+TARGET_NEW_LINKS = 5  # New links a poll should find; the interval is scaled towards it
+BACKOFF_FACTOR = 1.5  # Interval growth after a poll without new links
+MAX_STEP_FACTOR = 2.0  # Largest change of the interval after one poll
+
+
+def next_poll_interval(interval: float, new_links: int, min_interval: float, max_interval: float) -> float:
+    """
+    Interval until the next poll: scaled so that a poll would find about TARGET_NEW_LINKS new links
+    at the rate just observed (by at most MAX_STEP_FACTOR per poll), or backed off without new links.
+    """
+    if new_links <= 0:
+        factor = BACKOFF_FACTOR
+    else:
+        factor = min(MAX_STEP_FACTOR, max(1 / MAX_STEP_FACTOR, TARGET_NEW_LINKS / new_links))
+    return min(max_interval, max(min_interval, interval * factor))
+
+
+class ListingPoller:
+    """Submits a crawl job for every listing page whose next poll is due and adapts its interval when the job finishes."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._jobs: Dict[str, CrawlJob] = {}  # Listing page URL -> its running poll
+
+    def start(self):
+        if self._task is None and get_listing_poll_urls():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.poll_due()
+            except Exception as e:
+                logger.error(f"Listing page polling failed: {e}")
+            await asyncio.sleep(POLL_TICK_SECONDS)
+
+    def poll_due(self):
+        """Records finished polls and submits the polls that are due."""
+        urls = get_listing_poll_urls()
+        min_interval, max_interval = get_poll_interval_bounds()
+        now = utcnow()
+        db = SessionLocal()
+        try:
+            pages = {page.url: page for page in db.query(
+                ListingPageDB).filter(ListingPageDB.url.in_(urls))}
+            for url in urls:
+                page = pages.get(url)
+                if page is None:  # Newly configured: poll right away
+                    page = ListingPageDB(url=url, poll_interval=min_interval, next_poll_at=now)
+                    db.add(page)
+                job = self._jobs.get(url)
+                if job is not None:
+                    if job.status not in JobStatus.FINISHED:
+                        continue
+                    del self._jobs[url]
+                    self.record_poll(page, job, now, min_interval, max_interval)
+                if page.next_poll_at <= now and self.claim_poll(db, page, now, max_interval):
+                    self._jobs[url] = job_manager.submit([url], skip_known=True)
+                    page.last_polled_at = now
+            db.commit()
+        finally:
+            db.close()
+
+    def claim_poll(self, db: Session, page: ListingPageDB, now: datetime, max_interval: float) -> bool:
+        """
+        Moves a due page's next poll out of reach of other API processes polling the same pages
+        (until record_poll sets it). Returns False if another process claimed this poll first.
+        """
+        db.flush()
+        claimed = db.execute(update(ListingPageDB).where(
+            ListingPageDB.url == page.url, ListingPageDB.next_poll_at == page.next_poll_at
+        ).values(next_poll_at=now + timedelta(seconds=max_interval)).execution_options(synchronize_session="fetch"))
+        return claimed.rowcount == 1
+
+    def record_poll(self, page: ListingPageDB, job: CrawlJob, now: datetime, min_interval: float, max_interval: float):
+        if job.status == JobStatus.COMPLETED:
+            page.last_new_links = job.discovered - job.skipped
+            page.poll_interval = next_poll_interval(
+                page.poll_interval, page.last_new_links, min_interval, max_interval)
+        page.next_poll_at = now + timedelta(seconds=page.poll_interval)
+        logger.info(
+            f"Polled listing page {page.url}: {page.last_new_links} new links, next poll in {page.poll_interval:.0f}s")
+
+
+listing_poller = ListingPoller()
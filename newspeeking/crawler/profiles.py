@@ -0,0 +1,223 @@
+# Precompiled per-website extraction profiles.
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+from newspeeking.config import compile_url_pattern, get_registry
+
+logger = logging.getLogger(__name__)
+
+try:  # lxml + cssselect: C-level HTML parsing and CSS selectors compiled to XPath
+    from cssselect import HTMLTranslator
+    from lxml import etree, html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+def article_fields(headline: Optional[str], article_text_parts: List[str], publication_date_str: Optional[str], author: Optional[str]) -> Dict:
+    """Builds the article data dictionary from the raw text matched by the selectors."""
+    publication_date = None
+    if publication_date_str:
+        try:
+            publication_date = datetime.fromisoformat(
+                # Handle ISO format
+                publication_date_str.replace('Z', '+00:00'))
+        except (ValueError, TypeError):
+            logger.warning(
+                f"Could not parse date from tag: {publication_date_str}")
+
+    return {
+        "headline": headline.strip() if headline is not None else "Headline not found",
+        "article_text": "\n".join(part.strip() for part in article_text_parts),
+        "publication_date": publication_date.isoformat() if publication_date else None,
+        "author": author.strip() if author is not None else None
+    }
+
+
+# XPath equivalents of the generic fallbacks used when a selector is not configured
+_WORD = "contains(concat(' ', normalize-space(@{attr}), ' '), ' {word} ')"
+_REL_AUTHOR = _WORD.format(attr='rel', word='author')
+_CLASS_AUTHOR = _WORD.format(attr='class', word='author')
+_FALLBACK_XPATHS = {
+    'headline': "(//h1)[1] | (//h2)[1][not(//h1)]",  # h1, or h2 if there is no h1
+    'article_text': "//p",
+    'publication_date': "(//time)[1]",
+    'author': f"(//*[{_REL_AUTHOR}])[1] | (//*[{_CLASS_AUTHOR}])[1][not(//*[{_REL_AUTHOR}])]",
+}
+
+
+# Subtrees no selector needs unless it names them: cut from the HTML before parsing so they never become tree nodes.
+# Plain lowercase string search; a block it misses (e.g. uppercase tags) is simply parsed as before.
+_SKIPPED_TAGS = ('script', 'style', 'noscript', 'template')
+_HEAD_TAGS = ('head', 'title', 'meta', 'link', 'base')
+
+
+def _names_tag(selectors: List[str], tags) -> bool:
+    return any(re.search(rf'(?<![\w-]){tag}(?![\w-])', selector, re.IGNORECASE)
+               for selector in selectors for tag in tags)
+
+
+def _cut_blocks(html: str, tag: str) -> str:
+    """Removes every <tag ...>...</tag> block from the HTML."""
+    opening, closing = f'<{tag}', f'</{tag}>'
+    parts = []
+    position = 0
+    while True:
+        start = html.find(opening, position)
+        if start < 0:
+            break
+        end = html.find(closing, start)
+        if end < 0:
+            break
+        if html[start + len(opening):start + len(opening) + 1] in ('>', ' ', '\t', '\n', '\r', '/'):
+            parts.append(html[position:start])
+            position = end + len(closing)
+        else:  # Another tag sharing the prefix, e.g. <styled-box>
+            parts.append(html[position:start + len(opening)])
+            position = start + len(opening)
+    if not parts:
+        return html
+    parts.append(html[position:])
+    return ''.join(parts)
+
+
+class ExtractionProfile:
+    """
+    A website's `article_page` and `listing_page` configuration compiled once.
+    With lxml and cssselect installed, CSS selectors are translated to compiled XPath
+    expressions and pages are parsed by lxml; otherwise selectors are precompiled with
+    soupsieve and pages are parsed by BeautifulSoup.
+    Only the subtrees the selectors can match are parsed: script, style and similar blocks, and
+    the <head>, are cut from the HTML first unless a configured selector refers to them.
+    Raises an error at construction if the configuration holds a selector that cannot be compiled.
+    """
+
+    def __init__(self, website_config: Dict):
+        article_page_config = website_config.get('article_page', {})
+        listing_page_config = website_config.get('listing_page', {})
+        self.use_lxml = LXML_AVAILABLE
+        compile_selector = self._compile_xpath if self.use_lxml else self._compile_soupsieve
+
+        self.selectors = {field_name: compile_selector(article_page_config.get(f'{field_name}_selector'), field_name)
+                          for field_name in ('headline', 'article_text', 'publication_date', 'author')}
+        # Default to all <a> tags if no selector in config
+        self.article_links = [compile_selector(selector, None) for selector in listing_page_config.get(
+            'article_link_selectors', ["a"])]
+        self.url_pattern = compile_url_pattern(listing_page_config)
+
+        configured = [selector for selector in [article_page_config.get(f'{field_name}_selector') for field_name in
+                                                self.selectors] + listing_page_config.get('article_link_selectors', [])
+                      if selector]
+        self.skipped_tags = [tag for tag in _SKIPPED_TAGS if not _names_tag(configured, [tag])]
+        # The generic author fallback matches any element, including <link rel="author"> in the head
+        self.skip_head = bool(article_page_config.get('author_selector')) and not _names_tag(configured, _HEAD_TAGS)
+
+    @staticmethod
+    def _compile_xpath(selector: Optional[str], field_name: Optional[str]):
+        if selector:
+            return etree.XPath(HTMLTranslator().css_to_xpath(selector))
+        return etree.XPath(_FALLBACK_XPATHS[field_name])
+
+    @staticmethod
+    def _compile_soupsieve(selector: Optional[str], field_name: Optional[str]):
+        return soupsieve.compile(selector) if selector else field_name
+
+    def prune(self, html: str) -> str:
+        """Cuts the subtrees no selector needs from the HTML."""
+        if self.skip_head:
+            body_start = html.find('<body')
+            if body_start > 0:
+                html = html[body_start:]
+        for tag in self.skipped_tags:
+            html = _cut_blocks(html, tag)
+        return html
+
+    def parse(self, html: str):
+        html = self.prune(html)
+        if self.use_lxml:
+            return lxml_html.document_fromstring(html)
+        return BeautifulSoup(html, 'html.parser')
+
+    def _select(self, document, selector) -> list:
+        if self.use_lxml:
+            return selector(document)
+        if isinstance(selector, str):  # Generic fallback for a field without a configured selector
+            return _soup_fallback(document, selector)
+        return selector.select(document)
+
+    def _text(self, element) -> str:
+        return element.text_content() if self.use_lxml else element.text
+
+    def extract_article(self, html: str) -> Dict:
+        """Extracts headline, article text, publication date and author from an article page."""
+        document = self.parse(html)
+        matches = {field_name: self._select(document, selector)
+                   for field_name, selector in self.selectors.items()}
+        headline_tag = matches['headline'][0] if matches['headline'] else None
+        date_tag = matches['publication_date'][0] if matches['publication_date'] else None
+        author_tag = matches['author'][0] if matches['author'] else None
+        return article_fields(
+            self._text(headline_tag) if headline_tag is not None else None,
+            [self._text(tag) for tag in matches['article_text']],
+            # Try datetime attribute or text
+            (date_tag.get('datetime') or self._text(date_tag)
+             ) if date_tag is not None else None,
+            self._text(author_tag) if author_tag is not None else None)
+
+    def extract_article_urls(self, listing_url: str, html: str) -> List[str]:
+        """Extracts article URLs from a listing page, using the first selector that matches any link."""
+        document = self.parse(html)
+        article_urls = []
+        for selector in self.article_links:
+            article_link_tags = self._select(document, selector)
+            if article_link_tags:
+                for link_tag in article_link_tags:
+                    href = link_tag.get('href')
+                    if href:
+                        absolute_url = urljoin(listing_url, href)
+                        if self.url_pattern is None or self.url_pattern.search(absolute_url):
+                            article_urls.append(absolute_url)
+                break  # Links were found with this selector, stop using other selectors
+        return list(dict.fromkeys(article_urls))  # Deduplicate, keeping page order
+
+
+def _soup_fallback(soup: BeautifulSoup, field_name: str) -> list:
+    """Generic BeautifulSoup lookups for fields without a configured selector."""
+    if field_name == 'headline':  # Fallback to h1 or h2
+        tag = soup.find('h1') or soup.find('h2')
+    elif field_name == 'article_text':  # Fallback to <p> tags
+        return soup.find_all('p')
+    elif field_name == 'publication_date':  # Fallback to <time> tag
+        tag = soup.find('time')
+    else:  # Fallback to rel='author' or class='author'
+        tag = soup.find(attrs={'rel': 'author'}) or soup.find(class_='author')
+    return [tag] if tag else []
+
+
+_DEFAULT_PROFILE: Optional[ExtractionProfile] = None
+_PROFILES: Dict[int, tuple] = {}  # id(website_config) -> (website_config, profile)
+_PROFILES_VERSION: Optional[int] = None  # Configuration version the cached profiles were compiled under
+
+
+def get_extraction_profile(website_config: Dict) -> ExtractionProfile:
+    """Returns the compiled profile for a website configuration, compiling it on first use."""
+    global _DEFAULT_PROFILE, _PROFILES_VERSION
+    if not website_config:  # Unconfigured websites share one profile of generic defaults
+        if _DEFAULT_PROFILE is None:
+            _DEFAULT_PROFILE = ExtractionProfile({})
+        return _DEFAULT_PROFILE
+    version = get_registry().version
+    if version != _PROFILES_VERSION:  # Drop the profiles of replaced configurations
+        _PROFILES.clear()
+        _PROFILES_VERSION = version
+    cached = _PROFILES.get(id(website_config))
+    if cached is None or cached[0] is not website_config:
+        cached = (website_config, ExtractionProfile(website_config))
+        _PROFILES[id(website_config)] = cached
+    return cached[1]
@@ -0,0 +1,151 @@
+# Offline re-extraction: replays archived HTML of stored articles through the current extraction profiles
+# and classifier, and bulk-updates the articles table. No page is downloaded.
+# Usage (from the project root): python -m newspeeking.crawler.reextract [--domain DOMAIN] [--workers N]
+import argparse
+import logging
+import multiprocessing
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from newspeeking.config import get_archive_dir, get_parse_workers, get_registry
+from newspeeking.crawler.archive import HtmlArchive, RecordLocation
+from newspeeking.crawler.parse_pool import init_worker, parse_article_batch
+
+# The database is imported inside the functions that use it: worker processes import this module (and, when it runs
+# with python -m, re-run it as their main module), and importing newspeeking.db.database opens the database.
+logger = logging.getLogger(__name__)
+
+REEXTRACT_BATCH_SIZE = 64  # Articles per worker task and per commit
+
+_WORKER_ARCHIVE: Optional[HtmlArchive] = None  # Each worker process maps the segments itself
+
+
+@dataclass
+class ReextractResult:
+    stored: Optional["UpsertResult"] = None  # An empty UpsertResult unless given
+    not_archived: int = 0  # Stored articles without an archived page
+    failed: int = 0  # Archived pages that could not be read or yielded no article text (left unchanged)
+
+    def __post_init__(self):
+        if self.stored is None:
+            from newspeeking.db.database import UpsertResult
+            self.stored = UpsertResult()
+
+
+def reextract_batch(archive_dir: str, items: List[Tuple[str, RecordLocation]],
+                    config: Dict = None, version: int = None) -> List[Optional[Dict]]:
+    """Reads a batch of archived article pages and extracts and classifies them (runs in a worker process)."""
+    global _WORKER_ARCHIVE
+    if _WORKER_ARCHIVE is None or _WORKER_ARCHIVE.archive_dir != archive_dir:
+        _WORKER_ARCHIVE = HtmlArchive(archive_dir)
+    pages, unreadable = [], set()
+    for position, (url, location) in enumerate(items):
+        try:
+            html = _WORKER_ARCHIVE.read(location)
+        except (OSError, ValueError, zlib.error) as e:  # UnicodeDecodeError is a ValueError
+            logger.error(f"Could not read the archived page of {url}: {e}")
+            unreadable.add(position)
+            html = ""
+        pages.append((url, html, urlparse(url).netloc))
+    results, _ = parse_article_batch(pages, config, version)  # Metrics of an offline run are not reported
+    return [None if position in unreadable else result for position, result in enumerate(results)]
+
+
+def reextract_articles(domain: Optional[str] = None, workers: Optional[int] = None,
+                       batch_size: int = REEXTRACT_BATCH_SIZE) -> ReextractResult:
+    """
+    Re-extracts every stored article (or a domain's) from its archived page and stores the changes.
+    Batches are parsed on `workers` processes (default: parse_workers; 0 parses in this process)
+    while earlier batches are written, one commit per batch. Articles that now yield no text keep their stored data.
+    """
+    from newspeeking.db.database import SessionLocal
+    archive_dir = get_archive_dir()
+    if not archive_dir:
+        raise ValueError("No archive_dir is configured, there are no archived pages to re-extract")
+    archive = HtmlArchive(archive_dir)
+    registry = get_registry()
+    workers = get_parse_workers() if workers is None else workers
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=init_worker, initargs=(registry.config, registry.version))
+    result = ReextractResult()
+    pending: deque = deque()  # Batches being parsed, in submission order
+    db = SessionLocal()
+    try:
+        for items in iter_archived_articles(db, archive, result, domain, batch_size):
+            if executor is None:
+                store_batch(db, reextract_batch(archive_dir, items), result)
+                continue
+            pending.append(executor.submit(reextract_batch, archive_dir, items, registry.config, registry.version))
+            while len(pending) > 2 * workers:  # Keep the workers busy without reading the whole table ahead
+                store_batch(db, pending.popleft().result(), result)
+        while pending:
+            store_batch(db, pending.popleft().result(), result)
+    finally:
+        for future in pending:
+            future.cancel()
+        db.close()
+        archive.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return result
+
+
+def iter_archived_articles(db, archive: HtmlArchive, result: ReextractResult, domain: Optional[str], batch_size: int):
+    """Yields batches of (url, archive location) of stored articles, in id order (keyset pagination)."""
+    from sqlalchemy import select
+    from newspeeking.db.database import ArticleDB
+    from newspeeking.db.queries import ArticleFilters
+    last_id = 0
+    while True:
+        query = ArticleFilters(domain=domain or None).apply(
+            select(ArticleDB.id, ArticleDB.url).where(ArticleDB.id > last_id))
+        rows = db.execute(query.order_by(ArticleDB.id).limit(batch_size)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        locations = archive.locate(row.url for row in rows)
+        result.not_archived += len(rows) - len(locations)
+        items = [(row.url, locations[row.url]) for row in rows if row.url in locations]
+        if items:
+            yield items
+
+
+def store_batch(db, articles: List[Optional[Dict]], result: ReextractResult):
+    from newspeeking.db.database import bulk_upsert_articles
+    extracted = [article_data for article_data in articles if article_data]
+    result.failed += len(articles) - len(extracted)
+    if not extracted:
+        return
+    try:
+        stored = bulk_upsert_articles(db, extracted)
+        db.commit()
+        result.stored += stored
+    except Exception as e:
+        db.rollback()
+        result.failed += len(extracted)
+        logger.error(f"Failed to store {len(extracted)} re-extracted articles: {e}")
+        return
+    logger.info(f"Re-extracted {result.stored.total} articles ({result.stored.updated} updated)")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Re-extract stored articles from the HTML archive.")
+    parser.add_argument("--domain", help="Only articles of this domain")
+    parser.add_argument("--workers", type=int, help="Parse processes (default: parse_workers; 0: in process)")
+    parser.add_argument("--batch-size", type=int, default=REEXTRACT_BATCH_SIZE)
+    args = parser.parse_args()
+    result = reextract_articles(args.domain, args.workers, args.batch_size)
+    print(f"{result.stored.total} articles re-extracted: {result.stored.updated} updated, "
+          f"{result.stored.unchanged} unchanged, {result.stored.duplicates} near-duplicates; "
+          f"{result.failed} failed, {result.not_archived} not archived")
+
+
+if __name__ == "__main__":
+    main()
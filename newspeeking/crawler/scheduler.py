@@ -0,0 +1,112 @@
+# Politeness scheduler: global concurrency limit plus per-domain token buckets.
+# With the work queue enabled, the per-domain pacing is shared by all crawler processes through the database.
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Union
+
+from newspeeking.config import get_rate_limit_delay, get_max_concurrency, get_work_queue_enabled, normalize_domain
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at one token every `rate_limit_delay` seconds.
+    With the default capacity of 1, consecutive requests to a domain are spaced
+    by exactly the configured delay, while the first request goes out immediately.
+    """
+
+    def __init__(self, rate_limit_delay: float, capacity: int = 1):
+        self.rate_limit_delay = max(float(rate_limit_delay or 0), 0.0)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate_limit_delay == 0:
+            self.tokens = float(self.capacity)
+        else:
+            elapsed = now - self.updated_at
+            self.tokens = min(self.capacity, self.tokens +
+                              elapsed / self.rate_limit_delay)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:  # Waiters are served in FIFO order
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.rate_limit_delay)
+
+
+class SharedTokenBucket:
+    """
+    Paces a domain's requests through its row in domain_budgets, so the configured delay holds
+    across every process crawling it. Each request reserves the next free slot and waits for it.
+    """
+
+    def __init__(self, domain: str, rate_limit_delay: float):
+        self.domain = domain
+        self.rate_limit_delay = max(float(rate_limit_delay or 0), 0.0)
+
+    async def acquire(self):
+        if self.rate_limit_delay == 0:
+            return
+        from newspeeking.db.database import reserve_domain_slot  # Imported here: the engine is created at import
+        wait = await asyncio.to_thread(reserve_domain_slot, self.domain, self.rate_limit_delay)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CrawlScheduler:
+    """
+    Bounds the number of in-flight requests globally and paces requests per domain.
+    Different domains are fetched in parallel; each domain still sees its configured delay.
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._buckets: Dict[str, Union[TokenBucket, SharedTokenBucket]] = {}
+
+    def bucket_for(self, domain: str) -> Union[TokenBucket, SharedTokenBucket]:
+        """
+        Returns (creating on first use) the token bucket for a domain, paced at its current rate limit.
+        Buckets are keyed by the normalized domain, so www.example.com and example.com share one budget.
+        """
+        rate_limit_delay = get_rate_limit_delay(domain)
+        domain = normalize_domain(domain)
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = SharedTokenBucket(domain, rate_limit_delay) if get_work_queue_enabled() else TokenBucket(rate_limit_delay)
+            self._buckets[domain] = bucket
+        elif bucket.rate_limit_delay != rate_limit_delay:  # Changed by a config reload
+            bucket.rate_limit_delay = max(float(rate_limit_delay or 0), 0.0)
+        return bucket
+
+    @asynccontextmanager
+    async def slot(self, domain: str):
+        """Async context manager granting permission to send one request to `domain`."""
+        # Wait for the domain's token first so slow domains do not hold global slots while idle
+        await self.bucket_for(domain).acquire()
+        async with self._semaphore:
+            yield
+
+
+# asyncio primitives are bound to an event loop, so keep one scheduler per loop
+_SCHEDULERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, CrawlScheduler]" = weakref.WeakKeyDictionary()
+
+
+def get_scheduler() -> CrawlScheduler:
+    """Returns the crawl scheduler for the running event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = _SCHEDULERS.get(loop)
+    if scheduler is None:
+        scheduler = CrawlScheduler()
+        _SCHEDULERS[loop] = scheduler
+    return scheduler
@@ -0,0 +1,247 @@
+# Shared crawl work queue in the database, for running several crawler processes against one database.
+# URLs are claimed in batches with expiring leases: a URL is worked on by one worker at a time, and the
+# URLs of a worker that crashed are claimed again once their lease expires. Failed URLs are retried with
+# backoff up to queue_max_attempts. Request pacing per domain is shared through domain_budgets (see scheduler).
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from newspeeking.config import (get_discovery_site, get_queue_lease_seconds, get_queue_max_attempts, get_website_config,
+                                get_work_queue_enabled)
+from newspeeking.crawler.crawler import is_listing_page, listing_article_urls, page_article_data
+from newspeeking.crawler.discovery import discover_articles
+from newspeeking.crawler.fetcher import CrawlFetcher
+from newspeeking.crawler.frontier import frontier
+from newspeeking.db.database import UPSERT_BATCH_SIZE, CrawlTaskDB, SessionLocal, article_domain, bulk_upsert_articles, utcnow
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 16  # URLs claimed (and crawled concurrently) per round trip
+IDLE_POLL_SECONDS = 2  # Wait before looking for work again when the queue is empty
+RETRY_BASE_DELAY = 30  # Seconds before the first retry of a failed URL, doubled per attempt
+
+
+class TaskStatus:
+    QUEUED = "queued"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class TaskKind:
+    SEED = "seed"  # Listing page, feed or article page submitted by a user (or changed, see crawl_task); crawled again when re-submitted
+    ARTICLE = "article"  # Linked from a listing page; queued once
+
+
+def enqueue(db: Session, urls: Iterable[str], kind: str = TaskKind.SEED) -> int:
+    """
+    Adds URLs to the queue. The caller commits. A seed URL that is already done or failed is queued again;
+    an article URL that is already queued, crawled or failed is left alone. Returns the number of URLs queued.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return 0
+    now = utcnow()
+    queued = 0
+    for start in range(0, len(urls), UPSERT_BATCH_SIZE):
+        batch = urls[start:start + UPSERT_BATCH_SIZE]
+        existing = dict(db.execute(select(CrawlTaskDB.url, CrawlTaskDB.status).where(CrawlTaskDB.url.in_(batch))).all())
+        new_urls = [url for url in batch if url not in existing]
+        if new_urls:
+            _insert_ignoring_conflicts(db, [
+                {"url": url, "domain": article_domain(url), "kind": kind, "status": TaskStatus.QUEUED,
+                 "attempts": 0, "available_at": now, "updated_at": now} for url in new_urls])
+            queued += len(new_urls)
+        if kind == TaskKind.SEED:
+            finished = [url for url, status in existing.items() if status in (TaskStatus.DONE, TaskStatus.FAILED)]
+            if finished:
+                queued += db.execute(update(CrawlTaskDB).where(
+                    CrawlTaskDB.url.in_(finished), CrawlTaskDB.status.in_((TaskStatus.DONE, TaskStatus.FAILED))
+                ).values(status=TaskStatus.QUEUED, kind=TaskKind.SEED, attempts=0, available_at=now,
+                         last_error=None, updated_at=now)).rowcount
+    return queued
+
+
+def _insert_ignoring_conflicts(db: Session, rows: List[Dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            db.merge(CrawlTaskDB(**row))
+        db.flush()
+        return
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    db.execute(insert(CrawlTaskDB.__table__).on_conflict_do_nothing(index_elements=[CrawlTaskDB.url]), rows)
+
+
+def claim(db: Session, worker_id: str, limit: int = CLAIM_BATCH_SIZE) -> List[Tuple[int, str, str]]:
+    """
+    Leases up to `limit` available URLs to a worker and commits. Returns their (id, url, kind).
+    The lease is taken with a conditional UPDATE, so a URL is never leased to two workers at once.
+    """
+    now = utcnow()
+    max_attempts = get_queue_max_attempts()
+    # Leases that expired on the last attempt: the worker crashed each time
+    db.execute(update(CrawlTaskDB).where(
+        CrawlTaskDB.status == TaskStatus.LEASED, CrawlTaskDB.lease_expires_at <= now,
+        CrawlTaskDB.attempts >= max_attempts
+    ).values(status=TaskStatus.FAILED, lease_owner=None, last_error="Lease expired", updated_at=now))
+    claimable = or_(
+        and_(CrawlTaskDB.status == TaskStatus.QUEUED, CrawlTaskDB.available_at <= now),
+        and_(CrawlTaskDB.status == TaskStatus.LEASED, CrawlTaskDB.lease_expires_at <= now,
+             CrawlTaskDB.attempts < max_attempts))
+    candidates = select(CrawlTaskDB.id).where(claimable).order_by(CrawlTaskDB.available_at, CrawlTaskDB.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)  # Workers claim disjoint rows without waiting
+    candidate_ids = list(db.scalars(candidates))
+    if not candidate_ids:
+        db.commit()
+        return []
+    db.execute(update(CrawlTaskDB).where(CrawlTaskDB.id.in_(candidate_ids), claimable).values(
+        status=TaskStatus.LEASED, lease_owner=worker_id,
+        lease_expires_at=now + timedelta(seconds=get_queue_lease_seconds()),
+        attempts=CrawlTaskDB.attempts + 1, updated_at=now))
+    claimed = db.execute(select(CrawlTaskDB.id, CrawlTaskDB.url, CrawlTaskDB.kind).where(
+        CrawlTaskDB.id.in_(candidate_ids), CrawlTaskDB.lease_owner == worker_id,
+        CrawlTaskDB.status == TaskStatus.LEASED, CrawlTaskDB.updated_at == now)).all()
+    db.commit()
+    return [tuple(row) for row in claimed]
+
+
+def finish(db: Session, worker_id: str, task_ids: List[int]):
+    """Marks leased URLs done, if the worker still holds their lease. The caller commits."""
+    if task_ids:
+        db.execute(update(CrawlTaskDB).where(
+            CrawlTaskDB.id.in_(task_ids), CrawlTaskDB.lease_owner == worker_id,
+            CrawlTaskDB.status == TaskStatus.LEASED
+        ).values(status=TaskStatus.DONE, lease_owner=None, lease_expires_at=None, updated_at=utcnow()))
+
+
+def fail(db: Session, worker_id: str, task_id: int, error: str):
+    """Releases a leased URL for a retry after a backoff, or marks it failed after the last attempt. The caller commits."""
+    task = db.get(CrawlTaskDB, task_id)
+    if task is None or task.lease_owner != worker_id or task.status != TaskStatus.LEASED:
+        return
+    now = utcnow()
+    if task.attempts >= get_queue_max_attempts():
+        task.status = TaskStatus.FAILED
+    else:
+        task.status = TaskStatus.QUEUED
+        task.available_at = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (task.attempts - 1))
+    task.lease_owner = None
+    task.lease_expires_at = None
+    task.last_error = error[:500]
+    task.updated_at = now
+
+
+def queue_counts(db: Session) -> Dict[str, int]:
+    """Number of queue URLs per status."""
+    counts = {status: 0 for status in (TaskStatus.QUEUED, TaskStatus.LEASED, TaskStatus.DONE, TaskStatus.FAILED)}
+    counts.update(db.execute(select(CrawlTaskDB.status, func.count()).group_by(CrawlTaskDB.status)).all())
+    return counts
+
+
+async def crawl_task(url: str, kind: str, fetcher: CrawlFetcher) -> Tuple[Optional[Dict], List[str], List[str]]:
+    """
+    Crawls one queue URL. Returns the article data of an article page, or the article URLs of a listing page
+    or feed, and the URLs of stored articles a feed or sitemap reports as changed (queued again as seeds).
+    """
+    site = get_discovery_site(url)
+    if kind == TaskKind.SEED and site is not None:
+        discovery = await discover_articles(url, site, fetcher=fetcher)
+        return None, discovery.new_urls, discovery.changed_urls
+    website_config = get_website_config(urlparse(url).netloc)
+    page = await fetcher.fetch(url)
+    if kind == TaskKind.SEED and is_listing_page(url, website_config):
+        return None, listing_article_urls(page, website_config), []
+    article_data = await page_article_data(page, website_config)
+    if not article_data:
+        raise ValueError("No article data extracted")
+    return article_data, [], []
+
+
+class QueueWorker:
+    """
+    Crawls URLs from the shared work queue until stopped: claims a batch, crawls it concurrently,
+    and stores the articles, the discovered links and the finished leases in one commit.
+    """
+
+    def __init__(self, batch_size: int = CLAIM_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and get_work_queue_enabled():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Work queue worker {self.worker_id} started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Work queue worker {self.worker_id} failed: {e}")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def run_once(self) -> int:
+        """Claims and crawls one batch. Returns the number of URLs claimed."""
+        db = SessionLocal()
+        try:
+            tasks = await asyncio.to_thread(claim, db, self.worker_id, self.batch_size)
+            if not tasks:
+                return 0
+            fetcher = CrawlFetcher()
+            try:
+                outcomes = await asyncio.gather(*(crawl_task(url, kind, fetcher) for _, url, kind in tasks),
+                                                return_exceptions=True)
+            finally:
+                fetcher.close()
+            await asyncio.to_thread(self._store, db, tasks, outcomes)
+            return len(tasks)
+        finally:
+            db.close()
+
+    def _store(self, db: Session, tasks: List[Tuple[int, str, str]], outcomes: list):
+        articles, links, changed, done = [], [], [], []
+        for (task_id, url, _), outcome in zip(tasks, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Work queue: cannot crawl {url}: {outcome}")
+                fail(db, self.worker_id, task_id, str(outcome) or type(outcome).__name__)
+                continue
+            article_data, article_urls, changed_urls = outcome
+            if article_data:
+                articles.append(article_data)
+            links.extend(article_urls)
+            changed.extend(changed_urls)
+            done.append(task_id)
+        try:
+            bulk_upsert_articles(db, articles)
+            enqueue(db, frontier.unseen(db, links), TaskKind.ARTICLE)  # Stored articles are not crawled again
+            enqueue(db, changed, TaskKind.SEED)  # ...unless a feed or sitemap reports them changed
+            finish(db, self.worker_id, done)
+            db.commit()
+        except Exception as e:  # Nothing is marked done: the URLs are retried when their leases expire
+            db.rollback()
+            logger.error(f"Work queue: failed to store a batch of {len(tasks)} URLs: {e}")
+            return
+        frontier.add(article_data["url"] for article_data in articles)
+
+
+queue_worker = QueueWorker()
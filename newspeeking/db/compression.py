@@ -0,0 +1,154 @@
+# Compressed storage of article bodies: the CompressedText column type and its codecs.
+# Values are stored as a one-byte codec tag followed by the compressed UTF-8 text. zstd (optional
+# `zstandard` package) can use a dictionary trained on stored articles, which suits short texts;
+# zlib is the fallback. Plain text stored before compression was enabled is read as-is.
+import logging
+import struct
+import threading
+import zlib
+from typing import Callable, Dict, Optional, Union
+
+from sqlalchemy import LargeBinary, String
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CODEC_NONE = 0  # Uncompressed UTF-8
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2  # Followed by the 4-byte id of the dictionary used (0: none)
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9  # Compression runs once per article write; decompression speed hardly depends on the level
+_DICT_ID = struct.Struct("<I")
+
+# Trained zstd dictionaries by id, and the one new values are compressed with (see set_dictionary)
+_DICTIONARIES: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+_current_dictionary_id = 0
+_codec = CODEC_ZLIB
+# Loads a dictionary missing from _DICTIONARIES (set by newspeeking.db.database, which stores them)
+dictionary_loader: Optional[Callable[[int], Optional[bytes]]] = None
+# zstd (de)compressor objects per dictionary id: reused, but not shared between threads
+_local = threading.local()
+
+
+def set_codec(name: str):
+    """Selects the codec new values are written with: zstd (zlib if zstandard is not installed), zlib or none."""
+    global _codec
+    if name not in CODECS:
+        raise ValueError(f"Unknown text_compression {name!r}, expected one of {', '.join(CODECS)}")
+    if name == "zstd" and not ZSTD_AVAILABLE:
+        logger.warning("text_compression is zstd but the zstandard package is not installed, using zlib")
+        name = "zlib"
+    _codec = CODECS[name]
+
+
+def codec_name() -> str:
+    return next(name for name, codec in CODECS.items() if codec == _codec)
+
+
+def set_dictionary(dictionary_id: int, data: Optional[bytes]):
+    """Registers a trained zstd dictionary and compresses new values with it (id 0 / no data: no dictionary)."""
+    global _current_dictionary_id
+    if data:
+        _DICTIONARIES[dictionary_id] = zstandard.ZstdCompressionDict(data)
+    _current_dictionary_id = dictionary_id if data else 0
+
+
+def current_dictionary_id() -> int:
+    return _current_dictionary_id if _codec == CODEC_ZSTD else 0
+
+
+def _dictionary(dictionary_id: int) -> "zstandard.ZstdCompressionDict":
+    dictionary = _DICTIONARIES.get(dictionary_id)
+    if dictionary is None:
+        data = dictionary_loader(dictionary_id) if dictionary_loader is not None else None
+        if data is None:
+            raise ValueError(f"zstd dictionary {dictionary_id} not found")
+        dictionary = _DICTIONARIES[dictionary_id] = zstandard.ZstdCompressionDict(data)
+    return dictionary
+
+
+def _zstd(kind: str, dictionary_id: int):
+    cache = _local.__dict__.setdefault(kind, {})
+    instance = cache.get(dictionary_id)
+    if instance is None:
+        dict_data = _dictionary(dictionary_id) if dictionary_id else None
+        if kind == "compressor":
+            instance = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data)
+        else:
+            instance = zstandard.ZstdDecompressor(dict_data=dict_data)
+        cache[dictionary_id] = instance
+    return instance
+
+
+def train_dictionary(samples, size: int) -> bytes:
+    """Trains a zstd dictionary of up to `size` bytes on sample texts."""
+    return zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples]).as_bytes()
+
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if _codec == CODEC_ZSTD:
+        dictionary_id = _current_dictionary_id
+        return bytes([CODEC_ZSTD]) + _DICT_ID.pack(dictionary_id) + _zstd("compressor", dictionary_id).compress(data)
+    if _codec == CODEC_ZLIB:
+        return bytes([CODEC_ZLIB]) + zlib.compress(data, ZLIB_LEVEL)
+    return bytes([CODEC_NONE]) + data
+
+
+def decompress_text(value: Union[None, str, bytes, memoryview]) -> Optional[str]:
+    """Decodes a stored value. Strings are plain text stored before compression was enabled."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value:
+        return ""
+    codec = value[0]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Reading zstd-compressed articles needs the zstandard package")
+        (dictionary_id,) = _DICT_ID.unpack_from(value, 1)
+        return _zstd("decompressor", dictionary_id).decompress(value[1 + _DICT_ID.size:]).decode("utf-8")
+    if codec == CODEC_NONE:
+        return value[1:].decode("utf-8")
+    raise ValueError(f"Unknown compressed text codec {codec}")
+
+
+def stored_codec(value: Union[None, str, bytes]) -> Optional[tuple]:
+    """(codec, dictionary id) of a stored value; None for plain text stored before compression."""
+    if value is None or isinstance(value, str) or not value:
+        return None
+    value = bytes(value[:1 + _DICT_ID.size])
+    return (value[0], _DICT_ID.unpack_from(value, 1)[0] if value[0] == CODEC_ZSTD else 0)
+
+
+class CompressedText(TypeDecorator):
+    """
+    A text column stored compressed (see compress_text) and decompressed when read.
+    SQLite keeps the column's declared text type, so rows written before compression stay readable;
+    other databases store it as binary.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
@@ -1,36 +1,485 @@
 # Database setup and SQLAlchemy model definitions.
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from sqlalchemy import bindparam, case, event, create_engine, delete, inspect, select, text, tuple_, update, BigInteger, Column, Float, ForeignKey, Integer, LargeBinary, String, DateTime, Index
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import deferred, sessionmaker, Session
 from sqlalchemy.sql import func
 
-from newspeeking.config import get_database_url
+from newspeeking import metrics
+from newspeeking.config import get_database_url, get_near_duplicate_threshold, get_text_compression
+from newspeeking.db import compression
+from newspeeking.db.compression import CompressedText
+from newspeeking.nlp.dedup import band_keys, minhash, similarity
 
 engine = create_engine(get_database_url())
 Base = declarative_base()
 
 
+def register_sql_functions(bind):
+    """Makes decompress_text(article_text) available in SQL on the engine's SQLite connections (full-text search)."""
+    if bind.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(bind, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("decompress_text", 1, compression.decompress_text, deterministic=True)
+
+
+register_sql_functions(engine)
+
+UPSERT_BATCH_SIZE = 500  # Rows per statement, well below SQLite's bound parameter limit
+
+
+def utcnow() -> datetime:
+    # Naive UTC like SQLite's CURRENT_TIMESTAMP, but always with microseconds so stored values compare consistently
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class ArticleDB(Base):
     __tablename__ = "articles"
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, unique=True, index=True)
     headline = Column(String)
-    article_text = Column(String)
+    # Compressed on write; deferred, so loading an article object only decompresses the text when it is used
+    article_text = deferred(Column(CompressedText))
     publication_date = Column(DateTime, nullable=True)
     author = Column(String, nullable=True)
     category = Column(String)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, default=utcnow, server_default=func.now())
+    # SHA-256 of the stored fields; re-crawling an unchanged article skips the write
+    content_hash = Column(String(64), nullable=True)
+    domain = Column(String, nullable=True)
+    minhash = Column(LargeBinary, nullable=True)  # MinHash signature of article_text, see newspeeking.nlp.dedup
+    # Set on near-duplicates of another stored article; their article_text is not stored
+    duplicate_of_id = Column(Integer, ForeignKey(
+        "articles.id"), nullable=True, index=True)
+
+    # Composite indexes matching the read API's filters and keyset ordering (newest first, id as tie-breaker)
+    __table_args__ = (
+        Index("ix_articles_created_at_id", "created_at", "id"),
+        Index("ix_articles_publication_date_id", "publication_date", "id"),
+        Index("ix_articles_category_publication_date",
+              "category", "publication_date", "id"),
+        Index("ix_articles_category_created_at", "category", "created_at", "id"),
+        Index("ix_articles_domain_created_at", "domain", "created_at", "id"),
+        Index("ix_articles_domain_publication_date",
+              "domain", "publication_date", "id"),
+        Index("ix_articles_author_publication_date",
+              "author", "publication_date", "id"),
+    )
+
+
+class MinhashBandDB(Base):
+    """LSH index of canonical articles' MinHash signatures: one row per (band, band key)."""
+    __tablename__ = "article_minhash_bands"
+
+    band = Column(Integer, primary_key=True)
+    band_key = Column(BigInteger, primary_key=True)
+    article_id = Column(Integer, ForeignKey("articles.id"),
+                        primary_key=True, index=True)
+
+
+class ListingPageDB(Base):
+    """Re-poll state of a configured listing page (see newspeeking.crawler.poller)."""
+    __tablename__ = "listing_pages"
+
+    url = Column(String, primary_key=True)
+    poll_interval = Column(Float, nullable=False)  # Seconds between polls, adapted to how often new links appear
+    next_poll_at = Column(DateTime, nullable=False)
+    last_polled_at = Column(DateTime, nullable=True)
+    last_new_links = Column(Integer, nullable=True)  # New article URLs found by the last poll
+
+
+class CrawlTaskDB(Base):
+    """A URL in the shared crawl work queue (see newspeeking.crawler.work_queue). One row per URL."""
+    __tablename__ = "crawl_tasks"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String, unique=True, nullable=False)
+    domain = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # "seed" (listing or article page) or "article"
+    status = Column(String, nullable=False, default="queued")  # queued, leased, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=utcnow)  # Not claimed before (retry backoff)
+    lease_owner = Column(String, nullable=True)  # Worker holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)  # After this, another worker may claim the task
+    last_error = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_crawl_tasks_status_available_at", "status", "available_at"),
+    )
+
+
+class DomainBudgetDB(Base):
+    """Per-domain request schedule shared by all crawler processes: the earliest time of the next request."""
+    __tablename__ = "domain_budgets"
+
+    domain = Column(String, primary_key=True)
+    next_request_at = Column(Float, nullable=False)  # Unix time
+
+
+class DiscoverySourceDB(Base):
+    """Read state of a feed or sitemap (see newspeeking.crawler.discovery), including sitemaps found in an index."""
+    __tablename__ = "discovery_sources"
+
+    url = Column(String, primary_key=True)
+    etag = Column(String, nullable=True)  # Validators of the last response, for a conditional GET
+    last_modified = Column(String, nullable=True)
+    lastmod = Column(DateTime, nullable=True)  # <lastmod> of a sitemap in its index when it was last read
+    checked_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+class DiscoveredUrlDB(Base):
+    """Newest date (<lastmod>, <pubDate>, <updated>) a feed or sitemap gave for an article URL."""
+    __tablename__ = "discovered_urls"
+
+    url = Column(String, primary_key=True)
+    lastmod = Column(DateTime, nullable=False)
+
+
+class CompressionDictionaryDB(Base):
+    """zstd dictionaries trained on stored article texts (see newspeeking.db.recompress). The newest one is used."""
+    __tablename__ = "compression_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+def add_missing_columns(bind):
+    """Adds columns introduced after a database was created (create_all only creates missing tables)."""
+    existing_columns = {column["name"]
+                        for column in inspect(bind).get_columns(ArticleDB.__tablename__)}
+    with bind.begin() as connection:
+        for column in ArticleDB.__table__.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {ArticleDB.__tablename__} ADD COLUMN {column.name} {column_type}"))
+
+
+def migrate_schema(bind):
+    """Brings a database created by an earlier version up to date with the ArticleDB model."""
+    add_missing_columns(bind)
+    article_text_type = next(column["type"] for column in inspect(bind).get_columns(ArticleDB.__tablename__)
+                             if column["name"] == "article_text")
+    if bind.dialect.name != "sqlite" and isinstance(article_text_type, String):
+        # Plain text becomes binary tagged as uncompressed (see compression.CODEC_NONE); recompress later
+        with bind.begin() as connection:
+            connection.execute(text(
+                "ALTER TABLE articles ALTER COLUMN article_text TYPE bytea "
+                "USING CASE WHEN article_text IS NULL THEN NULL ELSE '\\x00'::bytea || convert_to(article_text, 'UTF8') END"))
+    for index in ArticleDB.__table__.indexes:
+        index.create(bind, checkfirst=True)
+    with bind.begin() as connection:
+        if bind.dialect.name == "sqlite":
+            # CURRENT_TIMESTAMP values lack microseconds and would compare out of order with newer rows
+            connection.execute(text(
+                "UPDATE articles SET created_at = created_at || '.000000' WHERE length(created_at) = 19"))
+        missing_domains = connection.execute(select(ArticleDB.id, ArticleDB.url).where(
+            ArticleDB.domain.is_(None), ArticleDB.url.is_not(None))).all()
+        if missing_domains:
+            connection.execute(update(ArticleDB).where(ArticleDB.id == bindparam("article_id")).values(
+                domain=bindparam("article_domain")),
+                [{"article_id": article_id, "article_domain": article_domain(url)} for article_id, url in missing_domains])
+
+
+def article_domain(url: str) -> str:
+    """Domain an article is filed under (the URL's host, lowercased)."""
+    return urlparse(url).netloc.lower()
+
+
+def load_compression_dictionary(dictionary_id: int) -> Optional[bytes]:
+    with engine.connect() as connection:
+        return connection.scalar(select(CompressionDictionaryDB.data).where(CompressionDictionaryDB.id == dictionary_id))
+
+
+def configure_compression(bind=engine):
+    """Selects the configured text_compression codec and the newest trained zstd dictionary for new writes."""
+    compression.set_codec(get_text_compression())
+    if compression.codec_name() == "zstd":
+        with bind.connect() as connection:
+            latest = connection.execute(select(CompressionDictionaryDB.id, CompressionDictionaryDB.data).order_by(
+                CompressionDictionaryDB.id.desc()).limit(1)).first()
+        if latest is not None:
+            compression.set_dictionary(latest.id, latest.data)
 
 
 Base.metadata.create_all(bind=engine)
+migrate_schema(engine)
+compression.dictionary_loader = load_compression_dictionary
+configure_compression()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(SessionLocal, "before_commit")
+def _commit_started(session: Session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _commit_finished(session: Session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - started, "commit", "ok")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _commit_failed(session: Session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:  # The rollback followed a failed commit
+        metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - started, "commit", "error")
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def content_hash(row: Dict) -> str:
+    """Hash of the crawled fields of an article row."""
+    publication_date = row.get("publication_date")
+    parts = [row.get("headline"), row.get("article_text"),
+             publication_date.isoformat() if publication_date else None,
+             row.get("author"), row.get("category")]
+    return hashlib.sha256("\x1f".join(part or "" for part in parts).encode("utf-8")).hexdigest()
+
+
+def article_row(article_data: Dict) -> Dict:
+    """Converts crawler article data into ArticleDB column values."""
+    row = {key: article_data.get(key) for key in (
+        "url", "headline", "article_text", "publication_date", "author", "category")}
+    publication_date = row["publication_date"]
+    if isinstance(publication_date, str):  # Extractors return ISO strings, the column wants a datetime
+        row["publication_date"] = datetime.fromisoformat(publication_date)
+    row["content_hash"] = content_hash(row)
+    row["domain"] = article_domain(row["url"])
+    return row
+
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0  # Inserted or updated articles stored as near-duplicates of another article
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    def __iadd__(self, other: "UpsertResult") -> "UpsertResult":
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.duplicates += other.duplicates
+        return self
+
+
+def bulk_upsert_articles(db: Session, articles: List[Dict]) -> UpsertResult:
+    """
+    Inserts new articles and updates changed ones with INSERT ... ON CONFLICT(url) DO UPDATE,
+    one statement per batch. Articles whose content hash matches the stored row are not written.
+    Near-duplicates of a stored article (or of an earlier article in the batch) are linked to it
+    through duplicate_of_id instead of storing their text again.
+    created_at keeps its original value on update. The caller commits.
+    """
+    rows = {}
+    for article_data in articles:
+        if article_data:
+            row = article_row(article_data)
+            rows[row["url"]] = row  # Last copy of a URL wins
+    result = UpsertResult()
+    rows = list(rows.values())
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        started = time.perf_counter()
+        try:
+            result += _upsert_batch(db, rows[start:start + UPSERT_BATCH_SIZE])
+        except Exception:
+            metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - started, "upsert", "error")
+            raise
+        metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - started, "upsert", "ok")
+    return result
+
+
+def _upsert_batch(db: Session, rows: List[Dict]) -> UpsertResult:
+    stored_hashes = dict(db.execute(
+        select(ArticleDB.url, ArticleDB.content_hash).where(
+            ArticleDB.url.in_([row["url"] for row in rows]))).all())
+    result = UpsertResult()
+    changed_rows = []
+    for row in rows:
+        if row["url"] not in stored_hashes:
+            result.inserted += 1
+        elif stored_hashes[row["url"]] != row["content_hash"]:
+            result.updated += 1
+        else:
+            result.unchanged += 1
+            continue
+        changed_rows.append(row)
+    if not changed_rows:
+        return result
+
+    within_batch_links = link_near_duplicates(db, changed_rows)
+    result.duplicates = sum(1 for row in changed_rows if row["duplicate_of_id"]) + len(within_batch_links)
+    from newspeeking.db import search  # Imported here: search imports this module
+    sync_search = search.search_index_enabled(db.get_bind())
+    if sync_search:  # The full-text index is updated here rather than by triggers, see newspeeking.db.search
+        search.unindex_articles(db, search.indexed_values(
+            db, [row["url"] for row in changed_rows if row["url"] in stored_hashes]))
+    _write_rows(db, changed_rows)
+    if within_batch_links:  # Canonical rows of the same batch only got their ids on insert
+        db.execute(text("UPDATE articles SET duplicate_of_id = (SELECT id FROM articles WHERE url = :canonical_url) WHERE url = :url"),
+                   [{"url": url, "canonical_url": canonical_url} for url, canonical_url in within_batch_links])
+    index_signatures(db, changed_rows)
+    if sync_search:
+        search.index_articles(db, changed_rows)
+    return result
+
+
+def _write_rows(db: Session, rows: List[Dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):  # No ON CONFLICT support: fall back to ORM writes
+        for row in rows:
+            existing_article = db.query(ArticleDB).filter(
+                ArticleDB.url == row["url"]).first()
+            if existing_article:
+                for key, value in row.items():
+                    setattr(existing_article, key, value)
+            else:
+                db.add(ArticleDB(**row))
+        db.flush()
+        return
+
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    statement = insert(ArticleDB.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ArticleDB.url],
+        set_={key: statement.excluded[key]
+              for key in rows[0] if key != "url"},
+        # Guards against a concurrent writer having stored the same content meanwhile
+        where=ArticleDB.content_hash.is_distinct_from(
+            statement.excluded.content_hash))
+    db.execute(statement, rows)
+
+
+def link_near_duplicates(db: Session, rows: List[Dict]) -> List[Tuple[str, str]]:
+    """
+    Computes each row's MinHash signature and looks up stored canonical articles sharing an LSH band
+    (one query for the whole batch). A row at least as similar as the configured threshold to a stored
+    article gets its duplicate_of_id set and its article_text dropped.
+    Returns (url, canonical_url) links for rows duplicating an earlier row of the same batch.
+    """
+    threshold = get_near_duplicate_threshold()
+    for row in rows:
+        row["minhash"] = minhash(row["article_text"])
+        row["duplicate_of_id"] = None
+    if threshold is None:  # Detection disabled: signatures are still stored
+        return []
+
+    signed_rows = [row for row in rows if row["minhash"] is not None]
+    wanted_keys = {(band, band_key) for row in signed_rows
+                   for band, band_key in band_keys(row["minhash"])}
+    candidates: Dict[Tuple[int, int], List[Tuple[int, str, bytes]]] = {}
+    if wanted_keys:
+        for band, band_key, article_id, url, signature in db.execute(
+                select(MinhashBandDB.band, MinhashBandDB.band_key, ArticleDB.id, ArticleDB.url, ArticleDB.minhash)
+                .join(ArticleDB, ArticleDB.id == MinhashBandDB.article_id)
+                .where(tuple_(MinhashBandDB.band, MinhashBandDB.band_key).in_(wanted_keys))):
+            candidates.setdefault((band, band_key), []).append(
+                (article_id, url, signature))
+
+    batch_index: Dict[Tuple[int, int], List[Dict]] = {}
+    within_batch_links = []
+    for row in signed_rows:
+        keys = band_keys(row["minhash"])
+        canonical_id = _closest_stored(row, keys, candidates, threshold)
+        if canonical_id is not None:
+            row["duplicate_of_id"] = canonical_id
+            row["article_text"] = None
+            continue
+        canonical_row = _closest_in_batch(row, keys, batch_index, threshold)
+        if canonical_row is not None:
+            within_batch_links.append((row["url"], canonical_row["url"]))
+            row["article_text"] = None
+            continue
+        for key in keys:  # Canonical: later rows of the batch may duplicate it
+            batch_index.setdefault(key, []).append(row)
+    return within_batch_links
+
+
+def _closest_stored(row: Dict, keys, candidates, threshold: float) -> Optional[int]:
+    best = None
+    for key in keys:
+        for article_id, url, signature in candidates.get(key, ()):
+            if url == row["url"] or signature is None:
+                continue  # An article being re-crawled is not a duplicate of itself
+            score = similarity(row["minhash"], signature)
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, article_id)
+    return best[1] if best else None
+
+
+def _closest_in_batch(row: Dict, keys, batch_index, threshold: float) -> Optional[Dict]:
+    for key in keys:
+        for other_row in batch_index.get(key, ()):
+            if similarity(row["minhash"], other_row["minhash"]) >= threshold:
+                return other_row
+    return None
+
+
+def index_signatures(db: Session, rows: List[Dict]):
+    """Replaces the LSH band entries of the written rows; only canonical articles are indexed."""
+    urls = [row["url"] for row in rows]
+    db.execute(delete(MinhashBandDB).where(MinhashBandDB.article_id.in_(
+        select(ArticleDB.id).where(ArticleDB.url.in_(urls)))))
+    band_rows = [{"band": band, "band_key": band_key, "url": row["url"]}
+                 for row in rows if row["minhash"] is not None and row["article_text"] is not None
+                 for band, band_key in band_keys(row["minhash"])]
+    if band_rows:
+        db.execute(text("INSERT INTO article_minhash_bands (band, band_key, article_id) "
+                        "SELECT :band, :band_key, id FROM articles WHERE url = :url"), band_rows)
+
+
+def reserve_domain_slot(domain: str, rate_limit_delay: float) -> float:
+    """
+    Reserves the next request slot of a domain in domain_budgets, so that requests of all processes
+    together are spaced by rate_limit_delay. Returns the seconds to wait until the reserved slot.
+    """
+    now = time.time()
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name not in ("sqlite", "postgresql"):  # No ON CONFLICT: row lock and update
+            budget = db.get(DomainBudgetDB, domain, with_for_update=True)
+            if budget is None:
+                budget = DomainBudgetDB(domain=domain, next_request_at=now)
+                db.add(budget)
+            slot_at = max(budget.next_request_at, now)
+            budget.next_request_at = slot_at + rate_limit_delay
+            db.commit()
+            return slot_at - now
+        insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        statement = insert(DomainBudgetDB).values(domain=domain, next_request_at=now + rate_limit_delay)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DomainBudgetDB.domain],
+            # One atomic statement: concurrent reservations are serialized by the database
+            set_={"next_request_at": case((DomainBudgetDB.next_request_at > now, DomainBudgetDB.next_request_at),
+                                          else_=now) + rate_limit_delay}
+        ).returning(DomainBudgetDB.next_request_at)
+        next_request_at = db.execute(statement).scalar_one()
+        db.commit()
+        return max(0.0, next_request_at - rate_limit_delay - now)
+    finally:
+        db.close()
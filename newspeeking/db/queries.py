@@ -0,0 +1,124 @@
+# Read queries over stored articles: filtering and keyset (cursor) pagination.
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, undefer
+
+from newspeeking.config import normalize_domain
+from newspeeking.db.database import ArticleDB
+
+ORDER_COLUMNS = {
+    "created_at": ArticleDB.created_at,
+    "publication_date": ArticleDB.publication_date,
+}
+
+# Columns returned by list views; article_text is only added on request
+SUMMARY_COLUMNS = (ArticleDB.id, ArticleDB.url, ArticleDB.domain, ArticleDB.headline, ArticleDB.publication_date,
+                   ArticleDB.author, ArticleDB.category, ArticleDB.created_at, ArticleDB.duplicate_of_id)
+
+
+EXPORT_BATCH_SIZE = 1000  # Rows fetched from the server-side cursor at a time
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class ArticleFilters:
+    category: Optional[str] = None
+    domain: Optional[str] = None
+    author: Optional[str] = None
+    published_after: Optional[datetime] = None
+    published_before: Optional[datetime] = None
+    duplicate: Optional[bool] = None  # True: only near-duplicates, False: only canonical articles
+
+    def apply(self, statement):
+        if self.category is not None:
+            statement = statement.where(ArticleDB.category == self.category)
+        if self.domain is not None:  # Articles are filed under the URL's host: match it with or without www.
+            domain = normalize_domain(self.domain)
+            statement = statement.where(ArticleDB.domain.in_([domain, f"www.{domain}"]))
+        if self.author is not None:
+            statement = statement.where(ArticleDB.author == self.author)
+        if self.published_after is not None:
+            statement = statement.where(
+                ArticleDB.publication_date >= self.published_after)
+        if self.published_before is not None:
+            statement = statement.where(
+                ArticleDB.publication_date < self.published_before)
+        if self.duplicate is not None:
+            statement = statement.where(ArticleDB.duplicate_of_id.is_not(
+                None) if self.duplicate else ArticleDB.duplicate_of_id.is_(None))
+        return statement
+
+
+def encode_cursor(order_value: datetime, article_id: int) -> str:
+    """Opaque cursor pointing just after the given row."""
+    payload = json.dumps([order_value.isoformat(), article_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        order_value, article_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(order_value), int(article_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def list_articles(db: Session, filters: ArticleFilters, order_by: str = "created_at", limit: int = 50,
+                  cursor: Optional[str] = None, include_text: bool = False) -> Tuple[List, Optional[str]]:
+    """
+    Returns one page of articles, newest first, and the cursor of the next page (None on the last page).
+    Pages are selected with a keyset condition on (order column, id) instead of OFFSET, so every page
+    is an index range scan regardless of how deep the client has paged.
+    Articles without a publication date are left out when ordering by publication date.
+    """
+    order_column = ORDER_COLUMNS[order_by]
+    columns = SUMMARY_COLUMNS + \
+        ((ArticleDB.article_text,) if include_text else ())
+    statement = filters.apply(select(*columns)).where(order_column.is_not(None))
+    if cursor:
+        order_value, article_id = decode_cursor(cursor)
+        statement = statement.where(or_(order_column < order_value, and_(
+            order_column == order_value, ArticleDB.id < article_id)))
+    statement = statement.order_by(
+        order_column.desc(), ArticleDB.id.desc()).limit(limit + 1)
+
+    rows = db.execute(statement).all()
+    next_cursor = None
+    if len(rows) > limit:  # One extra row tells whether there is a next page
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last_row, order_by), last_row.id)
+    return rows, next_cursor
+
+
+def iter_articles(db: Session, filters: ArticleFilters, include_text: bool = True,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List]:
+    """
+    Yields all matching articles in id order, in lists of up to batch_size rows.
+    Rows are streamed from a server-side cursor (yield_per), so memory stays constant however many articles match.
+    """
+    columns = SUMMARY_COLUMNS + \
+        ((ArticleDB.article_text,) if include_text else ())
+    statement = filters.apply(select(*columns)).order_by(
+        ArticleDB.id).execution_options(yield_per=batch_size)
+    for rows in db.execute(statement).partitions():
+        yield rows
+
+
+def get_article(db: Session, article_id: int) -> Optional[ArticleDB]:
+    return db.get(ArticleDB, article_id, options=[undefer(ArticleDB.article_text)])  # Text loaded in the same query
+
+
+def get_article_summary(db: Session, url: str):
+    """The list-view columns of the article stored under a URL, or None."""
+    return db.execute(select(*SUMMARY_COLUMNS).where(ArticleDB.url == url)).first()
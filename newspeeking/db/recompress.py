@@ -0,0 +1,109 @@
+# Rewrites stored article texts with the configured text_compression codec, e.g. after upgrading from
+# plain-text storage, after changing the codec, or to use a newly trained zstd dictionary.
+# Usage (from the project root): python -m newspeeking.db.recompress [--train] [--vacuum]
+import argparse
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import bindparam, select, text, update
+
+from newspeeking.db import compression
+from newspeeking.db.database import ArticleDB, CompressionDictionaryDB, SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+RECOMPRESS_BATCH_SIZE = 500  # Articles rewritten per commit
+DICTIONARY_SIZE = 64 * 1024
+DICTIONARY_SAMPLES = 2000  # Most recent article texts the dictionary is trained on
+
+
+@dataclass
+class RecompressResult:
+    rewritten: int = 0
+    unchanged: int = 0  # Already stored with the current codec and dictionary
+    bytes_before: int = 0  # Stored size of the rewritten texts
+    bytes_after: int = 0
+
+
+def train_dictionary(db) -> Optional[int]:
+    """Trains a zstd dictionary on recent article texts, stores it and uses it for new writes. Returns its id."""
+    samples = [article_text for article_text in db.scalars(
+        select(ArticleDB.article_text).where(ArticleDB.article_text.is_not(None))
+        .order_by(ArticleDB.id.desc()).limit(DICTIONARY_SAMPLES)) if article_text]
+    try:
+        data = compression.train_dictionary(samples, DICTIONARY_SIZE)
+    except compression.zstandard.ZstdError as e:  # Too few or too short samples
+        logger.warning(f"Could not train a zstd dictionary on {len(samples)} articles: {e}")
+        return None
+    dictionary = CompressionDictionaryDB(data=data)
+    db.add(dictionary)
+    db.commit()
+    compression.set_dictionary(dictionary.id, data)
+    logger.info(f"Trained zstd dictionary {dictionary.id} ({len(data)} bytes) on {len(samples)} articles")
+    return dictionary.id
+
+
+def recompress_articles(train: bool = False, batch_size: int = RECOMPRESS_BATCH_SIZE) -> RecompressResult:
+    """
+    Rewrites every article text not stored with the current codec (and zstd dictionary), one commit per batch.
+    With zstd, a dictionary is trained first if there is none yet or `train` is set.
+    """
+    result = RecompressResult()
+    db = SessionLocal()
+    try:
+        if compression.codec_name() == "zstd" and (train or not compression.current_dictionary_id()):
+            train_dictionary(db)
+        target = (compression.CODECS[compression.codec_name()], compression.current_dictionary_id())
+        rewrite = update(ArticleDB.__table__).where(ArticleDB.__table__.c.id == bindparam("article_id")).values(
+            article_text=bindparam("new_text"))
+        last_id = 0
+        while True:
+            # Raw stored values: the codec of each row is read from its tag without decompressing it
+            rows = db.execute(text("SELECT id, article_text FROM articles WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                              {"last_id": last_id, "limit": batch_size}).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            changed = []
+            for article_id, stored in rows:
+                if stored is None or compression.stored_codec(stored) == target:
+                    result.unchanged += 1
+                    continue
+                article_text = compression.decompress_text(stored)
+                changed.append({"article_id": article_id, "new_text": article_text})
+                result.bytes_before += len(stored.encode("utf-8") if isinstance(stored, str) else stored)
+                result.bytes_after += len(compression.compress_text(article_text))
+            if changed:
+                db.execute(rewrite, changed)
+                db.commit()
+                result.rewritten += len(changed)
+                logger.info(f"Recompressed {result.rewritten} articles")
+    finally:
+        db.close()
+    return result
+
+
+def vacuum():
+    """Returns the space freed by recompression to the filesystem."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM" if engine.dialect.name == "sqlite" else "VACUUM articles"))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recompress stored article texts with the configured codec.")
+    parser.add_argument("--train", action="store_true", help="Train a new zstd dictionary first")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    parser.add_argument("--batch-size", type=int, default=RECOMPRESS_BATCH_SIZE)
+    args = parser.parse_args()
+    result = recompress_articles(args.train, args.batch_size)
+    if args.vacuum:
+        vacuum()
+    print(f"{result.rewritten} articles recompressed with {compression.codec_name()} "
+          f"(dictionary {compression.current_dictionary_id() or 'none'}): "
+          f"{result.bytes_before} -> {result.bytes_after} bytes; {result.unchanged} unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# Full-text search over stored articles with SQLite FTS5.
+# The articles_fts index is an external-content FTS5 table over `articles`. It is kept in sync from Python by
+# bulk_upsert_articles (with the plain texts it writes), not by triggers, so other programs can write to `articles`
+# through plain SQLite connections; their writes are not indexed until the next rebuild.
+# Article texts are stored compressed, so snippets and rebuilds read them through a view that decompresses them
+# with the decompress_text SQL function, registered on this application's connections (database.register_sql_functions).
+# Rebuild it for an existing database with: python -m newspeeking.db.search rebuild
+import argparse
+import logging
+import re
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from newspeeking.db.database import ArticleDB, engine
+from newspeeking.db.queries import SUMMARY_COLUMNS, ArticleFilters
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "articles_fts"
+FTS_CONTENT_VIEW = "articles_fts_content"
+HEADLINE_WEIGHT = 5.0  # bm25 weight of a headline hit relative to a body hit
+
+_CREATE_STATEMENTS = [
+    f"""CREATE VIEW IF NOT EXISTS {FTS_CONTENT_VIEW} AS
+        SELECT id, headline, decompress_text(article_text) AS article_text FROM articles""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        headline, article_text, content='{FTS_CONTENT_VIEW}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+]
+_TRIGGERS = ("ai", "ad", "au")  # Sync triggers of earlier versions
+
+# (id, headline, plain article text) as indexed
+IndexedValues = Tuple[int, Optional[str], Optional[str]]
+
+_INDEXED_BINDS: "weakref.WeakSet" = weakref.WeakSet()  # Engines whose database has the index
+
+_fts = table(FTS_TABLE, column("rowid"))
+_fts_ref = literal_column(FTS_TABLE)
+
+
+class InvalidSearchQuery(ValueError):
+    pass
+
+
+def search_supported(bind=engine) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(bind=engine):
+    """Creates the FTS5 table, indexing existing articles the first time."""
+    if not search_supported(bind):
+        logger.info("Full-text search needs SQLite FTS5; /search is disabled.")
+        return
+    with bind.begin() as connection:
+        existing_sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"),
+                                          {"name": FTS_TABLE}).scalar()
+        existed = existing_sql is not None
+        for trigger in _TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}"))
+        if existed and FTS_CONTENT_VIEW not in existing_sql:  # Index of plain-text articles: recreate it
+            connection.execute(text(f"DROP TABLE {FTS_TABLE}"))
+            existed = False
+        for statement in _CREATE_STATEMENTS:
+            connection.execute(text(statement))
+        # The built-in rank column orders by bm25 with the headline weighted up
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({HEADLINE_WEIGHT}, 1.0)')"))
+        if not existed:
+            connection.execute(
+                text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    _INDEXED_BINDS.add(bind)
+
+
+def search_index_enabled(bind) -> bool:
+    """Whether writes through this engine keep a search index in sync."""
+    return bind in _INDEXED_BINDS
+
+
+def indexed_values(db: Session, urls: Iterable[str]) -> List[IndexedValues]:
+    """The values the stored articles with these URLs are indexed with, read before they are overwritten."""
+    urls = list(urls)
+    if not urls:
+        return []
+    return [tuple(row) for row in db.execute(select(ArticleDB.id, ArticleDB.headline, ArticleDB.article_text)
+                                             .where(ArticleDB.url.in_(urls)))]
+
+
+def unindex_articles(db: Session, previous: List[IndexedValues]):
+    """Removes articles from the index; an external-content index needs the values they were indexed with."""
+    if previous:
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, headline, article_text) "
+                        "VALUES ('delete', :id, :headline, :article_text)"),
+                   [{"id": article_id, "headline": headline, "article_text": article_text}
+                    for article_id, headline, article_text in previous])
+
+
+def index_articles(db: Session, rows: List[Dict]):
+    """Indexes written article rows (url, headline and plain article_text, as passed to the upsert)."""
+    if not rows:
+        return
+    ids = dict(db.execute(select(ArticleDB.url, ArticleDB.id).where(
+        ArticleDB.url.in_([row["url"] for row in rows]))).all())
+    db.execute(text(f"INSERT INTO {FTS_TABLE}(rowid, headline, article_text) VALUES (:id, :headline, :article_text)"),
+               [{"id": ids[row["url"]], "headline": row.get("headline"), "article_text": row.get("article_text")}
+                for row in rows if row["url"] in ids])
+
+
+def clear_search_index(db: Session):
+    """Empties the index, e.g. along with the articles table."""
+    if search_index_enabled(db.get_bind()):
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+
+
+def rebuild_search_index(bind=engine):
+    """Reindexes every article from the articles table and merges the index segments."""
+    with bind.begin() as connection:
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def match_expression(query: str) -> str:
+    """Turns plain search words into an FTS5 query matching all of them (each word quoted, so no operator syntax)."""
+    terms = re.findall(r"\w+", query)
+    return " ".join('"' + term + '"' for term in terms)
+
+
+def search_articles(db: Session, query: str, filters: ArticleFilters, limit: int = 20, offset: int = 0,
+                    raw_query: bool = False) -> List[Tuple]:
+    """
+    Returns articles matching the query, best match first, with a highlighted snippet and bm25 score.
+    With raw_query=True the query is passed to FTS5 as-is (phrases, prefix*, AND/OR/NOT, NEAR).
+    """
+    match = query if raw_query else match_expression(query)
+    if not match:
+        raise InvalidSearchQuery("The search query has no searchable words.")
+    statement = select(
+        *SUMMARY_COLUMNS,
+        func.snippet(_fts_ref, -1, "<mark>", "</mark>",
+                     "…", 24).label("snippet"),
+        literal_column(f"{FTS_TABLE}.rank").label("score"),
+    ).select_from(_fts.join(ArticleDB, ArticleDB.id == _fts.c.rowid)).where(_fts_ref.op("MATCH")(match))
+    statement = filters.apply(statement).order_by(
+        literal_column(f"{FTS_TABLE}.rank")).limit(limit).offset(offset)
+    try:
+        return db.execute(statement).all()
+    except OperationalError as e:  # FTS5 syntax errors in raw queries
+        raise InvalidSearchQuery(f"Invalid search query: {e.orig}") from e
+
+
+create_search_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Maintain the article full-text search index.")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    rebuild_search_index()
+    logger.info("Full-text search index rebuilt.")
@@ -1,18 +1,37 @@
 # newspeeking/main.py
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from newspeeking.api.endpoints import router as api_router
+from newspeeking.crawler.archive import close_archive
+from newspeeking.crawler.jobs import job_manager
+from newspeeking.crawler.parse_pool import parse_pool
+from newspeeking.crawler.poller import listing_poller
+from newspeeking.crawler.work_queue import queue_worker
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listing_poller.start()  # Re-poll configured listing pages, if any
+    queue_worker.start()  # Crawl from the shared work queue, if enabled
+    yield
+    await queue_worker.stop()
+    await listing_poller.stop()
+    await job_manager.shutdown()  # Stop background crawl jobs on shutdown
+    parse_pool.shutdown()
+    close_archive()
+
 app = FastAPI(title="NewsPeeking API",
               description="API to crawl news websites, extract articles, and classify them.",
               version="1.0.0",
               openapi_url="/openapi.json",  # OpenAPI schema
               docs_url="/docs",             # Swagger UI
-              redoc_url="/redoc"            # ReDoc
+              redoc_url="/redoc",           # ReDoc
+              lifespan=lifespan
               )
 
 app.include_router(api_router)
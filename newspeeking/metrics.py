@@ -0,0 +1,165 @@
+# Built-in crawl pipeline metrics, exposed in the Prometheus text format on /metrics.
+# Counters and histograms are aggregated in process under one lock per metric, cheap enough for the hot path.
+# Parse pool workers buffer their observations and the parent replays them with each batch's results.
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+BYTES_BUCKETS = tuple(float(1024 * 4 ** power) for power in range(8))  # 1 KiB .. 16 MiB
+
+_REGISTRY: Dict[str, "_Metric"] = {}
+_buffer: Optional[List[Tuple[str, tuple, float]]] = None  # Set in parse pool workers
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+        _REGISTRY[name] = self
+
+    def _submit(self, labelvalues: tuple, value: float):
+        if _buffer is not None:
+            _buffer.append((self.name, labelvalues, value))
+        else:
+            self._record(labelvalues, value)
+
+    def _record(self, labelvalues: tuple, value: float):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            values = [(labelvalues, self._copy(value)) for labelvalues, value in self._values.items()]
+        for labelvalues, value in values:
+            lines.extend(self._samples(labelvalues, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _samples(self, labelvalues: tuple, value) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        self._submit(labelvalues, amount)
+
+    def _record(self, labelvalues: tuple, value: float):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + value
+
+    def _samples(self, labelvalues: tuple, value) -> List[str]:
+        return [f"{self.name}{_label_text(self.labelnames, labelvalues)} {_number(value)}"]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues: str):
+        self._submit(labelvalues, value)
+
+    def _record(self, labelvalues: tuple, value: float):
+        bucket = bisect.bisect_left(self.buckets, value)  # Index of the first upper bound >= value
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bucket] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _samples(self, labelvalues: tuple, value) -> List[str]:
+        bucket_counts, total, count = value
+        lines, cumulative = [], 0
+        for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            le = "+Inf" if upper_bound == float("inf") else _number(upper_bound)
+            bucket_labels = _label_text(self.labelnames, labelvalues, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _label_text(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def buffer_observations():
+    """Makes this process collect observations for take_buffered() instead of aggregating them (parse pool workers)."""
+    global _buffer
+    _buffer = []
+
+
+def take_buffered() -> List[Tuple[str, tuple, float]]:
+    """Returns and clears the buffered observations (empty unless buffer_observations() was called)."""
+    global _buffer
+    if not _buffer:
+        return []
+    observations, _buffer = _buffer, []
+    return observations
+
+
+def replay(observations: List[Tuple[str, tuple, float]]):
+    """Aggregates observations buffered by another process."""
+    for name, labelvalues, value in observations:
+        metric = _REGISTRY.get(name)
+        if metric is not None:
+            metric._record(tuple(labelvalues), value)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _REGISTRY.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+FETCH_SECONDS = Histogram(
+    "newspeeking_fetch_seconds", "HTTP fetch time (request and body download).", ("domain", "outcome"))
+FETCH_BYTES = Histogram(
+    "newspeeking_fetch_bytes", "Size of downloaded response bodies.", ("domain",), BYTES_BUCKETS)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "newspeeking_rate_limit_wait_seconds", "Time a request waited for its domain's rate limit and a concurrency slot.",
+    ("domain",))
+PARSE_SECONDS = Histogram(
+    "newspeeking_parse_seconds", "HTML extraction time of listing and article pages.", ("domain", "page", "outcome"))
+CLASSIFY_SECONDS = Histogram(
+    "newspeeking_classify_seconds", "Article classification time.", ("domain",))
+DB_WRITE_SECONDS = Histogram(
+    "newspeeking_db_write_seconds", "Database write time: bulk upsert statements and commits.", ("operation", "outcome"))
+HTTP_RESPONSES = Counter(
+    "newspeeking_http_responses_total", "HTTP responses received, by status code.", ("domain", "status"))
+EXTRACTION_FAILURES = Counter(
+    "newspeeking_extraction_failures_total", "Article pages that yielded no article data.", ("domain", "reason"))
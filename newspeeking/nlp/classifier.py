@@ -1,28 +1,102 @@
 # Natural Language Processing (NLP) module for article classification.
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from typing import Dict, List
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-stop_words = set(stopwords.words('english'))
-
-
-def classify_article(article_text: str, categories: Dict[str, List[str]]) -> str:
-    tokens = word_tokenize(article_text.lower())
-    filtered_tokens = [
-        w for w in tokens if not w in stop_words and w.isalnum()]
-
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword.lower() in filtered_tokens:
-                return category
-        return "General"
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from newspeeking.config import get_categories, get_registry
+
+DEFAULT_CATEGORY = "General"
+
+# Runs of letters and digits (Unicode word characters except the underscore); any other character,
+# apostrophes and hyphens included, separates tokens
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# English stop words (the NLTK list), built in so classification needs no corpus download
+STOP_WORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at be because been before
+being below between both but by can couldn couldn't d did didn didn't do does doesn doesn't doing don
+don't down during each few for from further had hadn hadn't has hasn hasn't have haven haven't having he
+her here hers herself him himself his how i if in into is isn isn't it it's its itself just ll m ma me
+mightn mightn't more most mustn mustn't my myself needn needn't no nor not now o of off on once only or
+other our ours ourselves out over own re s same shan shan't she she's should should've shouldn shouldn't
+so some such t than that that'll the their theirs them themselves then there these they this those
+through to too under until up ve very was wasn wasn't we were weren weren't what when where which while
+who whom why will with won won't wouldn wouldn't y you you'd you'll you're you've your yours yourself
+yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases text and splits it into alphanumeric tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    Inverted index of the category keywords, compiled once from the categories configuration.
+    Maps the first token of every keyword (single word or multi-word phrase) to the phrases
+    starting with it and the categories they belong to, so an article is scored against
+    all categories in a single pass over its tokens.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.categories = list(categories)  # Config order breaks ties between equal scores
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], int]]] = {}
+        for category_position, keywords in enumerate(categories.values()):
+            for keyword in keywords or []:
+                phrase = tuple(tokenize(str(keyword)))
+                if not phrase or (len(phrase) == 1 and phrase[0] in STOP_WORDS):
+                    continue  # Stop words are never matched
+                self._index.setdefault(phrase[0], []).append(
+                    (phrase, category_position))
+
+    def scores(self, tokens: List[str]) -> List[int]:
+        """Counts keyword occurrences per category (in config order)."""
+        scores = [0] * len(self.categories)
+        index = self._index
+        for position, token in enumerate(tokens):
+            entries = index.get(token)
+            if entries is None:
+                continue
+            for phrase, category_position in entries:
+                if len(phrase) == 1 or tuple(tokens[position:position + len(phrase)]) == phrase:
+                    scores[category_position] += 1
+        return scores
+
+    def classify(self, article_text: str) -> str:
+        """Returns the category with the most keyword hits, or the default category if none match."""
+        scores = self.scores(tokenize(article_text))
+        best_score = max(scores, default=0)
+        if best_score == 0:
+            return DEFAULT_CATEGORY
+        return self.categories[scores.index(best_score)]
+
+
+_INDEXES: Dict[int, tuple] = {}  # id(categories) -> (categories, index)
+_INDEXES_VERSION: Optional[int] = None  # Configuration version the cached indexes were compiled under
+
+
+def get_keyword_index(categories: Optional[Dict[str, List[str]]] = None) -> KeywordIndex:
+    """Returns the compiled keyword index for a categories configuration, compiling it on first use."""
+    global _INDEXES_VERSION
+    version = get_registry().version
+    if version != _INDEXES_VERSION:  # Drop the indexes of replaced configurations
+        _INDEXES.clear()
+        _INDEXES_VERSION = version
+    if categories is None:
+        categories = get_categories()
+    cached = _INDEXES.get(id(categories))
+    if cached is None or cached[0] is not categories:
+        cached = (categories, KeywordIndex(categories))
+        _INDEXES[id(categories)] = cached
+    return cached[1]
+
+
+def classify_article(article_text: str, categories: Optional[Dict[str, List[str]]] = None) -> str:
+    """Classifies one article using the keywords of the configured (or given) categories."""
+    return get_keyword_index(categories).classify(article_text)
+
+
+def classify_batch(article_texts: Iterable[str], categories: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """Classifies many articles with one compiled keyword index."""
+    index = get_keyword_index(categories)
+    return [index.classify(article_text) for article_text in article_texts]
@@ -0,0 +1,72 @@
+# Near-duplicate detection: MinHash signatures of word shingles and LSH band keys.
+import hashlib
+import struct
+from typing import List, Optional, Tuple
+
+from newspeeking.nlp.classifier import tokenize
+
+SHINGLE_SIZE = 3  # Words per shingle
+MIN_SHINGLES = 20  # Shorter texts get no signature: too little text to call two articles duplicates
+SIGNATURE_SIZE = 64  # MinHash values per signature (one-permutation hashing: one bin per value)
+BANDS = 16  # LSH bands of ROWS values; articles agreeing on a whole band become candidates
+ROWS = SIGNATURE_SIZE // BANDS
+
+_EMPTY_BIN = 0xFFFFFFFF
+_SIGNATURE_FORMAT = f"<{SIGNATURE_SIZE}I"
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def minhash(article_text: str) -> Optional[bytes]:
+    """
+    Returns the MinHash signature of the text's word shingles (SIGNATURE_SIZE 32-bit values,
+    packed into bytes), or None if the text is too short to fingerprint reliably.
+    Uses one-permutation hashing: each shingle hash picks a bin with its low bits and the bin
+    keeps the minimum of the remaining bits, so one hash per shingle replaces SIGNATURE_SIZE permutations.
+    """
+    tokens = tokenize(article_text or "")
+    shingles = {" ".join(tokens[position:position + SHINGLE_SIZE])
+                for position in range(len(tokens) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+
+    bins = [_EMPTY_BIN] * SIGNATURE_SIZE
+    for shingle in shingles:
+        shingle_hash = _shingle_hash(shingle)
+        position = shingle_hash % SIGNATURE_SIZE
+        value = (shingle_hash // SIGNATURE_SIZE) & 0xFFFFFFFE  # Even values never equal _EMPTY_BIN
+        if value < bins[position]:
+            bins[position] = value
+    return struct.pack(_SIGNATURE_FORMAT, *bins)
+
+
+def similarity(signature_a: bytes, signature_b: bytes) -> float:
+    """Estimated Jaccard similarity of the two texts' shingle sets."""
+    values_a = struct.unpack(_SIGNATURE_FORMAT, signature_a)
+    values_b = struct.unpack(_SIGNATURE_FORMAT, signature_b)
+    compared = equal = 0
+    for value_a, value_b in zip(values_a, values_b):
+        if value_a == _EMPTY_BIN and value_b == _EMPTY_BIN:
+            continue  # Bin empty in both texts says nothing about their similarity
+        compared += 1
+        equal += value_a == value_b
+    return equal / compared if compared else 0.0
+
+
+_EMPTY_BAND = struct.pack(f"<{ROWS}I", *[_EMPTY_BIN] * ROWS)
+
+
+def band_keys(signature: bytes) -> List[Tuple[int, int]]:
+    """
+    (band, key) per LSH band, the key a signed 64-bit hash of the band's values. Bands whose bins are all
+    empty are left out: every short text would share their key, and they say nothing about its content.
+    """
+    band_size = 4 * ROWS
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * band_size:(band + 1) * band_size]
+        if values != _EMPTY_BAND:
+            keys.append((band, int.from_bytes(hashlib.blake2b(values, digest_size=8).digest(), 'little', signed=True)))
+    return keys
@@ -0,0 +1,35 @@
+# Test configuration: config.yaml with a scratch SQLite database, installed before newspeeking.db is imported
+# (the engine is created at import).
+import os
+import tempfile
+
+import pytest
+
+from newspeeking.config import load_config, set_config
+
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="newspeeking-tests-")
+_CONFIG = load_config()
+_CONFIG.setdefault('default', {}).update({
+    'database_url': f"sqlite:///{os.path.join(_SCRATCH_DIR, 'test.db')}",
+    'rate_limit_delay': 0,
+    'http_cache_dir': None,
+    'archive_dir': None,
+})
+set_config(_CONFIG)
+
+
+@pytest.fixture
+def db():
+    """A session on the scratch database, emptied after the test."""
+    from newspeeking.db.database import Base, SessionLocal
+    from newspeeking.db.search import clear_search_index
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        clear_search_index(session)
+        session.commit()
+        session.close()
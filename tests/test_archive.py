@@ -0,0 +1,48 @@
+import pytest
+
+from newspeeking.crawler.archive import HtmlArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = HtmlArchive(str(tmp_path), segment_max_bytes=600)  # A few records per segment
+    yield archive
+    archive.close()
+
+
+def page(number: int) -> str:
+    return f"<html><body><h1>Page {number}</h1>{'text ' * number}</body></html>"
+
+
+def test_records_are_read_back_from_their_offsets(archive):
+    urls = [f"https://example.com/{i}.html" for i in range(12)]
+    for i, url in enumerate(urls):
+        archive.put(url, page(i))
+    locations = archive.locate(urls + ["https://example.com/missing.html"])
+    assert set(locations) == set(urls)
+    assert len({segment for segment, _, _ in locations.values()}) > 1
+    for i, url in enumerate(urls):
+        assert archive.read(locations[url]) == page(i)
+    assert archive.get("https://example.com/missing.html") is None
+
+
+def test_identical_payloads_are_stored_once(archive):
+    archive.put("https://example.com/a.html", page(1))
+    archive.put("https://example.com/b.html", page(1))  # Revisit record pointing at a's payload
+    locations = archive.locate(["https://example.com/a.html", "https://example.com/b.html"])
+    assert locations["https://example.com/a.html"] == locations["https://example.com/b.html"]
+
+    archive.put("https://example.com/a.html", page(2))
+    assert archive.get("https://example.com/a.html") == page(2)
+    assert archive.get("https://example.com/b.html") == page(1)
+
+
+def test_another_instance_appends_after_existing_records(archive, tmp_path):
+    archive.put("https://example.com/a.html", page(1))
+    other = HtmlArchive(str(tmp_path), segment_max_bytes=600)
+    try:
+        other.put("https://example.com/b.html", page(2))
+        assert other.get("https://example.com/a.html") == page(1)
+    finally:
+        other.close()
+    assert archive.get("https://example.com/b.html") == page(2)
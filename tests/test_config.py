@@ -0,0 +1,44 @@
+import logging
+import os
+
+import pytest
+
+from newspeeking import config
+from newspeeking.config import ConfigRegistry
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """A watched config.yaml in a scratch directory; the tests' configuration is restored afterwards."""
+    path = tmp_path / "config.yaml"
+    path.write_text("default:\n  rate_limit_delay: 1\n")
+    monkeypatch.setattr(config, "_CONFIG_FILE_PATH", str(path))
+    monkeypatch.setattr(config, "_failed_mtime", None)
+    monkeypatch.setattr(config, "_REGISTRY", ConfigRegistry({}, 0, mtime=-1))
+    return path
+
+
+def touch(path, content: str, mtime_ns: int):
+    path.write_text(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_changed_file_is_reloaded(config_file):
+    assert config._reload_registry().default == {"rate_limit_delay": 1}
+    touch(config_file, "default:\n  rate_limit_delay: 2\n", 10**18)
+    assert config._reload_registry().default == {"rate_limit_delay": 2}
+
+
+def test_broken_file_is_reported_once_per_change(config_file, caplog):
+    registry = config._reload_registry()
+    touch(config_file, "default: [unclosed\n", 10**18)
+    with caplog.at_level(logging.ERROR, logger=config.__name__):
+        for _ in range(3):
+            assert config._reload_registry() is registry
+        failures = [record for record in caplog.records if "reload failed" in record.message]
+        assert len(failures) == 1
+        touch(config_file, "default: {unclosed\n", 2 * 10**18)
+        assert config._reload_registry() is registry
+        assert len([record for record in caplog.records if "reload failed" in record.message]) == 2
+    touch(config_file, "default:\n  rate_limit_delay: 3\n", 3 * 10**18)
+    assert config._reload_registry().default == {"rate_limit_delay": 3}
@@ -0,0 +1,28 @@
+from newspeeking.db.database import ArticleDB, bulk_upsert_articles
+
+
+def article(number: int, text: str = "Body") -> dict:
+    return {"url": f"https://example.com/{number}.html", "headline": f"Headline {number}", "article_text": text,
+            "publication_date": "2024-01-01T08:00:00", "author": "Reporter", "category": "news"}
+
+
+def test_upsert_counts_inserted_updated_and_unchanged(db):
+    result = bulk_upsert_articles(db, [article(1), article(2), article(3)])
+    db.commit()
+    assert (result.inserted, result.updated, result.unchanged) == (3, 0, 0)
+    created_at = db.query(ArticleDB).filter(ArticleDB.url == article(2)["url"]).one().created_at
+
+    result = bulk_upsert_articles(db, [article(1), article(2, "Corrected body"), article(4)])
+    db.commit()
+    assert (result.inserted, result.updated, result.unchanged) == (1, 1, 1)
+    updated = db.query(ArticleDB).filter(ArticleDB.url == article(2)["url"]).one()
+    assert updated.article_text == "Corrected body"
+    assert updated.created_at == created_at  # Kept on update
+    assert db.query(ArticleDB).count() == 4
+
+
+def test_last_copy_of_a_url_in_a_batch_wins(db):
+    result = bulk_upsert_articles(db, [article(1, "First"), None, article(1, "Second")])
+    db.commit()
+    assert (result.inserted, result.total) == (1, 1)
+    assert db.query(ArticleDB).one().article_text == "Second"
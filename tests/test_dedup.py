@@ -0,0 +1,55 @@
+import random
+
+from newspeeking.db.database import ArticleDB, bulk_upsert_articles
+from newspeeking.nlp.dedup import MIN_SHINGLES, band_keys, minhash, similarity
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+
+def random_text(seed: int, words: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def test_texts_too_short_get_no_signature():
+    assert minhash(random_text(0, MIN_SHINGLES)) is None
+    assert minhash(random_text(0, MIN_SHINGLES + 2)) is not None
+
+
+def test_near_duplicates_are_similar_and_share_a_band():
+    text = random_text(1, 400)
+    edited = text.replace(text.split()[200], "changed", 1) + " One more closing sentence."
+    signature, edited_signature = minhash(text), minhash(edited)
+    assert similarity(signature, edited_signature) > 0.8
+    assert set(band_keys(signature)) & set(band_keys(edited_signature))
+
+
+def test_distinct_texts_are_not_similar():
+    assert similarity(minhash(random_text(2, 400)), minhash(random_text(3, 400))) < 0.2
+
+
+def test_short_distinct_texts_are_not_candidates_for_each_other():
+    seen = {}
+    for seed in range(200):
+        signature = minhash(random_text(seed, 40))  # About 38 shingles: most of the 64 bins stay empty
+        for key in band_keys(signature):
+            assert key not in seen, f"texts {seen[key]} and {seed} share a band key"
+            seen[key] = seed
+
+
+def test_upsert_links_near_duplicates(db):
+    text = random_text(4, 300)
+    bulk_upsert_articles(db, [
+        {"url": "https://example.com/original.html", "headline": "Original", "article_text": text},
+        {"url": "https://example.com/distinct.html", "headline": "Distinct", "article_text": random_text(5, 300)},
+    ])
+    db.commit()
+    result = bulk_upsert_articles(db, [
+        {"url": "https://example.com/copy.html", "headline": "Copy", "article_text": text + " Syndicated."}])
+    db.commit()
+    assert result.duplicates == 1
+    original, copy = (db.query(ArticleDB).filter(ArticleDB.url == f"https://example.com/{name}.html").one()
+                      for name in ("original", "copy"))
+    assert copy.duplicate_of_id == original.id
+    assert copy.article_text is None
+    assert db.query(ArticleDB).filter(ArticleDB.url == "https://example.com/distinct.html").one().duplicate_of_id is None
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from newspeeking.config import SiteConfig
+from newspeeking.crawler.discovery import FeedEntry, iter_feed_entries
+
+
+def entries(document: str, base_url: str = "https://example.com/", chunk_size: int = 64):
+    data = document.encode("utf-8")
+    return list(iter_feed_entries((data[i:i + chunk_size] for i in range(0, len(data), chunk_size)), base_url))
+
+
+NEWS_SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+        xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
+  <url>
+    <loc>https://example.com/2024/01/02/world/story-1.html</loc>
+    <news:news>
+      <news:publication><news:name>Example</news:name><news:language>en</news:language></news:publication>
+      <news:publication_date>2024-01-02T10:00:00+01:00</news:publication_date>
+      <news:title>Story 1</news:title>
+    </news:news>
+    <image:image><image:loc>https://cdn.example.com/images/story-1.jpg</image:loc></image:image>
+  </url>
+  <url>
+    <image:image><image:loc>https://cdn.example.com/images/story-2.jpg</image:loc></image:image>
+    <loc>https://example.com/2024/01/03/world/story-2.html</loc>
+    <lastmod>2024-01-03</lastmod>
+    <video:video>
+      <video:content_loc>https://cdn.example.com/videos/story-2.mp4</video:content_loc>
+      <video:publication_date>2030-01-01T00:00:00Z</video:publication_date>
+    </video:video>
+  </url>
+</urlset>"""
+
+
+def test_news_and_image_sitemap_entries_keep_the_article_url():
+    assert entries(NEWS_SITEMAP) == [
+        FeedEntry("https://example.com/2024/01/02/world/story-1.html", datetime(2024, 1, 2, 9, 0)),
+        FeedEntry("https://example.com/2024/01/03/world/story-2.html", datetime(2024, 1, 3)),
+    ]
+
+
+def test_sitemap_index_entries_are_sitemaps():
+    document = """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <sitemap><loc>/sitemap-1.xml</loc><lastmod>2024-01-01T00:00:00Z</lastmod></sitemap>
+      <sitemap><loc>https://example.com/sitemap-2.xml</loc></sitemap>
+    </sitemapindex>"""
+    assert entries(document) == [
+        FeedEntry("https://example.com/sitemap-1.xml", datetime(2024, 1, 1), True),
+        FeedEntry("https://example.com/sitemap-2.xml", None, True),
+    ]
+
+
+def test_rss_items_ignore_channel_link():
+    document = """<rss version="2.0"><channel>
+      <link>https://example.com/</link><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>
+      <item><title>A</title><link>https://example.com/a.html</link><pubDate>Tue, 02 Jan 2024 08:00:00 +0000</pubDate></item>
+      <item><guid>https://example.com/b.html</guid></item>
+      <item><guid isPermaLink="false">tag:example.com,2024:c</guid></item>
+    </channel></rss>"""
+    assert entries(document) == [
+        FeedEntry("https://example.com/a.html", datetime(2024, 1, 2, 8, 0)),
+        FeedEntry("https://example.com/b.html", None),
+    ]
+
+
+def test_atom_entries_use_the_alternate_link():
+    document = """<feed xmlns="http://www.w3.org/2005/Atom">
+      <link rel="self" href="https://example.com/feed.xml"/>
+      <entry>
+        <link rel="edit" href="https://example.com/edit/1"/>
+        <link href="https://example.com/1.html"/>
+        <published>2024-01-01T00:00:00Z</published><updated>2024-01-05T00:00:00Z</updated>
+      </entry>
+    </feed>"""
+    assert entries(document) == [FeedEntry("https://example.com/1.html", datetime(2024, 1, 5))]
+
+
+RSS_FEED = b"""<rss version="2.0"><channel>
+  <item><link>http://127.0.0.1/a.html</link></item>
+  <item><link>http://127.0.0.1/b.html</link></item>
+</channel></rss>"""
+
+
+@pytest.fixture
+def feed_server():
+    """A feed served with an ETag, answering 304 to a matching If-None-Match. Yields the feed URL and request log."""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(dict(self.headers))
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(RSS_FEED)))
+            self.end_headers()
+            self.wfile.write(RSS_FEED)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/feed.xml", requests_seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_full_discovery_ignores_the_validators_of_earlier_polls(db, feed_server):
+    from newspeeking.crawler.discovery import discover_articles
+    feed_url, requests_seen = feed_server
+    site = SiteConfig("127.0.0.1", {}, {})
+    expected = ["http://127.0.0.1/a.html", "http://127.0.0.1/b.html"]
+
+    assert asyncio.run(discover_articles(feed_url, site)).new_urls == expected
+    assert asyncio.run(discover_articles(feed_url, site)).article_urls == []  # Polled again: 304
+    assert "If-None-Match" in requests_seen[-1]
+    assert asyncio.run(discover_articles(feed_url, site, only_new=False)).new_urls == expected
+    assert "If-None-Match" not in requests_seen[-1]
+    assert asyncio.run(discover_articles(feed_url, site)).article_urls == []  # The full read changed no state
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from newspeeking.crawler.fetcher import CrawlFetcher
+
+RESPONSE_DELAY = 0.3
+
+
+@pytest.fixture
+def slow_server():
+    """Serves every path after RESPONSE_DELAY seconds. Yields the base URL and the list of requested paths."""
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            time.sleep(RESPONSE_DELAY)
+            body = f"<html><body><p>{self.path}</p></body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", requested
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_cancelling_the_callers_cancels_pending_downloads(slow_server):
+    base_url, requested = slow_server
+
+    async def crawl():
+        fetcher = CrawlFetcher()
+        tasks = [asyncio.create_task(fetcher.fetch(f"{base_url}/{n}")) for n in range(60)]
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.05)  # Requests already on their way arrive
+        sent = len(requested)
+        await asyncio.sleep(6 * RESPONSE_DELAY)
+        return sent
+
+    sent = asyncio.run(crawl())
+    assert 0 < sent < 60
+    assert len(requested) == sent  # Nothing more was downloaded after the crawl was cancelled
+
+
+def test_a_shared_download_survives_one_cancelled_caller(slow_server):
+    base_url, requested = slow_server
+
+    async def crawl():
+        fetcher = CrawlFetcher()
+        first = asyncio.create_task(fetcher.fetch(f"{base_url}/shared"))
+        second = asyncio.create_task(fetcher.fetch(f"{base_url}/shared"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert "/shared" in asyncio.run(crawl()).text
+    assert requested == ["/shared"]
+
+
+def test_close_cancels_pending_downloads(slow_server):
+    base_url, requested = slow_server
+
+    async def crawl():
+        fetcher = CrawlFetcher()
+        tasks = [asyncio.create_task(fetcher.fetch(f"{base_url}/{n}")) for n in range(60)]
+        await asyncio.sleep(0.1)
+        fetcher.close()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        sent = len(requested)
+        await asyncio.sleep(6 * RESPONSE_DELAY)
+        return results, sent
+
+    results, sent = asyncio.run(crawl())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert len(requested) == sent < 60
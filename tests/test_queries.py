@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from newspeeking.db.database import bulk_upsert_articles
+from newspeeking.db.queries import ArticleFilters, InvalidCursor, decode_cursor, encode_cursor, iter_articles, list_articles
+
+
+def store(db, *urls):
+    bulk_upsert_articles(db, [{"url": url, "headline": url, "article_text": url} for url in urls])
+    db.commit()
+
+
+def test_domain_filter_matches_with_and_without_www(db):
+    store(db, "https://www.nytimes.com/a.html", "https://nytimes.com/b.html", "https://example.com/c.html")
+    for domain in ("nytimes.com", "www.nytimes.com", "NYTimes.com"):
+        rows, _ = list_articles(db, ArticleFilters(domain=domain))
+        assert {row.url for row in rows} == {"https://www.nytimes.com/a.html", "https://nytimes.com/b.html"}
+
+
+def test_pages_cover_every_article_once(db):
+    # Three articles per publication date: pages split ties, which are broken by id
+    bulk_upsert_articles(db, [{"url": f"https://example.com/{i}.html", "headline": str(i), "article_text": str(i),
+                               "publication_date": f"2024-01-{1 + i // 3:02d}T00:00:00"} for i in range(20)])
+    bulk_upsert_articles(db, [{"url": "https://example.com/undated.html", "headline": "Undated"}])
+    db.commit()
+    for order_by in ("created_at", "publication_date"):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = list_articles(db, ArticleFilters(), order_by=order_by, limit=7, cursor=cursor)
+            seen.extend(rows)
+            if cursor is None:
+                break
+        keys = [(getattr(row, order_by), row.id) for row in seen]
+        assert keys == sorted(keys, reverse=True)
+        assert len({row.id for row in seen}) == len(seen) == (21 if order_by == "created_at" else 20)
+
+
+def test_invalid_cursor_is_rejected(db):
+    with pytest.raises(InvalidCursor):
+        list_articles(db, ArticleFilters(), cursor="not-a-cursor")
+    assert decode_cursor(encode_cursor(datetime(2024, 1, 1), 42)) == (datetime(2024, 1, 1), 42)
+
+
+def test_iter_articles_yields_all_rows_in_batches(db):
+    store(db, *(f"https://example.com/{i}.html" for i in range(25)))
+    batches = list(iter_articles(db, ArticleFilters(), batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [row.url for batch in batches for row in batch] == [f"https://example.com/{i}.html" for i in range(25)]
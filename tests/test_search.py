@@ -0,0 +1,44 @@
+import sqlite3
+
+from sqlalchemy import text
+
+from newspeeking.db.database import bulk_upsert_articles, engine
+from newspeeking.db.queries import ArticleFilters
+from newspeeking.db.search import search_articles
+
+
+def article(n: int, text_: str, headline: str = None):
+    return {"url": f"https://example.com/{n}.html", "headline": headline or f"Headline {n}",
+            "article_text": text_, "category": "General"}
+
+
+def matched_urls(db, query: str):
+    return [row.url for row in search_articles(db, query, ArticleFilters())]
+
+
+def test_upserts_keep_the_index_in_sync(db):
+    bulk_upsert_articles(db, [article(1, "The parliament passed the budget."), article(2, "A football final.")])
+    db.commit()
+    assert matched_urls(db, "parliament") == ["https://example.com/1.html"]
+    assert "<mark>parliament</mark>" in search_articles(db, "parliament", ArticleFilters())[0].snippet
+
+    bulk_upsert_articles(db, [article(1, "The senate rejected the budget.")])
+    db.commit()
+    assert matched_urls(db, "parliament") == []
+    assert matched_urls(db, "senate") == ["https://example.com/1.html"]
+    assert matched_urls(db, "football") == ["https://example.com/2.html"]
+
+
+def test_other_connections_can_write_to_articles(db):
+    bulk_upsert_articles(db, [article(1, "Indexed text.")])
+    db.commit()
+    connection = sqlite3.connect(engine.url.database)  # No decompress_text function on this connection
+    try:
+        connection.execute("UPDATE articles SET headline = 'Changed' WHERE id = (SELECT min(id) FROM articles)")
+        connection.execute("INSERT INTO articles (url, headline) VALUES ('https://example.com/other.html', 'Other')")
+        connection.execute("DELETE FROM articles WHERE url = 'https://example.com/other.html'")
+        connection.commit()
+    finally:
+        connection.close()
+    db.execute(text("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')"))
+    assert matched_urls(db, "changed") == ["https://example.com/1.html"]
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from newspeeking.crawler.work_queue import TaskKind, TaskStatus, claim, enqueue, fail, finish, queue_counts
+from newspeeking.db.database import CrawlTaskDB, utcnow
+
+URLS = [f"https://example.com/{i}.html" for i in range(5)]
+
+
+def make_available(db):
+    """Ends every backoff and lease, as if their time had passed."""
+    past = utcnow() - timedelta(seconds=1)
+    db.execute(update(CrawlTaskDB).values(available_at=past, lease_expires_at=past))
+    db.commit()
+
+
+def test_enqueue_skips_known_articles_and_requeues_finished_seeds(db):
+    assert enqueue(db, URLS + URLS[:2], TaskKind.ARTICLE) == 5
+    assert enqueue(db, URLS, TaskKind.ARTICLE) == 0
+    db.commit()
+    task_ids = [task_id for task_id, _, _ in claim(db, "worker")]
+    finish(db, "worker", task_ids)
+    db.commit()
+    assert enqueue(db, URLS[:1], TaskKind.SEED) == 1
+    db.commit()
+    assert queue_counts(db)[TaskStatus.QUEUED] == 1
+
+
+def test_workers_claim_disjoint_batches(db):
+    enqueue(db, URLS)
+    db.commit()
+    first, second = claim(db, "first", limit=3), claim(db, "second", limit=3)
+    assert len(first) == 3 and len(second) == 2
+    assert {url for _, url, _ in first} | {url for _, url, _ in second} == set(URLS)
+    assert claim(db, "third") == []
+
+
+def test_finish_requires_the_lease(db):
+    enqueue(db, URLS[:1])
+    db.commit()
+    [(task_id, _, _)] = claim(db, "owner")
+    finish(db, "other", [task_id])
+    db.commit()
+    assert db.get(CrawlTaskDB, task_id).status == TaskStatus.LEASED
+    finish(db, "owner", [task_id])
+    db.commit()
+    db.refresh(db.get(CrawlTaskDB, task_id))
+    assert db.get(CrawlTaskDB, task_id).status == TaskStatus.DONE
+
+
+def test_failed_urls_are_retried_after_a_backoff_then_marked_failed(db):
+    enqueue(db, URLS[:1])
+    db.commit()
+    for attempt in range(1, 4):  # queue_max_attempts defaults to 3
+        [(task_id, _, _)] = claim(db, "worker")
+        fail(db, "worker", task_id, f"Error {attempt}")
+        db.commit()
+        task = db.get(CrawlTaskDB, task_id)
+        db.refresh(task)
+        assert task.attempts == attempt and task.last_error == f"Error {attempt}"
+        if attempt < 3:
+            assert task.status == TaskStatus.QUEUED
+            assert claim(db, "worker") == []  # Backing off
+            make_available(db)
+    assert task.status == TaskStatus.FAILED
+
+
+def test_expired_leases_are_claimed_again(db):
+    enqueue(db, URLS[:1])
+    db.commit()
+    [(task_id, _, _)] = claim(db, "crashed")
+    assert claim(db, "other") == []
+    make_available(db)
+    assert [claimed_id for claimed_id, _, _ in claim(db, "other")] == [task_id]
+    finish(db, "crashed", [task_id])  # The lease moved on: the first worker can no longer finish it
+    db.commit()
+    db.refresh(db.get(CrawlTaskDB, task_id))
+    assert db.get(CrawlTaskDB, task_id).lease_owner == "other"